@@ -0,0 +1,214 @@
+'''
+Noisy channel models for transmitting whole batches of code blocks.
+
+Each channel draws its errors from its own NumPy generator, so a channel
+constructed with the same `seed` always produces the same errors. Blocks are
+either an (N, W) array of bits, where column _i_ holds bit _i_ of a block, or
+an (N,) array of packed integers of W <= 64 bits.
+
+To execute unit tests for this module, run: `python -m unittest channel.py`.
+'''
+
+import numpy as np
+import glyph as gl
+import unittest
+from abc import ABC, abstractmethod
+
+
+class Channel(ABC):
+    '''
+    Base class for a noisy channel over batches of blocks.
+    '''
+
+    def __init__(self, seed=None):
+        '''
+        Construct a new channel whose errors are drawn from a generator
+        seeded with `seed`.
+        '''
+        self.rng = np.random.default_rng(seed)
+
+    @abstractmethod
+    def errors(self, n: int, width: int):
+        '''
+        Returns an (n, `width`) `uint8` array of error patterns, where a 1
+        flips the corresponding bit.
+        '''
+        pass
+
+    def transmit(self, blocks, width: int=None):
+        '''
+        Transmits a batch of `blocks` over the channel, returning a new array
+        with the errors applied.
+
+        Packed integer blocks require their `width` in bits.
+        '''
+        blocks = np.asarray(blocks)
+        if blocks.ndim == 1:
+            if width is None:
+                raise ValueError('packed blocks require a width')
+            return blocks ^ gl.from_bits(self.errors(blocks.shape[0], width)).astype(blocks.dtype)
+        return blocks ^ self.errors(blocks.shape[0], blocks.shape[1])
+    pass
+
+
+class BinarySymmetricChannel(Channel):
+    '''
+    Flips each bit independently with probability `p`.
+    '''
+
+    def __init__(self, p: float, seed=None):
+        super().__init__(seed)
+        if p < 0 or p > 1:
+            raise ValueError('flip probability must be between 0 and 1')
+        self.p = p
+
+    def errors(self, n: int, width: int):
+        return (self.rng.random((n, width)) < self.p).astype(np.uint8)
+    pass
+
+
+class FixedWeightChannel(Channel):
+    '''
+    Flips exactly `weight` distinct bits per block, chosen uniformly.
+    '''
+
+    def __init__(self, weight: int, seed=None):
+        super().__init__(seed)
+        if weight < 0:
+            raise ValueError('weight must be non-negative')
+        self.weight = weight
+
+    def errors(self, n: int, width: int):
+        if self.weight > width:
+            raise ValueError('cannot flip more bits than the block width')
+        errs = np.zeros((n, width), dtype=np.uint8)
+        if self.weight > 0:
+            # the positions of the `weight` smallest random keys are a uniform
+            # sample without replacement, so no rejection is needed
+            keys = self.rng.random((n, width))
+            spots = np.argpartition(keys, self.weight-1, axis=1)[:, :self.weight]
+            errs[np.arange(n)[:, None], spots] = 1
+        return errs
+    pass
+
+
+class RandomWeightChannel(Channel):
+    '''
+    Flips a number of distinct bits per block drawn from `weights` with
+    probabilities `probs` (uniform if omitted).
+    '''
+
+    def __init__(self, weights: list, probs: list=None, seed=None):
+        super().__init__(seed)
+        if len(weights) == 0 or min(weights) < 0:
+            raise ValueError('weights must be a non-empty list of non-negative counts')
+        if probs is not None and len(probs) != len(weights):
+            raise ValueError('expected a probability for every weight')
+        self.weights = np.asarray(weights)
+        self.probs = None if probs is None else np.asarray(probs, dtype=float)/np.sum(probs)
+
+    def errors(self, n: int, width: int):
+        most = int(self.weights.max())
+        if most > width:
+            raise ValueError('cannot flip more bits than the block width')
+        chosen = self.rng.choice(self.weights, size=n, p=self.probs)
+        errs = np.zeros((n, width), dtype=np.uint8)
+        if most > 0:
+            # rank the random keys and keep the first `chosen` of each block
+            keys = self.rng.random((n, width))
+            spots = np.argpartition(keys, most-1, axis=1)[:, :most]
+            keep = np.arange(most) < chosen[:, None]
+            rows = np.broadcast_to(np.arange(n)[:, None], spots.shape)
+            errs[rows[keep], spots[keep]] = 1
+        return errs
+    pass
+
+
+class BurstChannel(Channel):
+    '''
+    Flips a run of `length` consecutive bits in each block with probability
+    `rate`, starting at a uniformly chosen position.
+
+    The last `guard` bits of each block are kept clear, so bursts in
+    neighbouring blocks are at least `guard` bits apart.
+    '''
+
+    def __init__(self, length: int, rate: float=1.0, guard: int=0, seed=None):
+        super().__init__(seed)
+        if length < 1:
+            raise ValueError('burst length must be positive')
+        if rate < 0 or rate > 1:
+            raise ValueError('burst rate must be between 0 and 1')
+        if guard < 0:
+            raise ValueError('guard must be non-negative')
+        self.length = length
+        self.rate = rate
+        self.guard = guard
+
+    def errors(self, n: int, width: int):
+        if self.guard >= width:
+            raise ValueError('guard must be less than the block width')
+        length = min(self.length, width-self.guard)
+        start = self.rng.integers(0, width-self.guard-length+1, size=n)
+        hit = self.rng.random(n) < self.rate
+        pos = np.arange(width)
+        errs = (pos >= start[:, None]) & (pos < (start+length)[:, None]) & hit[:, None]
+        return errs.astype(np.uint8)
+    pass
+
+
+class TestChannel(unittest.TestCase):
+    '''
+    Test cases for the channel models.
+    '''
+
+    def test_binary_symmetric(self):
+        blocks = np.zeros((100, 16), dtype=np.uint8)
+        self.assertFalse(BinarySymmetricChannel(0.0).transmit(blocks).any())
+        self.assertTrue(BinarySymmetricChannel(1.0).transmit(blocks).all())
+        # same seed, same errors
+        a = BinarySymmetricChannel(0.1, seed=7).transmit(blocks)
+        b = BinarySymmetricChannel(0.1, seed=7).transmit(blocks)
+        self.assertTrue((a == b).all())
+        self.assertTrue(blocks.sum() == 0)
+
+    def test_fixed_weight(self):
+        blocks = np.ones((500, 24), dtype=np.uint8)
+        for w in [0, 1, 4, 24]:
+            rx = FixedWeightChannel(w, seed=1).transmit(blocks)
+            self.assertTrue(((24 - rx.sum(axis=1)) == w).all())
+        with self.assertRaises(ValueError):
+            FixedWeightChannel(25).errors(1, 24)
+
+    def test_random_weight(self):
+        errs = RandomWeightChannel([0, 1, 2], seed=2).errors(3000, 16)
+        counts = np.bincount(errs.sum(axis=1), minlength=4)
+        self.assertEqual(counts[3], 0)
+        self.assertTrue((counts[:3] > 800).all())
+        errs = RandomWeightChannel([1, 2], probs=[0, 1], seed=2).errors(100, 16)
+        self.assertTrue((errs.sum(axis=1) == 2).all())
+        with self.assertRaises(ValueError):
+            RandomWeightChannel([1, 2], probs=[1])
+
+    def test_burst(self):
+        errs = BurstChannel(5, seed=3).errors(200, 32)
+        self.assertTrue((errs.sum(axis=1) == 5).all())
+        # every burst is contiguous
+        self.assertTrue((np.abs(np.diff(errs.astype(int), axis=1)).sum(axis=1) <= 2).all())
+        self.assertFalse(BurstChannel(5, rate=0.0).errors(10, 32).any())
+        errs = BurstChannel(5, guard=20, seed=3).errors(200, 32)
+        self.assertFalse(errs[:, 12:].any())
+        self.assertTrue((errs.sum(axis=1) == 5).all())
+
+    def test_packed(self):
+        words = np.arange(0, 1000, dtype=np.uint64)
+        rx = FixedWeightChannel(3, seed=5).transmit(words, width=40)
+        flips = gl.to_bits(rx ^ words, 40).sum(axis=1)
+        self.assertTrue((flips == 3).all())
+        with self.assertRaises(ValueError):
+            FixedWeightChannel(3).transmit(words)
+
+    def test_abstract(self):
+        # a channel must draw its own errors
+        with self.assertRaises(TypeError):
+            Channel(seed=1)
@@ -0,0 +1,176 @@
+'''
+Factories for the codes named by spec strings, shared by the tools.
+
+A spec names a code as `hamming:K` for `HammingCodec(K)`, `hsiao:K` for
+`HsiaoCodec(K)` or `golay` for `GolayCodec`. `make_codec` creates the
+reference model of any of them, and `make_frames` the batch framing of the
+Hamming and Golay codes (see `HammingFrames` and `GolayFrames`).
+
+Streams and the codec service store a code as an id byte from `CODECS`
+along with K.
+
+To execute unit tests for this module, run: `python -m unittest codes.py`.
+'''
+
+import unittest
+import numpy as np
+import glyph as gl
+from hamming import HammingCodec
+from hsiao import HsiaoCodec
+from golay import GolayCodec
+
+# codec name -> id stored in stream headers and service requests
+CODECS = {'hamming': 0, 'golay': 1}
+
+
+def parse_spec(spec: str) -> tuple:
+    '''
+    Splits `spec` into the name of its code and its K (`None` for Golay).
+    '''
+    name, _, k = spec.partition(':')
+    if name in ['hamming', 'hsiao'] and k.isdigit() and int(k) > 0:
+        return (name, int(k))
+    elif name == 'golay' and k == '':
+        return (name, None)
+    raise ValueError("unknown code '"+spec+"' (expected 'hamming:K', 'hsiao:K' or 'golay')")
+
+
+def make_codec(spec: str):
+    '''
+    Creates the model of the code named by `spec`.
+    '''
+    (name, k) = parse_spec(spec)
+    if name == 'hamming':
+        return HammingCodec(k)
+    elif name == 'hsiao':
+        return HsiaoCodec(k)
+    return GolayCodec()
+
+
+class HammingFrames:
+    '''
+    Batch framing for the extended Hamming code.
+    '''
+
+    def __init__(self, k: int):
+        self.codec = HammingCodec(k)
+        self.k = k
+        self.n = self.codec.get_total_bits_len()
+
+    def encode(self, data):
+        '''
+        Encodes an (N, K) array of data bits into an (N, N_b) array of blocks.
+        '''
+        return self.codec.encode_batch(data)
+
+    def decode(self, blocks) -> tuple:
+        '''
+        Decodes an (N, N_b) array of blocks.
+
+        Returns `(data, corrected, detected)` arrays.
+        '''
+        return self.codec.decode_batch(blocks)
+    pass
+
+
+class GolayFrames:
+    '''
+    Batch framing for the extended Golay code, laid out as
+    `parity << 23 | check << 12 | data`.
+    '''
+
+    def __init__(self):
+        self.codec = GolayCodec(table=True)
+        self.k = 12
+        self.n = 24
+
+    def encode(self, data):
+        '''
+        Encodes an (N, 12) array of data bits into an (N, 24) array of blocks.
+        '''
+        data = gl.from_bits(data)
+        (check, parity) = self.codec.encode_batch(data.astype(np.uint16))
+        words = parity.astype(np.uint64) << 23 | check.astype(np.uint64) << 12 | data
+        return gl.to_bits(words, self.n)
+
+    def decode(self, blocks) -> tuple:
+        '''
+        Decodes an (N, 24) array of blocks.
+
+        Returns `(data, corrected, detected)` arrays.
+        '''
+        words = gl.from_bits(blocks)
+        (data, tec, qed) = self.codec.decode_batch(
+            (words & 0xfff).astype(np.uint16),
+            ((words >> 12) & 0x7ff).astype(np.uint16),
+            ((words >> 23) & 0b1).astype(np.uint8)
+        )
+        return (gl.to_bits(data, self.k), tec, qed)
+    pass
+
+
+def make_frames(spec: str):
+    '''
+    Creates the batch framing for the Hamming or Golay code named by `spec`.
+    '''
+    (name, k) = parse_spec(spec)
+    if name == 'hamming':
+        return HammingFrames(k)
+    elif name == 'golay':
+        return GolayFrames()
+    raise ValueError("no batch framing for '"+spec+"' (expected 'hamming:K' or 'golay')")
+
+
+def codec_id(spec: str) -> int:
+    '''
+    Returns the id in `CODECS` of the code named by `spec`.
+    '''
+    (name, _) = parse_spec(spec)
+    if name not in CODECS:
+        raise ValueError("no codec id for '"+spec+"'")
+    return CODECS[name]
+
+
+def to_spec(codec: int, k: int) -> str:
+    '''
+    Returns the spec of the code with id `codec` and `k` data bits.
+    '''
+    if codec == CODECS['hamming']:
+        return 'hamming:'+str(k)
+    elif codec == CODECS['golay']:
+        return 'golay'
+    raise ValueError('unknown codec id '+str(codec))
+
+
+class TestCodes(unittest.TestCase):
+    '''
+    Test cases for the code factories.
+    '''
+
+    def test_make_codec(self):
+        self.assertEqual(make_codec('hamming:11').get_total_bits_len(), 16)
+        self.assertEqual(make_codec('hsiao:8').get_total_bits_len(), 13)
+        self.assertIsInstance(make_codec('golay'), GolayCodec)
+        for spec in ['hamming', 'hamming:0', 'hsiao:x', 'golay:12', 'bch:7']:
+            with self.assertRaises(ValueError):
+                make_codec(spec)
+
+    def test_make_frames(self):
+        for spec in ['hamming:4', 'hamming:57', 'golay']:
+            frames = make_frames(spec)
+            data = np.random.default_rng(1).integers(0, 2, size=(8, frames.k), dtype=np.uint8)
+            blocks = frames.encode(data)
+            self.assertEqual(blocks.shape, (8, frames.n))
+            self.assertTrue((frames.decode(blocks)[0] == data).all())
+        for spec in ['hamming', 'golay:12', 'hsiao:8']:
+            with self.assertRaises(ValueError):
+                make_frames(spec)
+
+    def test_ids(self):
+        for spec in ['hamming:57', 'golay']:
+            self.assertEqual(to_spec(codec_id(spec), make_frames(spec).k), spec)
+        with self.assertRaises(ValueError):
+            codec_id('hsiao:8')
+        with self.assertRaises(ValueError):
+            to_spec(2, 8)
+    pass
@@ -36,6 +36,48 @@ def get_parity(arr: list, even=True) -> bool:
     return (arr.count(1) % 2) ^ (even == False)
 
 
+def int_parity(num: int, even=True) -> int:
+    '''
+    Computes the parity bit of the integer `num` directly from its popcount,
+    with the same `even` semantics as `get_parity`.
+    '''
+    return (num.bit_count() & 0b1) ^ (even == False)
+
+
+# parity of every byte value
+_BYTE_PARITY = bytes(bin(x).count('1') % 2 for x in range(0, 256))
+
+
+def bytes_parity(buf, even=True) -> int:
+    '''
+    Computes the parity bit over every bit of a `bytes`, `bytearray` or
+    `memoryview` buffer, with the same `even` semantics as `get_parity`.
+
+    The buffer is folded onto itself with XOR down to a single byte, which is
+    then looked up in a table.
+    '''
+    buf = memoryview(buf).cast('B')
+    x = int.from_bytes(buf, 'little')
+    width = len(buf)
+    while width > 1:
+        half = width // 2
+        x = (x >> (8*half)) ^ (x & ((1 << (8*half)) - 1))
+        width -= half
+    return _BYTE_PARITY[x] ^ (even == False)
+
+
+def array_parity(bits, axis: int=-1, even=True):
+    '''
+    Computes the parity bits of a NumPy array of 1s and 0s along `axis`, with
+    the same `even` semantics as `get_parity`.
+
+    Returns a `uint8` array with `axis` removed.
+    '''
+    import numpy as np
+    bits = np.asarray(bits, dtype=np.uint8)
+    return np.bitwise_xor.reduce(bits & 1, axis=axis) ^ np.uint8(even == False)
+
+
 def get_bin_space(n: int) -> list:
     '''
     Returns binary strings for the possible combinations of input from
@@ -47,6 +89,53 @@ def get_bin_space(n: int) -> list:
     return space
 
 
+def to_bits(words, size: int):
+    '''
+    Converts a 1-D NumPy array of integers into an (N, `size`) `uint8` array of
+    their 1s and 0s, where column _i_ holds bit _i_ (LSB to MSB).
+
+    Requires `size` <= 64.
+    '''
+    import numpy as np
+    if size > 64:
+        raise ValueError('cannot unpack more than 64 bits per word')
+    words = np.asarray(words).astype(np.uint64)
+    shifts = np.arange(size, dtype=np.uint64)
+    return ((words[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+
+def from_bits(bits):
+    '''
+    Converts an (N, size) array of 1s and 0s, where column _i_ holds bit _i_ 
+    (LSB to MSB), into a 1-D `uint64` NumPy array of integers.
+
+    Requires size <= 64.
+    '''
+    import numpy as np
+    bits = np.asarray(bits)
+    if bits.shape[1] > 64:
+        raise ValueError('cannot pack more than 64 bits per word')
+    shifts = np.arange(bits.shape[1], dtype=np.uint64)
+    return np.bitwise_or.reduce(bits.astype(np.uint64) << shifts, axis=1)
+
+
+def check_into(src, dst, size_in: int, size_out: int) -> int:
+    '''
+    Checks the buffers given to a bulk `*_into` call, where every `size_in`
+    bytes of `src` fill `size_out` bytes of `dst`.
+
+    Returns the number of groups in `src`.
+    '''
+    if len(src) % size_in != 0:
+        raise ValueError('input must be a multiple of '+str(size_in)+' bytes')
+    groups = len(src) // size_in
+    if len(dst) < groups*size_out:
+        raise ValueError('output must be at least '+str(groups*size_out)+' bytes')
+    if not dst.flags.writeable:
+        raise ValueError('output buffer is read-only')
+    return groups
+
+
 def transmit(block: list, noise: int=0, spots: list=None) -> list:
     '''
     Transmits a code block over a noisy channel that may flip 0, 1, or 2 bits.
@@ -61,12 +150,8 @@ def transmit(block: list, noise: int=0, spots: list=None) -> list:
         return block
     if spots is None:
         spots = []
-    # use random-defined amount of spots and locations
-    for _ in range(0, noise):
-        # select a random index not already flipped
-        flip = random.randint(0, len(block)-1)
-        while spots.count(flip) > 0:
-            flip = random.randint(0, len(block)-1)
+    # use random-defined amount of spots and locations (all unique)
+    for flip in random.sample(range(0, len(block)), noise):
         # reverse the bit
         block[flip] ^= 1
         # remember that position is now flipped
@@ -75,6 +160,119 @@ def transmit(block: list, noise: int=0, spots: list=None) -> list:
     return block
 
 
+class BitVector:
+    '''
+    Fixed-length vector of bits packed into a single integer, where index _i_
+    is bit _i_ of the integer (the same order as a Hamming-code block list).
+
+    Costs a few bytes per 8 bits instead of a pointer per bit for a list of
+    ints, and operations such as XOR and popcount run on the whole integer.
+    '''
+    __slots__ = ('_value', '_len')
+
+    def __init__(self, value: int=0, size: int=0):
+        '''
+        Construct a new vector of `size` bits holding the low bits of `value`.
+        '''
+        if size < 0:
+            raise ValueError('size must be non-negative')
+        self._len = size
+        self._value = value & ((1 << size) - 1)
+
+    @staticmethod
+    def from_list(bits: list):
+        '''
+        Creates a vector from a list of 1s and 0s, where index _i_ holds bit
+        _i_.
+        '''
+        return BitVector(int(''.join(str(b) for b in reversed(bits)) or '0', base=2), len(bits))
+
+    def to_list(self) -> list:
+        '''
+        Converts the vector into a list of 1s and 0s, where index _i_ holds bit
+        _i_.
+        '''
+        if self._len == 0:
+            return []
+        return [int(b) for b in reversed(format(self._value, '0'+str(self._len)+'b'))]
+
+    def count(self, bit: int=1) -> int:
+        '''
+        Counts the number of bits equal to `bit`, like `list.count`.
+        '''
+        ones = self._value.bit_count()
+        return ones if bit == 1 else self._len - ones
+
+    def reverse(self):
+        '''
+        Returns a new vector with the order of the bits reversed.
+        '''
+        if self._len == 0:
+            return BitVector()
+        return BitVector(int(format(self._value, '0'+str(self._len)+'b')[::-1], base=2), self._len)
+
+    def _index(self, i: int) -> int:
+        if i < 0:
+            i += self._len
+        if i < 0 or i >= self._len:
+            raise IndexError('bit index out of range')
+        return i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            (start, stop, step) = i.indices(self._len)
+            if step == 1:
+                size = max(stop-start, 0)
+                return BitVector(self._value >> start, size)
+            return BitVector.from_list([(self._value >> j) & 1 for j in range(start, stop, step)])
+        return (self._value >> self._index(i)) & 1
+
+    def __setitem__(self, i: int, bit: int):
+        i = self._index(i)
+        self._value = (self._value & ~(1 << i)) | ((bit & 1) << i)
+
+    @staticmethod
+    def _operand(other):
+        # accepts the same operands in comparisons and bitwise operators
+        if isinstance(other, BitVector):
+            return other
+        if isinstance(other, list) and all(b in (0, 1) for b in other):
+            return BitVector.from_list(other)
+        return None
+
+    def __xor__(self, other):
+        other = BitVector._operand(other)
+        if other is None:
+            return NotImplemented
+        if other._len != self._len:
+            raise ValueError('cannot xor vectors of different lengths')
+        return BitVector(self._value ^ other._value, self._len)
+
+    __rxor__ = __xor__
+
+    def __eq__(self, other) -> bool:
+        vec = BitVector._operand(other)
+        if vec is None:
+            return False if isinstance(other, list) else NotImplemented
+        return self._len == vec._len and self._value == vec._value
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __int__(self) -> int:
+        return self._value
+
+    def __index__(self) -> int:
+        return self._value
+
+    def __repr__(self) -> str:
+        return 'BitVector(' + hex(self._value) + ', ' + str(self._len) + ')'
+    pass
+
+
 class TestGlyph(unittest.TestCase):
     '''
     Test cases for the general glyph code.
@@ -111,6 +309,27 @@ class TestGlyph(unittest.TestCase):
         transmit(message, noise=0, spots=[])
         self.assertEqual(message, [0, 1, 1, 0])
 
+    def test_bits(self):
+        import numpy as np
+        words = np.array([0, 1, 6, 2**64-1], dtype=np.uint64)
+        bits = to_bits(words, 64)
+        self.assertEqual(bits.shape, (4, 64))
+        self.assertEqual(list(bits[2][:4]), [0, 1, 1, 0])
+        self.assertEqual(list(from_bits(bits)), list(words))
+        self.assertEqual(list(from_bits(to_bits(words, 3))), [0, 1, 6, 7])
+
+    def test_check_into(self):
+        import numpy as np
+        self.assertEqual(check_into(bytes(6), np.zeros(12, dtype=np.uint8), 3, 6), 2)
+        with self.assertRaises(ValueError):
+            check_into(bytes(5), np.zeros(12, dtype=np.uint8), 3, 6)
+        with self.assertRaises(ValueError):
+            check_into(bytes(6), np.zeros(11, dtype=np.uint8), 3, 6)
+        out = np.zeros(12, dtype=np.uint8)
+        out.flags.writeable = False
+        with self.assertRaises(ValueError):
+            check_into(bytes(6), out, 3, 6)
+
     def test_get_parity(self):
         # even parity
         check = get_parity([1, 0, 0])
@@ -125,3 +344,56 @@ class TestGlyph(unittest.TestCase):
 
         check = get_parity([1, 0, 1, 1], even=False)
         self.assertEqual(check, 0)
+
+    def test_parity_fast(self):
+        import numpy as np
+        for num in [0, 1, 6, 7, 2**64-1, 2**200+3]:
+            for even in [True, False]:
+                expected = get_parity(pack(num), even=even)
+                self.assertEqual(int_parity(num, even=even), expected)
+                buf = num.to_bytes((num.bit_length()+7)//8 + 3, 'little')
+                self.assertEqual(bytes_parity(buf, even=even), expected)
+                self.assertEqual(bytes_parity(memoryview(bytearray(buf)), even=even), expected)
+        self.assertEqual(bytes_parity(b''), 0)
+        bits = np.array([[1, 0, 0], [1, 0, 1], [0, 0, 0]])
+        self.assertEqual(list(array_parity(bits)), [1, 0, 0])
+        self.assertEqual(list(array_parity(bits, even=False)), [0, 1, 1])
+        self.assertEqual(list(array_parity(bits, axis=0)), [0, 0, 1])
+
+    def test_bit_vector(self):
+        bits = [1, 0, 1, 1, 0, 0, 0, 1, 1]
+        vec = BitVector.from_list(bits)
+        self.assertEqual(len(vec), 9)
+        self.assertEqual(int(vec), 0b110001101)
+        self.assertEqual(vec.to_list(), bits)
+        self.assertEqual(vec, bits)
+        self.assertEqual([vec[i] for i in range(0, 9)], bits)
+        self.assertEqual(vec[-1], 1)
+        self.assertEqual(vec[2:6], bits[2:6])
+        self.assertEqual(vec[::2], bits[::2])
+        self.assertEqual(vec[::-1], bits[::-1])
+        self.assertEqual(vec.reverse(), bits[::-1])
+        self.assertEqual(vec.count(1), 5)
+        self.assertEqual(vec.count(0), 4)
+        self.assertEqual(get_parity(vec), get_parity(bits))
+        self.assertEqual(vec ^ BitVector(0b11, 9), [0, 1] + bits[2:])
+        # lists of bits are operands wherever they compare equal
+        self.assertEqual(vec ^ [1, 1] + [0]*7, [0, 1] + bits[2:])
+        self.assertEqual([1, 1] + [0]*7 ^ vec, [0, 1] + bits[2:])
+        self.assertEqual(vec ^ bits, BitVector(0, 9))
+        self.assertNotEqual(vec, [2] * 9)
+        with self.assertRaises(ValueError):
+            vec ^ [1, 0]
+        with self.assertRaises(TypeError):
+            vec ^ 3
+        vec[1] = 1
+        self.assertEqual(vec[1], 1)
+        with self.assertRaises(IndexError):
+            vec[9]
+        with self.assertRaises(ValueError):
+            vec ^ BitVector(0, 8)
+        # transmitting flips bits in place like a list
+        vec = BitVector(0, 40)
+        transmit(vec, noise=3)
+        self.assertEqual(vec.count(1), 3)
+        self.assertEqual(BitVector(0, 0).to_list(), [])
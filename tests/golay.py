@@ -2,6 +2,137 @@ import glyph as gl
 import random
 import unittest
 
+# generator polynomial of the [23,12] Golay code
+POLY = 0xAE3
+
+# --- Primitives ---------------------------------------------------------------
+
+def _divide(x: int) -> int:
+    '''
+    Divides the low 12 bits of `x` by the generator polynomial one bit at a 
+    time, returning the 11-bit remainder.
+    '''
+    x &= 0xfff
+    for _ in range(0, 12):
+        if x & 0b1:
+            x ^= POLY
+        x = x >> 1
+    return x
+
+
+# remainders for every value of the low 12 bits shifted through the divider
+_REMAINDERS = [_divide(x) for x in range(0, 2**12)]
+
+# bit reversals of 12-bit data words and 11-bit check words
+_REV12 = [int('{:012b}'.format(x)[::-1], 2) for x in range(0, 2**12)]
+_REV11 = [int('{:011b}'.format(x)[::-1], 2) for x in range(0, 2**11)]
+
+
+def rotl(cw: int, n: int) -> int:
+    '''
+    Rotates a 23-bit codeword cw left by n bits.
+    '''
+    n %= 23
+    cw &= 0x7fffff
+    return ((cw << n) | (cw >> (23-n))) & 0x7fffff
+
+
+def rotr(cw: int, n: int) -> int:
+    '''
+    Rotates a 23-bit codeword cw right by n bits.
+    '''
+    n %= 23
+    cw &= 0x7fffff
+    return ((cw >> n) | (cw << (23-n))) & 0x7fffff
+
+
+def weight(cw: int) -> int:
+    '''
+    Calculates the weight of a 23-bit codeword (data+check).
+    '''
+    return (cw & 0xffffff).bit_count()
+
+
+def syndrome(cw: int) -> int:
+    '''
+    Calculates and returns the syndrome of a [23,12] Golay codeword `cw`.
+
+    The bits above the low 12 bits pass through the divider unchanged, so the
+    low 12 bits are resolved with a single table lookup.
+    '''
+    return ((cw >> 12) ^ _REMAINDERS[cw & 0xfff]) << 12
+
+
+def reverse12(x: int) -> int:
+    '''
+    Reverses the order of the bits in a 12-bit word.
+    '''
+    return _REV12[x & 0xfff]
+
+
+def reverse11(x: int) -> int:
+    '''
+    Reverses the order of the bits in an 11-bit word.
+    '''
+    return _REV11[x & 0x7ff]
+
+# ------------------------------------------------------------------------------
+
+# syndrome-to-coset-leader table shared by every codec, built on first use
+_COSET_LEADERS = None
+
+
+def _get_coset_leaders() -> list:
+    '''
+    Returns the 2048-entry table mapping each [23,12] Golay syndrome (shifted
+    down by 12 bits) to its unique error pattern of weight 3 or less.
+    '''
+    global _COSET_LEADERS
+    if _COSET_LEADERS is None:
+        table = [0] * 2048
+        # the code is perfect: every syndrome has exactly one such pattern
+        patterns = [0]
+        for a in range(0, 23):
+            patterns += [1 << a]
+            for b in range(a+1, 23):
+                patterns += [1 << a | 1 << b]
+                for c in range(b+1, 23):
+                    patterns += [1 << a | 1 << b | 1 << c]
+        for e in patterns:
+            table[syndrome(e) >> 12] = e
+        _COSET_LEADERS = table
+    return _COSET_LEADERS
+
+
+# lookup tables for the batch paths, built on first use
+_BATCH_TABLES = None
+
+
+def _get_batch_tables() -> dict:
+    '''
+    Returns the NumPy lookup tables used to encode and decode batches of 
+    words directly from their `data` and `check` bits.
+    '''
+    global _BATCH_TABLES
+    if _BATCH_TABLES is None:
+        import numpy as np
+        code = GolayCodec()
+        leaders = _get_coset_leaders()
+        encodings = [code.encode(d) for d in range(0, 2**12)]
+        _BATCH_TABLES = {
+            'check': np.array([c for (c, _) in encodings], dtype=np.uint16),
+            'parity': np.array([p for (_, p) in encodings], dtype=np.uint8),
+            # syndromes are linear, so the data and check parts are summed
+            'syn_data': np.array([code.syndrome(code.assemble_cw(d, 0)) >> 12 for d in range(0, 2**12)], dtype=np.uint16),
+            'syn_check': np.array([code.syndrome(code.assemble_cw(0, c)) >> 12 for c in range(0, 2**11)], dtype=np.uint16),
+            # error patterns mapped back into the order of the data bits
+            'fix_data': np.array([code.dissamble_cw(e)[0] for e in leaders], dtype=np.uint16),
+            'weight': np.array([code.weight(e) for e in leaders], dtype=np.uint8),
+            'odd': np.array([bin(x).count('1') % 2 for x in range(0, 2**12)], dtype=np.uint8),
+        }
+    return _BATCH_TABLES
+
+
 class GolayCodec:
     '''
     Class to implement the extended Golay code.
@@ -9,14 +140,21 @@ class GolayCodec:
     Much code adapted from Hank Wallace (http://aqdi.com/articles/using-the-golay-error-detection-and-correction-code-3/).
     '''
 
-    POLY = 0xAE3
+    POLY = POLY
 
-    def __init__(self):
+    def __init__(self, table: bool=False):
         '''
         Construct a new Golay Codec instance.
+
+        Set `table` to have `decode` look up error patterns by syndrome rather
+        than perform the systematic search.
         '''
         self.block_len = 24
         self.message_len = 12
+        self.table = table
+        # dense matrices are built on first use
+        self._gen = None
+        self._chk = None
 
     def encode(self, data: int) -> tuple:
         '''
@@ -24,32 +162,17 @@ class GolayCodec:
 
         Returns `(check, parity)`.
         '''
-        # print(bin(data))
-        rev_data = int('{:012b}'.format(data)[::-1], 2)
-        # print('data: ', bin(rev_data)[2:].zfill(12))
-        cw = rev_data & 0xfff
-        for _ in range(0, 12):
-            if cw & 0b1:
-                cw ^= self.POLY
-            cw = cw >> 1
-        # print(bin(cw))
-        rev_cb = int('{:011b}'.format(cw)[::-1], 2)
-        # print(hex(rev_cb))
-        parity = gl.get_parity(gl.pack(rev_cb << 12 | rev_data))
-        # print('check:', bin(rev_cb)[2:].zfill(11))
-        # print(bin(self.assemble_cw(data, rev_cb)))
+        data = int(data)
+        rev_data = reverse12(data)
+        rev_cb = reverse11(_REMAINDERS[rev_data])
+        parity = gl.int_parity(rev_cb << 12 | rev_data)
         return (rev_cb, parity)
 
     def syndrome(self, cw: int) -> int:
         '''
         Calculates and returns the syndrome of a [23,12] Golay codeword `cw`.
         '''
-        for _ in range(0, 12):
-            if cw & 0b1:
-                cw ^= self.POLY
-            cw = cw >> 1
-        syn = cw << 12
-        return syn
+        return syndrome(cw)
     
     def decode(self, data: int, check: int, parity: int) -> tuple:
         '''
@@ -58,6 +181,9 @@ class GolayCodec:
 
         Returns `(message, tec, qed)`.
         '''
+        (data, check, parity) = (int(data), int(check), int(parity))
+        if self.table == True:
+            return self.decode_table(data, check, parity)
         tec = 0
         qed = 0
         # combine into single codeword
@@ -104,7 +230,7 @@ class GolayCodec:
                         if errs > 0 and errs <= 3:
                             tec = 1
                         # perform parity on "corrected" data
-                        par_err = gl.get_parity(gl.pack(cw << 1 | parity))
+                        par_err = gl.int_parity(cw << 1 | parity)
                         if errs >= 3 and par_err:
                             qed = 1
                         elif par_err:
@@ -121,78 +247,233 @@ class GolayCodec:
                 if errs > 0 and errs <= 3:
                     tec = 1
                 # perform parity on "corrected" data
-                par_err = gl.get_parity(gl.pack(cw << 1 | parity))
+                par_err = gl.int_parity(cw << 1 | parity)
                 if errs >= 3 and par_err:
                     qed = 1
                 elif par_err:
                     tec = 1
                 return (self.dissamble_cw(cw)[0], tec, qed)
         # perform parity on "corrected" data
-        par_err = gl.get_parity(gl.pack(cw << 1 | parity))
+        par_err = gl.int_parity(cw << 1 | parity)
         if errs >= 3 and par_err:
             qed = 1
         elif par_err:
             tec = 1
         return (data, tec, qed)
 
+    def decode_table(self, data: int, check: int, parity: int) -> tuple:
+        '''
+        Transforms and formats an encoded Golay block into a decoded message
+        by looking up the error pattern for its syndrome.
+
+        Produces the same results as the systematic search in `decode` with
+        constant work per codeword.
+
+        Returns `(message, tec, qed)`.
+        '''
+        (data, check, parity) = (int(data), int(check), int(parity))
+        tec = 0
+        qed = 0
+        cw = self.assemble_cw(data, check)
+        # remove the most likely error pattern
+        err = _get_coset_leaders()[self.syndrome(cw) >> 12]
+        errs = self.weight(err)
+        cw = cw ^ err
+        if errs > 0:
+            tec = 1
+        # perform parity on "corrected" data
+        par_err = gl.int_parity(cw << 1 | parity)
+        if errs >= 3 and par_err:
+            qed = 1
+        elif par_err:
+            tec = 1
+        return (self.dissamble_cw(cw)[0], tec, qed)
+
+    def get_generator_matrix(self):
+        '''
+        Returns the 12 x 24 generator matrix over GF(2) as a read-only NumPy
+        `uint8` array for blocks laid out as `parity << 23 | check << 12 | data`.
+
+        Row _i_ is the block encoded from the data word with only bit _i_ set.
+        '''
+        import numpy as np
+        if self._gen is None:
+            rows = []
+            for i in range(0, self.message_len):
+                (check, parity) = self.encode(1 << i)
+                rows += [parity << 23 | check << 12 | 1 << i]
+            self._gen = np.array([[(r >> j) & 1 for j in range(0, self.block_len)] for r in rows], dtype=np.uint8)
+            self._gen.flags.writeable = False
+        return self._gen
+
+    def get_parity_check_matrix(self):
+        '''
+        Returns the 12 x 24 parity-check matrix over GF(2) as a read-only NumPy
+        `uint8` array for blocks laid out as `parity << 23 | check << 12 | data`.
+
+        Row 0 checks the overall block parity and rows 1 to 11 give the 
+        syndrome of the [23,12] codeword (lsb first), as computed by 
+        `syndrome`.
+        '''
+        import numpy as np
+        if self._chk is None:
+            cols = []
+            for b in range(0, self.block_len-1):
+                cw = self.assemble_cw((1 << b) & 0xfff, ((1 << b) >> 12) & 0x7ff)
+                cols += [1 | (syndrome(cw) >> 12) << 1]
+            # the parity bit is only covered by the overall parity
+            cols += [1]
+            self._chk = np.array([[(c >> i) & 1 for c in cols] for i in range(0, 12)], dtype=np.uint8)
+            self._chk.flags.writeable = False
+        return self._chk
+
+    def encode_batch(self, data) -> tuple:
+        '''
+        Encodes a NumPy array of 12-bit `data` words at once.
+
+        Returns `(check, parity)` as arrays with the same shape as `data`.
+        '''
+        import numpy as np
+        tables = _get_batch_tables()
+        data = np.asarray(data) & 0xfff
+        return (tables['check'][data], tables['parity'][data])
+
+    def decode_batch(self, data, check, parity) -> tuple:
+        '''
+        Decodes NumPy arrays of `data`, `check` and `parity` words at once, 
+        producing the same results as `decode`.
+
+        Returns `(message, tec, qed)` as arrays with the shape of `data`.
+        '''
+        import numpy as np
+        tables = _get_batch_tables()
+        data = np.asarray(data) & 0xfff
+        check = np.asarray(check) & 0x7ff
+        parity = np.asarray(parity).astype(np.uint8) & 0b1
+        syn = tables['syn_data'][data] ^ tables['syn_check'][check]
+        errs = tables['weight'][syn]
+        # perform parity on "corrected" data
+        par_err = tables['odd'][data] ^ tables['odd'][check] ^ parity ^ (errs & 0b1)
+        qed = ((errs >= 3) & (par_err == 1)).astype(np.uint8)
+        tec = ((errs > 0) | (par_err == 1)).astype(np.uint8)
+        return (data ^ tables['fix_data'][syn], tec, qed)
+
+    def encode_into(self, src, dst, batch: int=2**16) -> int:
+        '''
+        Encodes the bytes of the buffer `src` into the preallocated writable
+        buffer `dst` without modifying `src` or creating objects per block.
+
+        Every 3 bytes of `src` are two 12-bit messages (LSB first) that fill 6
+        bytes of `dst` as two 24-bit blocks laid out as 
+        `parity << 23 | check << 12 | data`. Works on any buffer such as 
+        `bytes`, `bytearray`, `memoryview` or `mmap`, and processes `batch` 
+        pairs of blocks at a time.
+
+        Returns the number of blocks encoded.
+        '''
+        import numpy as np
+        src = np.frombuffer(src, dtype=np.uint8)
+        dst = np.frombuffer(dst, dtype=np.uint8)
+        pairs = gl.check_into(src, dst, 3, 6)
+        for lo in range(0, pairs, batch):
+            hi = min(lo+batch, pairs)
+            data = _unpack_words(src[3*lo:3*hi])
+            (check, parity) = self.encode_batch(data)
+            words = parity.astype(np.uint32) << 23 | check.astype(np.uint32) << 12 | data
+            dst[6*lo:6*hi] = _pack_blocks(words)
+        return 2*pairs
+
+    def decode_into(self, src, dst, batch: int=2**16) -> tuple:
+        '''
+        Decodes the blocks in the buffer `src` into the preallocated writable
+        buffer `dst`, the reverse of `encode_into`.
+
+        Returns `(blocks, corrected, detected)` counts.
+        '''
+        import numpy as np
+        src = np.frombuffer(src, dtype=np.uint8)
+        dst = np.frombuffer(dst, dtype=np.uint8)
+        pairs = gl.check_into(src, dst, 6, 3)
+        corrected = 0
+        detected = 0
+        for lo in range(0, pairs, batch):
+            hi = min(lo+batch, pairs)
+            b = src[6*lo:6*hi].reshape(-1, 3).astype(np.uint32)
+            words = b[:, 0] | b[:, 1] << 8 | b[:, 2] << 16
+            (data, tec, qed) = self.decode_batch(words & 0xfff, (words >> 12) & 0x7ff, words >> 23)
+            dst[3*lo:3*hi] = _pack_words(data)
+            corrected += int(np.count_nonzero(tec))
+            detected += int(np.count_nonzero(qed))
+        return (2*pairs, corrected, detected)
+
     def assemble_cw(self, data: int, check: int):
         '''
         Creates the codeword from data and check bits as _systematic encoding_.
 
         Assumes `data` and `check` are represented msb to lsb.
         '''
-        # print(bin(data), bin(check))
-        rev_data = int('{:012b}'.format(data)[::-1], 2)
-        rev_check = int('{:011b}'.format(check)[::-1], 2)
-        cw = rev_data << 11 | rev_check
-        return cw
+        return reverse12(data) << 11 | reverse11(check)
     
     def dissamble_cw(self, cw: int) -> tuple:
         '''
         Disassembles a codeword back into its data and check bits.
         '''
-        rev_data = cw >> 11
-        rev_check = cw & 0x7ff
-        data = int('{:012b}'.format(rev_data)[::-1], 2)
-        check = int('{:011b}'.format(rev_check)[::-1], 2)
-        return (data, check)
+        return (reverse12(cw >> 11), reverse11(cw & 0x7ff))
     
     def weight(self, cw: int):
         '''
         Calculates the weight of a 23-bit codeword (data+check).
         '''
-        wgt = [0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4]
-
-        bits = 0
-        k = 0
-
-        while k < 6 and cw > 0:
-            bits = bits + wgt[cw & 0xf]
-            cw = cw >> 4
-            k += 1
-        return bits
+        return weight(cw)
     
     def rotl(self, cw: int, n: int):
         '''
         Rotates a 23-bit codeword cw left by n bits.
         '''
-        for _ in range(0, n):
-            if cw & 0x400000 != 0:
-                cw = (cw << 1) | 0b1
-            else:
-                cw = cw << 1
-        return cw & 0x7fffff
+        return rotl(cw, n)
     
     def rotr(self, cw: int, n: int):
         '''
         Rotates a 23-bit codeword cw right by n bits.
         '''
-        for _ in range(0, n):
-            if cw & 0b1 != 0:
-                cw = (cw >> 1) | 0x400000
-            else:
-                cw = cw >> 1
-        return cw & 0x7fffff
+        return rotr(cw, n)
+
+
+def _unpack_words(b):
+    '''
+    Splits a NumPy array of bytes into 12-bit words, two per 3 bytes.
+    '''
+    import numpy as np
+    b = b.reshape(-1, 3).astype(np.uint16)
+    words = np.empty((b.shape[0], 2), dtype=np.uint16)
+    words[:, 0] = b[:, 0] | (b[:, 1] & 0xf) << 8
+    words[:, 1] = b[:, 1] >> 4 | b[:, 2] << 4
+    return words.ravel()
+
+
+def _pack_words(words):
+    '''
+    Joins a NumPy array of 12-bit words into bytes, two per 3 bytes.
+    '''
+    import numpy as np
+    w = words.reshape(-1, 2).astype(np.uint16)
+    b = np.empty((w.shape[0], 3), dtype=np.uint8)
+    b[:, 0] = w[:, 0] & 0xff
+    b[:, 1] = w[:, 0] >> 8 | (w[:, 1] & 0xf) << 4
+    b[:, 2] = w[:, 1] >> 4
+    return b.ravel()
+
+
+def _pack_blocks(words):
+    '''
+    Splits a NumPy array of 24-bit blocks into bytes, three per block.
+    '''
+    import numpy as np
+    b = np.empty((words.shape[0], 3), dtype=np.uint8)
+    b[:, 0] = words & 0xff
+    b[:, 1] = (words >> 8) & 0xff
+    b[:, 2] = words >> 16
+    return b.ravel()
 
 
 class TestGolay(unittest.TestCase):
@@ -232,3 +513,89 @@ class TestGolay(unittest.TestCase):
             self.assertEqual(data_tx, data_rx)
         self.assertEqual(tec, 1 if num_flips > 0 else 0)
         self.assertEqual(qed, 1 if num_flips == 4 else 0)
+
+    def test_decode_table(self):
+        import itertools
+        code = GolayCodec()
+        table = GolayCodec(table=True)
+        # every error pattern of up to 4 bits on a fixed codeword
+        data = 0xa5c
+        (check, parity) = code.encode(data)
+        block = parity << 23 | check << 12 | data
+        for w in range(0, 5):
+            for bits in itertools.combinations(range(0, 24), w):
+                rx = block
+                for b in bits:
+                    rx ^= 1 << b
+                rx = (rx & 0xfff, (rx >> 12) & 0x7ff, rx >> 23)
+                self.assertEqual(table.decode(*rx), code.decode(*rx))
+        # sweeping the check and parity bits covers every syndrome with both
+        # overall parities
+        for data in [0, data]:
+            for e in range(0, 2**12):
+                rx = (data, e & 0x7ff, e >> 11)
+                self.assertEqual(table.decode(*rx), code.decode(*rx))
+
+    def test_batch(self):
+        import numpy as np
+        code = GolayCodec(table=True)
+        data = np.arange(0, 2**12)
+        (check, parity) = code.encode_batch(data)
+        for d in range(0, 2**12):
+            self.assertEqual((int(check[d]), int(parity[d])), code.encode(d))
+        # sweep every syndrome with both overall parities
+        data = np.random.randint(0, 2**12, 2**12)
+        check = np.arange(0, 2**12) & 0x7ff
+        parity = np.arange(0, 2**12) >> 11
+        (data_rx, tec, qed) = code.decode_batch(data, check, parity)
+        for i in range(0, 2**12):
+            rx = code.decode(int(data[i]), int(check[i]), int(parity[i]))
+            self.assertEqual((int(data_rx[i]), int(tec[i]), int(qed[i])), rx)
+
+    def test_bit_vector(self):
+        code = GolayCodec()
+        for data in [0, 0xabc, random.randint(0, 2**12-1)]:
+            (check, parity) = code.encode(gl.BitVector(data, 12))
+            self.assertEqual((check, parity), code.encode(data))
+            rx = (gl.BitVector(data, 12), gl.BitVector(check, 11) ^ gl.BitVector(0b101, 11), parity)
+            self.assertEqual(code.decode(*rx), (data, 1, 0))
+
+    def test_into(self):
+        import numpy as np
+        code = GolayCodec(table=True)
+        src = bytes(random.randrange(0, 256) for _ in range(0, 3*500))
+        dst = bytearray(2*len(src))
+        self.assertEqual(code.encode_into(src, dst, batch=7), 1000)
+        # matches encoding each word
+        words = _unpack_words(np.frombuffer(src, dtype=np.uint8))
+        for (i, data) in enumerate(words[:20]):
+            (check, parity) = code.encode(int(data))
+            self.assertEqual(int.from_bytes(dst[3*i:3*i+3], 'little'), parity << 23 | check << 12 | int(data))
+        # flip 3 bits in every block
+        for i in range(0, 1000):
+            for b in random.sample(range(0, 24), 3):
+                dst[3*i + b//8] ^= 1 << (b % 8)
+        out = bytearray(len(src))
+        self.assertEqual(code.decode_into(memoryview(dst), out, batch=7), (1000, 1000, 0))
+        self.assertEqual(bytes(out), src)
+        with self.assertRaises(ValueError):
+            code.encode_into(src[:-1], dst)
+        with self.assertRaises(ValueError):
+            code.encode_into(src, bytearray(10))
+        with self.assertRaises(ValueError):
+            code.decode_into(bytes(dst), bytes(len(src)))
+
+    def test_matrices(self):
+        import numpy as np
+        code = GolayCodec()
+        gen = code.get_generator_matrix()
+        chk = code.get_parity_check_matrix()
+        # every codeword is in the null space of the parity-check matrix
+        self.assertFalse((gen.astype(int) @ chk.T.astype(int) % 2).any())
+        for _ in range(0, 50):
+            word = random.randint(0, 2**24-1)
+            bits = np.array([(word >> b) & 1 for b in range(0, 24)])
+            checks = chk.astype(int) @ bits % 2
+            cw = code.assemble_cw(word & 0xfff, (word >> 12) & 0x7ff)
+            self.assertEqual(sum(int(c) << i for (i, c) in enumerate(checks[1:])), syndrome(cw) >> 12)
+            self.assertEqual(checks[0], gl.int_parity(word))
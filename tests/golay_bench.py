@@ -0,0 +1,127 @@
+'''
+Microbenchmarks for the Golay code primitives.
+
+Compares the per-call time of the table-driven and single-expression
+primitives in `golay` against the original bit-at-a-time implementations,
+which are kept here as references.
+
+To run the benchmarks, run: `python golay_bench.py`.
+'''
+
+import golay
+import random
+import timeit
+import unittest
+
+
+def ref_rotl(cw: int, n: int) -> int:
+    '''
+    Rotates a 23-bit codeword cw left by n bits, one bit at a time.
+    '''
+    for _ in range(0, n):
+        if cw & 0x400000 != 0:
+            cw = (cw << 1) | 0b1
+        else:
+            cw = cw << 1
+    return cw & 0x7fffff
+
+
+def ref_rotr(cw: int, n: int) -> int:
+    '''
+    Rotates a 23-bit codeword cw right by n bits, one bit at a time.
+    '''
+    for _ in range(0, n):
+        if cw & 0b1 != 0:
+            cw = (cw >> 1) | 0x400000
+        else:
+            cw = cw >> 1
+    return cw & 0x7fffff
+
+
+def ref_weight(cw: int) -> int:
+    '''
+    Calculates the weight of a 23-bit codeword one nibble at a time.
+    '''
+    wgt = [0, 1, 1, 2, 1, 2, 2, 3, 1, 2, 2, 3, 2, 3, 3, 4]
+    bits = 0
+    k = 0
+    while k < 6 and cw > 0:
+        bits = bits + wgt[cw & 0xf]
+        cw = cw >> 4
+        k += 1
+    return bits
+
+
+def ref_syndrome(cw: int) -> int:
+    '''
+    Calculates the syndrome of a 23-bit codeword one bit at a time.
+    '''
+    for _ in range(0, 12):
+        if cw & 0b1:
+            cw ^= golay.POLY
+        cw = cw >> 1
+    return cw << 12
+
+
+def ref_reverse12(x: int) -> int:
+    '''
+    Reverses the bits of a 12-bit word through string formatting.
+    '''
+    return int('{:012b}'.format(x)[::-1], 2)
+
+
+def ref_reverse11(x: int) -> int:
+    '''
+    Reverses the bits of an 11-bit word through string formatting.
+    '''
+    return int('{:011b}'.format(x)[::-1], 2)
+
+
+# (name, reference, primitive, argument generator)
+CASES = [
+    ('rotl', ref_rotl, golay.rotl, lambda: (random.randint(0, 2**23-1), random.randint(0, 23))),
+    ('rotr', ref_rotr, golay.rotr, lambda: (random.randint(0, 2**23-1), random.randint(0, 23))),
+    ('weight', ref_weight, golay.weight, lambda: (random.randint(0, 2**23-1),)),
+    ('syndrome', ref_syndrome, golay.syndrome, lambda: (random.randint(0, 2**23-1),)),
+    ('reverse12', ref_reverse12, golay.reverse12, lambda: (random.randint(0, 2**12-1),)),
+    ('reverse11', ref_reverse11, golay.reverse11, lambda: (random.randint(0, 2**11-1),)),
+]
+
+
+def bench(calls: int=100_000) -> list:
+    '''
+    Times each primitive against its reference over the same random
+    arguments.
+
+    Returns a list of `(name, reference ns/call, primitive ns/call)`.
+    '''
+    results = []
+    for (name, ref, fast, gen) in CASES:
+        args = [gen() for _ in range(0, calls)]
+        t_ref = timeit.timeit(lambda: [ref(*a) for a in args], number=1)
+        t_fast = timeit.timeit(lambda: [fast(*a) for a in args], number=1)
+        results += [(name, t_ref/calls*1e9, t_fast/calls*1e9)]
+    return results
+
+
+class TestGolayPrimitives(unittest.TestCase):
+    '''
+    Test cases comparing the Golay primitives against their references.
+    '''
+
+    def test_primitives(self):
+        for (_, ref, fast, gen) in CASES:
+            for _ in range(0, 2000):
+                args = gen()
+                self.assertEqual(fast(*args), ref(*args))
+
+    def test_syndrome(self):
+        for x in range(0, 2**12):
+            cw = random.randint(0, 2**11-1) << 12 | x
+            self.assertEqual(golay.syndrome(cw), ref_syndrome(cw))
+
+
+if __name__ == '__main__':
+    print('{:<10} {:>14} {:>14} {:>8}'.format('primitive', 'ref (ns/call)', 'new (ns/call)', 'speedup'))
+    for (name, t_ref, t_fast) in bench():
+        print('{:<10} {:>14.1f} {:>14.1f} {:>7.1f}x'.format(name, t_ref, t_fast, t_ref/t_fast))
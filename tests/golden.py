@@ -0,0 +1,322 @@
+'''
+Golden-vector cache for the testbench models.
+
+Precomputes (stimulus, expected outputs) records for a design and its
+generics into a compact binary file, then memory-maps the file so the models
+look up each cycle's vectors by index instead of recomputing them. Files are
+keyed by the design, generics, vector seed and count, so repeated regressions
+reuse them and skip generation entirely.
+
+The vector seed is derived from the simulator's random seed, which changes on
+every run unless pinned: runs rotate through `VECTOR_SETS` vector seeds, so
+successive runs drive different vectors while the cache holds at most that
+many files per design and generics. `$GLYPH_VECTOR_SEED` pins the vector
+seed instead.
+
+File layout: the magic `GLYV`, a 4-byte little-endian header length, a JSON
+header (design, generics, seed, count and field widths in bits), and then
+`count` fixed-size records with each field stored little-endian in the
+fewest whole bytes.
+
+The cache directory is `$GLYPH_GOLDEN_DIR` if set, or else `~/.cache/glyph`.
+Loading a file marks it as used. Whenever new vectors are generated, files
+unused for longer than `MAX_AGE` seconds are deleted, and then the least
+recently used ones until the cache is at most `MAX_BYTES` bytes.
+
+To execute unit tests for this module, run: `python -m unittest golden.py`.
+'''
+
+import hashlib
+import json
+import mmap
+import os
+import random
+import tempfile
+import time
+import unittest
+import unittest.mock
+import glyph as gl
+from hamming import HammingCodec
+
+MAGIC = b'GLYV'
+
+# bump when the generated contents change to invalidate old files
+VERSION = 1
+
+# vector seeds the runs rotate through unless `GLYPH_VECTOR_SEED` is set
+VECTOR_SETS = 16
+
+# limits on the cache kept by `evict`
+MAX_BYTES = 256*2**20
+MAX_AGE = 30*24*60*60
+
+
+def _parity(generics: dict, rng: random.Random):
+    '''
+    Vectors for the `parity` design: `(data, check)`.
+    '''
+    w = generics['W']
+    fields = [('data', w), ('check', 1)]
+    def record():
+        data = rng.randint(0, 2**w-1)
+        return (data, gl.int_parity(data, even=generics['EVEN']))
+    return (fields, record)
+
+
+def _hamming_enc(generics: dict, rng: random.Random):
+    '''
+    Vectors for the `hamming_enc` design: `(data, code)`.
+    '''
+    code = HammingCodec(generics['K'])
+    fields = [('data', code.get_data_bits_len()), ('code', code.get_total_bits_len())]
+    def record():
+        data = rng.randint(0, 2**code.get_data_bits_len()-1)
+        return (data, code.encode_int(data))
+    return (fields, record)
+
+
+# design name -> vector generator
+DESIGNS = {
+    'parity': _parity,
+    'hamming_enc': _hamming_enc,
+}
+
+
+def cache_dir() -> str:
+    '''
+    Returns the directory where golden-vector files are kept.
+    '''
+    return os.environ.get('GLYPH_GOLDEN_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'glyph'))
+
+
+def vector_seed(run_seed: int=None) -> int:
+    '''
+    Returns the seed golden vectors are generated from for a run with the
+    simulator seed `run_seed`: one of `VECTOR_SETS` seeds picked by it (the
+    first without one), unless `GLYPH_VECTOR_SEED` is set.
+    '''
+    if 'GLYPH_VECTOR_SEED' in os.environ:
+        return int(os.environ['GLYPH_VECTOR_SEED'])
+    return 0 if run_seed is None else int(run_seed) % VECTOR_SETS
+
+
+def _is_vector_file(name: str) -> bool:
+    (design, _, rest) = name.partition('-')
+    return design in DESIGNS and rest.endswith('.bin') and len(rest) == 16+4
+
+
+def evict(directory: str, max_bytes: int=MAX_BYTES, max_age: float=MAX_AGE, keep: str=None) -> list:
+    '''
+    Deletes the golden-vector files in `directory` unused for more than
+    `max_age` seconds, then the least recently used ones until the rest take
+    at most `max_bytes`. The file `keep` is never deleted.
+
+    Returns the paths deleted.
+    '''
+    files = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not _is_vector_file(name) or path == keep:
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        files += [(st.st_mtime, st.st_size, path)]
+    # most recently used first
+    files.sort(reverse=True)
+    total = os.path.getsize(keep) if keep is not None and os.path.exists(keep) else 0
+    now = time.time()
+    removed = []
+    for (used, size, path) in files:
+        if now - used > max_age or total + size > max_bytes:
+            try:
+                os.remove(path)
+                removed += [path]
+            except FileNotFoundError:
+                pass
+        else:
+            total += size
+    return removed
+
+
+def key(design: str, generics: dict, seed: int, count: int) -> str:
+    '''
+    Computes the file name identifying a set of golden vectors.
+    '''
+    ident = json.dumps([VERSION, design, sorted(generics.items()), seed, count], default=str)
+    return design + '-' + hashlib.sha1(ident.encode()).hexdigest()[:16] + '.bin'
+
+
+def generate(path: str, design: str, generics: dict, seed: int, count: int):
+    '''
+    Writes `count` golden vectors for the `design` to `path`.
+
+    The file is written next to `path` and renamed into place, so readers
+    never see a partial file.
+    '''
+    rng = random.Random(seed)
+    (fields, record) = DESIGNS[design](generics, rng)
+    header = json.dumps({
+        'design': design,
+        'generics': generics,
+        'seed': seed,
+        'count': count,
+        'fields': fields,
+    }, default=str).encode()
+    sizes = [(bits+7)//8 for (_, bits) in fields]
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + len(header).to_bytes(4, 'little') + header)
+            for _ in range(0, count):
+                f.write(b''.join(v.to_bytes(s, 'little') for (v, s) in zip(record(), sizes)))
+        os.replace(tmp, path)
+    except:
+        os.remove(tmp)
+        raise
+    pass
+
+
+class GoldenVectors:
+    '''
+    Read-only, memory-mapped view of a golden-vector file.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[0:4] != MAGIC:
+            self.close()
+            raise ValueError("'"+path+"' is not a golden-vector file")
+        size = int.from_bytes(self._map[4:8], 'little')
+        self.header = json.loads(self._map[8:8+size])
+        self.fields = [name for (name, _) in self.header['fields']]
+        # byte offset and size of each field within a record
+        self._layout = []
+        offset = 0
+        for (_, bits) in self.header['fields']:
+            self._layout += [(offset, (bits+7)//8)]
+            offset += (bits+7)//8
+        self._start = 8 + size
+        self._stride = offset
+
+    def __len__(self) -> int:
+        return self.header['count']
+
+    def __getitem__(self, i: int) -> tuple:
+        '''
+        Returns the field values of the `i`-th record.
+        '''
+        if i < 0 or i >= len(self):
+            raise IndexError('golden vector index out of range')
+        base = self._start + i*self._stride
+        return tuple(int.from_bytes(self._map[base+o:base+o+s], 'little') for (o, s) in self._layout)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+    pass
+
+
+def load(design: str, generics: dict, seed: int=None, count: int=4096, directory: str=None) -> GoldenVectors:
+    '''
+    Opens the golden vectors for the `design` with `generics` and `seed`
+    (default: `vector_seed()`), generating them first if they are not already
+    in the cache.
+    '''
+    if design not in DESIGNS:
+        raise ValueError("no golden vectors for design '"+design+"'")
+    seed = vector_seed() if seed is None else seed
+    directory = cache_dir() if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, key(design, generics, seed, count))
+    if os.path.exists(path):
+        # mark as recently used for eviction
+        os.utime(path)
+    else:
+        generate(path, design, generics, seed, count)
+        evict(directory, keep=path)
+    return GoldenVectors(path)
+
+
+class TestGolden(unittest.TestCase):
+    '''
+    Test cases for the golden-vector cache.
+    '''
+
+    def test_hamming(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vec = load('hamming_enc', {'K': 32}, seed=9, count=50, directory=tmp)
+            self.assertEqual(vec.fields, ['data', 'code'])
+            code = HammingCodec(32)
+            for i in range(0, len(vec)):
+                (data, block) = vec[i]
+                self.assertEqual(code.encode_int(data), block)
+            with self.assertRaises(IndexError):
+                vec[50]
+            vec.close()
+            with self.assertRaises(ValueError):
+                load('hamming_dec', {'K': 64}, seed=9, directory=tmp)
+
+    def test_reuse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vec = load('parity', {'W': 8, 'EVEN': False}, seed=1, count=100, directory=tmp)
+            first = [vec[i] for i in range(0, len(vec))]
+            inode = os.stat(vec.path).st_ino
+            vec.close()
+            # same key reuses the file, a new seed generates another
+            vec = load('parity', {'W': 8, 'EVEN': False}, seed=1, count=100, directory=tmp)
+            self.assertEqual([vec[i] for i in range(0, len(vec))], first)
+            # a regenerated file would have been renamed into place
+            self.assertEqual(os.stat(vec.path).st_ino, inode)
+            vec.close()
+            vec = load('parity', {'W': 8, 'EVEN': False}, seed=2, count=100, directory=tmp)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+            vec.close()
+            # a pinned vector seed does not depend on the simulator seed
+            with unittest.mock.patch.dict(os.environ, {'GLYPH_VECTOR_SEED': '2'}):
+                self.assertEqual(vector_seed(12345), 2)
+                vec = load('parity', {'W': 8, 'EVEN': False}, count=100, directory=tmp)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+            for (data, check) in [vec[i] for i in range(0, len(vec))]:
+                self.assertEqual((bin(data).count('1') + check) % 2, 1)
+            vec.close()
+
+    def test_rotate(self):
+        # runs draw from a bounded set of vector seeds
+        with unittest.mock.patch.dict(os.environ):
+            os.environ.pop('GLYPH_VECTOR_SEED', None)
+            seeds = [vector_seed(s) for s in range(1000, 1100)]
+            self.assertEqual(len(set(seeds)), VECTOR_SETS)
+            self.assertEqual(vector_seed(1000), vector_seed(1000+VECTOR_SETS))
+            self.assertEqual(vector_seed(), 0)
+            with tempfile.TemporaryDirectory() as tmp:
+                sets = []
+                for s in range(0, 2*VECTOR_SETS):
+                    vec = load('parity', {'W': 16, 'EVEN': True}, vector_seed(s), 64, tmp)
+                    sets += [[vec[i] for i in range(0, len(vec))]]
+                    vec.close()
+                self.assertEqual(len(os.listdir(tmp)), VECTOR_SETS)
+                self.assertNotEqual(sets[0], sets[1])
+                self.assertEqual(sets[0], sets[VECTOR_SETS])
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for seed in range(0, 4):
+                vec = load('parity', {'W': 8, 'EVEN': True}, seed=seed, count=100, directory=tmp)
+                paths += [vec.path]
+                vec.close()
+            other = os.path.join(tmp, 'notes.txt')
+            open(other, 'w').close()
+            size = os.path.getsize(paths[0])
+            now = time.time()
+            for (i, path) in enumerate(paths):
+                os.utime(path, (now-i*60, now-i*60))
+            # the oldest file is too old, and the next does not fit
+            self.assertEqual(evict(tmp, max_bytes=2*size, max_age=150), [paths[2], paths[3]])
+            self.assertEqual(sorted(os.listdir(tmp)), sorted([os.path.basename(paths[0]), os.path.basename(paths[1]), 'notes.txt']))
+            self.assertEqual(evict(tmp, max_bytes=0, keep=paths[1]), [paths[0]])
+            self.assertTrue(os.path.exists(paths[1]))
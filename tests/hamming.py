@@ -48,6 +48,28 @@ class HammingCodec:
         '''
         self.data_bits = k
         self.parity_bits = HammingCodec.get_parity_bits(k)
+        # precompute the indices covered by each parity bit along with their
+        # integer bitmasks so parities reduce to a masked popcount
+        total = self.get_total_bits_len()
+        self._coverage = tuple(
+            tuple(j for j in range(0, total) if (j >> i) & 1)
+            for i in range(0, self.parity_bits)
+        )
+        self._masks = tuple(sum(1 << j for j in cov) for cov in self._coverage)
+        # data bits occupy the contiguous runs between the power-of-2 indices,
+        # so each run is scattered/gathered as `(position, length, offset)`
+        runs = []
+        offset = 0
+        for i in range(1, self.parity_bits+1):
+            start = 2**(i-1)+1
+            length = min(2**i, total) - start
+            if length > 0:
+                runs += [(start, length, offset)]
+                offset += length
+        self._runs = tuple(runs)
+        # dense matrices are built on first use by the batch paths
+        self._gen = None
+        self._chk = None
 
     @staticmethod
     def get_parity_bits(k: int):
@@ -91,19 +113,10 @@ class HammingCodec:
 
         Includes setting the overall parity of the block at 0th bit.
         '''
+        word = HammingCodec._to_word(block)
         # questions to capture redundancy for each parity bit
-        parities = []
         for i in range(0, self.get_parity_bits_len()):
-            coverage = self._get_parity_coverage(i)
-            # print('p:', i, coverage)
-            # print(block)
-            data_bits = [block[j] for j in coverage]
-            # data_bits = [block[j] for j in coverage]
-            # print('group', i, data_bits)
-            block[2**i] = gl.get_parity(data_bits)
-            parities += [block[2**i]]
-            pass
-        # print('parities', parities)
+            block[2**i] = self._get_parity(word, i)
         # set overall parity for SECDED
         block[0] = gl.get_parity(block)
         return block
@@ -113,26 +126,244 @@ class HammingCodec:
         '''
         Returns the list of indices covered by the i-th parity bit.
         '''
-        space = gl.get_bin_space(self.get_total_bits_len())
-        # print(space)
-        subset = []
-        # check the i-th bit positions
-        for s in space:
-            if s[self.get_parity_bits_len()-i-1] == '1':
-                subset += [s]
-        # convert from binary to decimal for target indices
-        return [int('0b'+x, base=2) for x in subset]
+        return list(self._coverage[i])
+
+
+    def _get_parity(self, word: int, i: int) -> int:
+        '''
+        Computes the even parity of the bits in `word` covered by the i-th 
+        parity bit.
+        '''
+        return (word & self._masks[i]).bit_count() & 1
+
+
+    def _get_syndrome(self, word: int) -> int:
+        '''
+        Computes the index pinpointed by the parity bits for the block `word`.
+        '''
+        syn = 0
+        for (i, mask) in enumerate(self._masks):
+            syn |= ((word & mask).bit_count() & 1) << i
+        return syn
+
+
+    @staticmethod
+    def _to_word(block: List[int]) -> int:
+        '''
+        Converts a block of bits (index 0 is the lsb) into an integer.
+        '''
+        return int(''.join(str(b) for b in reversed(block)) or '0', base=2)
 
 
     def encode(self, message: List[int]) -> List[int]:
         '''
         Transforms and formats a plain `message` into an encoded hamming-code
         block.
+
+        A `glyph.BitVector` message is encoded into a `BitVector` block.
         '''
+        if isinstance(message, gl.BitVector):
+            return gl.BitVector(self.encode_int(int(message)), self.get_total_bits_len())
         block = self._create_hamming_block(message)
         return self._encode_hamming_ecc(block)
 
 
+    def encode_int(self, data: int) -> int:
+        '''
+        Transforms a plain `data` word into an encoded hamming-code block 
+        without building any intermediate lists.
+
+        Bit _i_ of the returned block is the _i_-th entry of the list returned
+        by `encode`.
+        '''
+        # scatter the data bits around the parity positions
+        code = 0
+        for (start, length, offset) in self._runs:
+            code |= ((data >> offset) & ((1 << length)-1)) << start
+        # set each parity bit
+        for i in range(0, self.get_parity_bits_len()):
+            code |= self._get_parity(code, i) << 2**i
+        # set overall parity for SECDED
+        return code | (code.bit_count() & 1)
+
+
+    def decode_int(self, code: int) -> Tuple[int, int, int]:
+        '''
+        Transforms an encoded hamming-code block `code` into a decoded data
+        word without building any intermediate lists.
+
+        Returns `(data, sec, ded)`.
+        '''
+        syn = self._get_syndrome(code)
+        sec = 0
+        ded = 0
+        if code.bit_count() & 1 == 0:
+            ded = 1 if syn > 0 else 0
+        else:
+            sec = 1
+            # an index out of range means there were errors > 2
+            if syn < self.get_total_bits_len():
+                code ^= 1 << syn
+        # gather the data bits from between the parity positions
+        data = 0
+        for (start, length, offset) in self._runs:
+            data |= ((code >> start) & ((1 << length)-1)) << offset
+        return (data, sec, ded)
+
+
+    def get_generator_matrix(self):
+        '''
+        Returns the K x N generator matrix over GF(2) as a read-only NumPy 
+        `uint8` array.
+
+        Row _i_ is the block encoded from the data word with only bit _i_ set,
+        using the same bit layout as `encode`.
+        '''
+        import numpy as np
+        if self._gen is None:
+            n = self.get_total_bits_len()
+            rows = [self.encode_int(1 << i) for i in range(0, self.get_data_bits_len())]
+            self._gen = np.array([[(r >> j) & 1 for j in range(0, n)] for r in rows], dtype=np.uint8)
+            self._gen.flags.writeable = False
+        return self._gen
+
+
+    def get_parity_check_matrix(self):
+        '''
+        Returns the (P+1) x N parity-check matrix over GF(2) as a read-only 
+        NumPy `uint8` array.
+
+        Row 0 checks the overall block parity and row _i_+1 checks the bits
+        covered by the _i_-th parity bit, so the product with a block gives 
+        its overall parity followed by the syndrome (lsb first).
+        '''
+        import numpy as np
+        if self._chk is None:
+            n = self.get_total_bits_len()
+            rows = [(1 << n)-1] + list(self._masks)
+            self._chk = np.array([[(r >> j) & 1 for j in range(0, n)] for r in rows], dtype=np.uint8)
+            self._chk.flags.writeable = False
+        return self._chk
+
+
+    def encode_batch(self, data):
+        '''
+        Encodes N data words at once as a single GF(2) product with the 
+        generator matrix.
+
+        Accepts either an (N, K) array of bits, where column _i_ is the _i_-th
+        message bit, or an (N,) array of packed integers. Returns an (N, N_b)
+        `uint8` array of blocks for bits, or an (N,) `uint64` array of packed
+        blocks for integers (which requires a block size <= 64).
+        '''
+        import numpy as np
+        data = np.asarray(data)
+        packed = data.ndim == 1
+        if packed:
+            if self.get_total_bits_len() > 64:
+                raise ValueError('packed blocks must be at most 64 bits')
+            data = gl.to_bits(data, self.get_data_bits_len())
+        elif data.ndim != 2 or data.shape[1] != self.get_data_bits_len():
+            raise ValueError('expected an (N, '+str(self.get_data_bits_len())+') array of bits')
+        blocks = _gf2_matmul(data, self.get_generator_matrix())
+        return gl.from_bits(blocks) if packed else blocks
+
+
+    def decode_batch(self, blocks):
+        '''
+        Decodes N blocks at once with a single product against the 
+        parity-check matrix.
+
+        Accepts either an (N, N_b) array of bits, where column _i_ is the 
+        _i_-th block bit, or an (N,) array of packed integers (which requires
+        a block size <= 64). The input is left unmodified.
+
+        Returns `(data, sec, ded)` where `data` is an (N, K) `uint8` array of 
+        bits or an (N,) `uint64` array of packed words (matching the input), 
+        and `sec` and `ded` are (N,) `uint8` arrays of flags.
+        '''
+        import numpy as np
+        blocks = np.asarray(blocks)
+        n = self.get_total_bits_len()
+        packed = blocks.ndim == 1
+        if packed:
+            if n > 64:
+                raise ValueError('packed blocks must be at most 64 bits')
+            blocks = gl.to_bits(blocks, n)
+        elif blocks.ndim != 2 or blocks.shape[1] != n:
+            raise ValueError('expected an (N, '+str(n)+') array of bits')
+        else:
+            blocks = blocks.astype(np.uint8)
+        checks = _gf2_matmul(blocks, self.get_parity_check_matrix().T)
+        par_block = checks[:, 0]
+        syn = checks[:, 1:].astype(np.int64) @ (1 << np.arange(self.get_parity_bits_len(), dtype=np.int64))
+        sec = par_block
+        ded = ((par_block == 0) & (syn > 0)).astype(np.uint8)
+        # fix blocks at the pinpointed error index (out of range means errors > 2)
+        fix = np.nonzero((sec == 1) & (syn < n))[0]
+        blocks[fix, syn[fix]] ^= 1
+        data = blocks[:, self._get_data_indices()]
+        return (gl.from_bits(data) if packed else data, sec, ded)
+
+
+    def encode_into(self, src, dst, batch: int=4096) -> int:
+        '''
+        Encodes the bytes of the buffer `src` into the preallocated writable 
+        buffer `dst` without modifying `src` or creating objects per block.
+
+        Every K bytes of `src` are 8 messages that fill N_b bytes of `dst`,
+        with the bits of each message and block stored LSB first. Works on any 
+        buffer such as `bytes`, `bytearray`, `memoryview` or `mmap`, and 
+        processes `batch` groups of 8 blocks at a time.
+
+        Returns the number of blocks encoded.
+        '''
+        import numpy as np
+        (k, n) = (self.get_data_bits_len(), self.get_total_bits_len())
+        src = np.frombuffer(src, dtype=np.uint8)
+        dst = np.frombuffer(dst, dtype=np.uint8)
+        groups = gl.check_into(src, dst, k, n)
+        for lo in range(0, groups, batch):
+            hi = min(lo+batch, groups)
+            bits = np.unpackbits(src[lo*k:hi*k], bitorder='little').reshape(-1, k)
+            dst[lo*n:hi*n] = np.packbits(self.encode_batch(bits), bitorder='little')
+        return 8*groups
+
+
+    def decode_into(self, src, dst, batch: int=4096) -> Tuple[int, int, int]:
+        '''
+        Decodes the blocks in the buffer `src` into the preallocated writable
+        buffer `dst`, the reverse of `encode_into`.
+
+        Returns `(blocks, corrected, detected)` counts.
+        '''
+        import numpy as np
+        (k, n) = (self.get_data_bits_len(), self.get_total_bits_len())
+        src = np.frombuffer(src, dtype=np.uint8)
+        dst = np.frombuffer(dst, dtype=np.uint8)
+        groups = gl.check_into(src, dst, n, k)
+        corrected = 0
+        detected = 0
+        for lo in range(0, groups, batch):
+            hi = min(lo+batch, groups)
+            bits = np.unpackbits(src[lo*n:hi*n], bitorder='little').reshape(-1, n)
+            (data, sec, ded) = self.decode_batch(bits)
+            dst[lo*k:hi*k] = np.packbits(data, bitorder='little')
+            corrected += int(np.count_nonzero(sec))
+            detected += int(np.count_nonzero(ded))
+        return (8*groups, corrected, detected)
+
+
+    def _get_data_indices(self) -> List[int]:
+        '''
+        Returns the block indices holding the data bits, in message order.
+        '''
+        indices = []
+        for (start, length, _) in self._runs:
+            indices += list(range(start, start+length))
+        return indices
+
+
     def _destroy_hamming_block(self, chunk: List[int]) -> List[int]:
         '''
         Pops parity bits at the corresponding power-of-2 indices, revealing
@@ -152,8 +383,13 @@ class HammingCodec:
         Transforms and formats an encoded hamming-code `block` into a decoded 
         message.
 
+        A `glyph.BitVector` block is decoded into a `BitVector` message.
+
         Returns `(message, sec, ded)`.
         '''
+        if isinstance(block, gl.BitVector):
+            (data, sec, ded) = self.decode_int(int(block))
+            return (gl.BitVector(data, self.get_data_bits_len()), sec, ded)
         (block, sec, ded) = self._decode_hamming_ecc(block)
         return (self._destroy_hamming_block(block), sec, ded)
 
@@ -166,27 +402,16 @@ class HammingCodec:
         
         Returns the fixed block and the valid signal.
         '''
-        # answer the question for each parity bit
-        answer = ''
+        word = HammingCodec._to_word(block)
         # block parity
-        par_block = gl.get_parity(block)
-        # questions to capture redundancy for each parity bit
-        for i in range(self.get_parity_bits_len()-1, -1, -1):
-            coverage = self._get_parity_coverage(i)
-            data_bits = [block[j] for j in coverage]
-            parity = gl.get_parity(data_bits)
-            if parity == 0:
-                # rule out the space
-                answer += '0'
-            else:
-                # include this space
-                answer += '1'
-            pass
+        par_block = word.bit_count() & 1
+        # answer the question for each parity bit
+        syn = self._get_syndrome(word)
 
         # determine if there are unrecoverable errors or zero errors
         if par_block == 0:
             # check if two errors were detected
-            if answer.count('1') > 0:
+            if syn > 0:
                 # print("info: Detected a double-bit error (unrecoverable)")
                 return (block, 0, 1)
             # check if there were zero errors
@@ -195,12 +420,9 @@ class HammingCodec:
                 return (block, 0, 0)
 
         # otherwise, use the parity bits to pinpoint location of error to correct
-        i = int('0b'+answer, base=2)
-        # print("info: Error index:", i, "("+answer+")")
-
         # fix block at the pinpointed error index according to parity bits
         try:
-            block[i] ^= 1
+            block[syn] ^= 1
         except:
             # if list index is out of range, then it was errors > 2
             pass
@@ -208,6 +430,16 @@ class HammingCodec:
     pass
 
 
+def _gf2_matmul(a, b):
+    '''
+    Computes the product of bit matrices `a` and `b` over GF(2).
+    '''
+    import numpy as np
+    # float32 routes through BLAS and is exact for sums below 2^24
+    prod = a.astype(np.float32) @ b.astype(np.float32)
+    return (prod.astype(np.int32) & 1).astype(np.uint8)
+
+
 def total_bits(parities: int) -> int:
     '''
     Computes the number of total bits in the encoded hamming block.
@@ -332,4 +564,124 @@ class TestHamming(unittest.TestCase):
     Test cases for the Hamming Codec.
     '''
 
+    def test_parity_coverage(self):
+        for k in [1, 4, 11, 26, 32, 57, 64, 120]:
+            code = HammingCodec(k)
+            space = gl.get_bin_space(code.get_total_bits_len())
+            for i in range(0, code.get_parity_bits_len()):
+                expected = [int('0b'+s, base=2) for s in space if s[code.get_parity_bits_len()-i-1] == '1']
+                self.assertEqual(code._get_parity_coverage(i), expected)
+
+    def test_codec(self):
+        code = HammingCodec(4)
+        for m in range(0, 2**4):
+            message = gl.pack(m, 4)[::-1]
+            block = code.encode(message.copy())
+            self.assertEqual(len(block), 8)
+            self.assertEqual(gl.get_parity(block), 0)
+            # no errors
+            self.assertEqual(code.decode(block.copy()), (message, 0, 0))
+            for i in range(0, len(block)):
+                # single-bit errors are corrected
+                self.assertEqual(code.decode(gl.transmit(block.copy(), spots=[i])), (message, 1, 0))
+                # double-bit errors are detected
+                for j in range(i+1, len(block)):
+                    (_, sec, ded) = code.decode(gl.transmit(block.copy(), spots=[i, j]))
+                    self.assertEqual((sec, ded), (0, 1))
+
+    def test_encode_batch(self):
+        import numpy as np
+        for k in [1, 4, 11, 26, 32, 57, 120]:
+            code = HammingCodec(k)
+            words = [random.randint(0, 2**k-1) for _ in range(0, 50)]
+            bits = np.array([gl.pack(w, k)[::-1] for w in words], dtype=np.uint8)
+            blocks = code.encode_batch(bits)
+            for (w, b) in zip(words, blocks):
+                self.assertEqual(list(b), code.encode(gl.pack(w, k)[::-1]))
+            if code.get_total_bits_len() <= 64:
+                packed = code.encode_batch(np.array(words, dtype=np.uint64))
+                self.assertEqual([int(p) for p in packed], [code.encode_int(w) for w in words])
+        with self.assertRaises(ValueError):
+            HammingCodec(64).encode_batch(np.zeros(4, dtype=np.uint64))
+
+    def test_decode_batch(self):
+        import numpy as np
+        for k in [1, 4, 11, 26, 32, 57, 120]:
+            code = HammingCodec(k)
+            n = code.get_total_bits_len()
+            self.assertFalse(_gf2_matmul(code.get_generator_matrix(), code.get_parity_check_matrix().T).any())
+            words = [random.randint(0, 2**k-1) for _ in range(0, 60)]
+            rx = []
+            for w in words:
+                block = code.encode_int(w)
+                for s in random.sample(range(0, n), random.randint(0, min(5, n))):
+                    block ^= 1 << s
+                rx += [block]
+            bits = np.array([gl.pack(b, n)[::-1] for b in rx], dtype=np.uint8)
+            original = bits.copy()
+            (data, sec, ded) = code.decode_batch(bits)
+            self.assertTrue((bits == original).all())
+            for (b, d, s, e) in zip(rx, data, sec, ded):
+                self.assertEqual(code.decode(gl.pack(b, n)[::-1]), (list(d), s, e))
+            if n <= 64:
+                (data, sec, ded) = code.decode_batch(np.array(rx, dtype=np.uint64))
+                for (b, d, s, e) in zip(rx, data, sec, ded):
+                    self.assertEqual(code.decode_int(b), (d, s, e))
+
+    def test_bit_vector(self):
+        for k in [1, 11, 100]:
+            code = HammingCodec(k)
+            n = code.get_total_bits_len()
+            for _ in range(0, 50):
+                message = [random.randint(0, 1) for _ in range(0, k)]
+                block = code.encode(gl.BitVector.from_list(message))
+                self.assertIsInstance(block, gl.BitVector)
+                self.assertEqual(block, code.encode(message.copy()))
+                rx = gl.transmit(block, noise=random.randint(0, 2))
+                (data, sec, ded) = code.decode(rx)
+                self.assertEqual((data, sec, ded), code.decode(rx.to_list()))
+                if ded == 0:
+                    self.assertEqual(data, message)
+
+    def test_into(self):
+        for k in [4, 26, 120]:
+            code = HammingCodec(k)
+            n = code.get_total_bits_len()
+            src = bytes(random.randrange(0, 256) for _ in range(0, k*30))
+            dst = bytearray(n*30)
+            self.assertEqual(code.encode_into(memoryview(src), dst, batch=4), 240)
+            # matches encoding each message
+            bits = [(src[i//8] >> (i % 8)) & 1 for i in range(0, 8*len(src))]
+            rx = [(dst[i//8] >> (i % 8)) & 1 for i in range(0, 8*len(dst))]
+            for b in range(0, 240):
+                self.assertEqual(rx[b*n:(b+1)*n], code.encode(bits[b*k:(b+1)*k]))
+            # flip one bit in every block
+            for b in range(0, 240):
+                i = b*n + random.randrange(0, n)
+                dst[i//8] ^= 1 << (i % 8)
+            out = bytearray(len(src))
+            self.assertEqual(code.decode_into(dst, out, batch=4), (240, 240, 0))
+            self.assertEqual(bytes(out), src)
+            with self.assertRaises(ValueError):
+                code.encode_into(src[:-1], dst)
+            with self.assertRaises(ValueError):
+                code.decode_into(dst, bytes(len(src)))
+
+    def test_codec_int(self):
+        for k in [1, 4, 11, 26, 32, 57, 64, 120, 247]:
+            code = HammingCodec(k)
+            n = code.get_total_bits_len()
+            for _ in range(0, 20):
+                data = random.randint(0, 2**k-1)
+                message = gl.pack(data, k)[::-1]
+                block = code.encode(message.copy())
+                word = code.encode_int(data)
+                self.assertEqual(word, gl.unpack(block[::-1]))
+                for flips in range(0, 4):
+                    spots = random.sample(range(0, n), flips)
+                    (message_rx, sec, ded) = code.decode(gl.transmit(block.copy(), spots=spots))
+                    rx = word
+                    for s in spots:
+                        rx ^= 1 << s
+                    self.assertEqual(code.decode_int(rx), (gl.unpack(message_rx[::-1]), sec, ded))
     pass
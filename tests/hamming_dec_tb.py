@@ -1,6 +1,5 @@
 from hamming import HammingCodec
-import glyph as gl
-import random
+from stimulus import Lookahead, HammingDecStimulus, CoverageScheduler, write_result, hamming_dec_coverage, CODE_STEPS
 from verb import Logics
 import cocotb
 import verb as vb
@@ -18,8 +17,8 @@ class HammingDec(Model):
         super().mirror()
         self._code = HammingCodec(self.K.value)
         vb.debug('HAMMING CODE: ('+str(self._code.get_total_bits_len())+', '+str(self._code.get_data_bits_len())+')')
-        self._secret = 0
-        self._packet = None
+        # stimulus and expected results are produced ahead in batches
+        self._queue = Lookahead(HammingDecStimulus(self._code, seed=cocotb.RANDOM_SEED))
 
     def define_coverage(self):
         from verb.coverage import CoverPoint, CoverRange
@@ -28,7 +27,7 @@ class HammingDec(Model):
             name='code',
             goal=1,
             span=self.code.span(),
-            max_steps=16,
+            max_steps=CODE_STEPS,
             target=self.code
         )
 
@@ -53,26 +52,22 @@ class HammingDec(Model):
 
         super().cover()
 
+        # direct the stimulus toward the bins that are still open
+        (goals, classify) = hamming_dec_coverage(self._code.get_total_bits_len())
+        self._queue.scheduler = CoverageScheduler(goals, classify, seed=cocotb.RANDOM_SEED)
+
     async def setup(self):
         while vb.running():
-            self._secret = Logics(random.randint(0, self.data.max()), self._code.get_data_bits_len())
-            block = self._code.encode([int(i) for i in str(self._secret)][::-1])
-            # print('msg (tx):', self._secret)
-            # print('block (tx):', block)
-            # choose some bits to flip (or none) by injecting noise
-            self._packet = gl.transmit(block, noise=random.randint(0, 2))
-            # print('block (rx):', self._packet)
-
-            self.code.value = Logics(self._packet[::-1])
-
+            # the packet carries 0, 1 or 2 bits flipped by noise
+            (packet, _, _, _) = self._queue.next()
+            self.code.value = Logics(packet, self._code.get_total_bits_len())
             await vb.falling_edge()
 
     async def model(self):
         while vb.running():
             await vb.rising_edge()
-            decoding, sec, ded = self._code.decode(self._packet)
-            secret = Logics(decoding[::-1], self._code.get_data_bits_len())
-            # print('msg (rx):', secret)
+            (_, data, sec, ded) = self._queue.current
+            secret = Logics(data, self._code.get_data_bits_len())
 
             self.sec.value = sec
             self.ded.value = ded
@@ -94,4 +89,6 @@ async def test(top):
         cocotb.start_soon(mdl.model())
     )
 
-    vb.complete()
\ No newline at end of file
+    vb.complete()
+    # report the stimulus coverage to the regression runner
+    write_result(mdl._queue.scheduler)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from hamming import HammingCodec
-import glyph as gl
+import golden
+from stimulus import Lookahead, GoldenStimulus, CoverageScheduler, write_result, hamming_enc_coverage, RANGE_STEPS
 
 import cocotb
 import verb as vb
@@ -15,6 +16,8 @@ class HammingEnc(Model):
         super().mirror()
         self._code = HammingCodec(self.K.value)
         vb.debug('HAMMING CODE: ('+str(self._code.get_total_bits_len())+', '+str(self._code.get_data_bits_len())+')')
+        vectors = golden.load('hamming_enc', {'K': self.K.value}, golden.vector_seed(cocotb.RANDOM_SEED))
+        self._queue = Lookahead(GoldenStimulus(vectors))
 
     def define_coverage(self):
         from verb.coverage import CoverRange
@@ -23,21 +26,27 @@ class HammingEnc(Model):
             name='message range',
             span=self.data.span(),
             goal=1,
+            max_steps=RANGE_STEPS,
             target=self.data
         )
 
         super().cover()
 
+        # direct the stimulus toward the bins that are still open
+        (goals, classify) = hamming_enc_coverage(self._code.get_data_bits_len())
+        self._queue.scheduler = CoverageScheduler(goals, classify, seed=cocotb.RANDOM_SEED)
+
     async def setup(self):
         while vb.running():
-            self.randomize()
+            (data, _) = self._queue.next()
+            self.data.value = Logics(data, self._code.get_data_bits_len())
             await vb.falling_edge()
 
     async def model(self):
         while vb.running():
             await vb.rising_edge()
-            bits = self._code.encode(gl.pack(int(self.data.value), self.K.value)[::-1])
-            vb.assert_eq(self.code.get_handle(), Logics(bits[::-1]))
+            (_, word) = self._queue.current
+            vb.assert_eq(self.code.get_handle(), Logics(word, self._code.get_total_bits_len()))
 
 
 @cocotb.test()
@@ -55,4 +64,6 @@ async def test(top):
         cocotb.start_soon(mdl.model())
     )
 
-    vb.complete()
\ No newline at end of file
+    vb.complete()
+    # report the stimulus coverage to the regression runner
+    write_result(mdl._queue.scheduler)
\ No newline at end of file
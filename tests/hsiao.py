@@ -0,0 +1,382 @@
+'''
+Python behavioral model for a Hsiao single error correction, double error
+detection (SECDED) code.
+
+Like the extended Hamming code in `hamming.py`, K data bits are protected by
+R check bits. Every column of the parity-check matrix has an odd weight: the
+check bits use the weight-1 columns, and the data bits use distinct columns
+of weight 3, then 5, and so on, chosen so every row checks nearly the same
+number of bits. A single error leaves an odd-weight syndrome that matches its
+column, while a double error leaves a non-zero even-weight syndrome. So no
+separate overall parity over the whole block is needed, and each check is an
+XOR over roughly K x 3 / R bits instead of half the block.
+
+Blocks are systematic: index _i_ < K holds data bit _i_ and index K + _j_
+holds check bit _j_.
+
+Usage: `python hsiao.py 8 16 32 64 128` to compare the check logic against
+`HammingCodec`.
+
+To execute unit tests for this module, run: `python -m unittest hsiao.py`.
+
+References:
+- M. Y. Hsiao, "A Class of Optimal Minimum Odd-weight-column SEC-DED Codes",
+ IBM Journal of Research and Development, 1970.
+'''
+
+import argparse
+import itertools
+import math
+import random
+import unittest
+from typing import List
+from typing import Tuple
+import glyph as gl
+from hamming import HammingCodec, _gf2_matmul
+
+
+class HsiaoCodec:
+
+    def __init__(self, k: int):
+        '''
+        Construct a new Hsiao Codec instance.
+        '''
+        if k < 1:
+            raise ValueError('data width must be positive')
+        self.data_bits = k
+        self.check_bits = HsiaoCodec.get_check_bits(k)
+        r = self.check_bits
+        self._columns = tuple(HsiaoCodec._choose_columns(k, r)) + tuple(1 << j for j in range(0, r))
+        # bitmask over the block of the bits checked by each row
+        self._rows = tuple(
+            sum(1 << i for (i, col) in enumerate(self._columns) if (col >> j) & 1)
+            for j in range(0, r)
+        )
+        # block position of each single-error syndrome
+        self._positions = dict((col, i) for (i, col) in enumerate(self._columns))
+        # dense matrices and tables are built on first use by the batch paths
+        self._gen = None
+        self._chk = None
+        self._fix = None
+
+    @staticmethod
+    def get_check_bits(k: int) -> int:
+        '''
+        Finds _R_, the fewest check bits with at least K distinct odd-weight
+        columns of weight 3 or more.
+        '''
+        r = 3
+        while sum(math.comb(r, w) for w in range(3, r+1, 2)) < k:
+            r += 1
+        return r
+
+    @staticmethod
+    def _choose_columns(k: int, r: int) -> List[int]:
+        '''
+        Chooses the K data columns from the lightest odd weights, balancing the
+        number of bits checked by each row.
+        '''
+        columns = []
+        load = [0] * r
+        w = 3
+        while len(columns) < k:
+            candidates = [sum(1 << j for j in c) for c in itertools.combinations(range(0, r), w)]
+            if len(columns) + len(candidates) <= k:
+                # a whole weight class loads every row equally
+                columns += candidates
+                for j in range(0, r):
+                    load[j] += math.comb(r-1, w-1)
+            else:
+                # greedily take the column that keeps the heaviest rows lightest
+                while len(columns) < k:
+                    def cost(col):
+                        rows = [load[j] + ((col >> j) & 1) for j in range(0, r)]
+                        return (max(rows), sum(x*x for x in rows))
+                    best = min(candidates, key=cost)
+                    candidates.remove(best)
+                    columns += [best]
+                    for j in range(0, r):
+                        load[j] += (best >> j) & 1
+            w += 2
+        return columns
+
+    def get_total_bits_len(self) -> int:
+        return self.data_bits+self.check_bits
+
+    def get_parity_bits_len(self) -> int:
+        return self.check_bits
+
+    def get_data_bits_len(self) -> int:
+        return self.data_bits
+
+    def get_row_weights(self) -> List[int]:
+        '''
+        Returns the number of block bits checked by each row.
+        '''
+        return [row.bit_count() for row in self._rows]
+
+    def _get_syndrome(self, word: int) -> int:
+        '''
+        Computes the syndrome of the block `word` (row _j_ at bit _j_).
+        '''
+        syn = 0
+        for (j, row) in enumerate(self._rows):
+            syn |= ((word & row).bit_count() & 1) << j
+        return syn
+
+    def encode_int(self, data: int) -> int:
+        '''
+        Transforms a plain `data` word into an encoded block.
+
+        Bit _i_ of the returned block is the _i_-th entry of the list returned
+        by `encode`.
+        '''
+        data &= (1 << self.data_bits)-1
+        return data | self._get_syndrome(data) << self.data_bits
+
+    def decode_int(self, code: int) -> Tuple[int, int, int]:
+        '''
+        Transforms an encoded block `code` into a decoded data word.
+
+        An odd-weight syndrome that matches no column means more than two
+        errors, which is flagged as `ded` since it cannot be corrected.
+
+        Returns `(data, sec, ded)`.
+        '''
+        syn = self._get_syndrome(code)
+        sec = 0
+        ded = 0
+        if syn != 0:
+            if syn.bit_count() & 1 and syn in self._positions:
+                sec = 1
+                code ^= 1 << self._positions[syn]
+            else:
+                ded = 1
+        return (code & ((1 << self.data_bits)-1), sec, ded)
+
+    def encode(self, message: List[int]) -> List[int]:
+        '''
+        Transforms a plain `message` into an encoded block, leaving the
+        `message` unmodified.
+
+        A `glyph.BitVector` message is encoded into a `BitVector` block.
+        '''
+        if isinstance(message, gl.BitVector):
+            return gl.BitVector(self.encode_int(int(message)), self.get_total_bits_len())
+        code = self.encode_int(int(gl.BitVector.from_list(message)))
+        return gl.BitVector(code, self.get_total_bits_len()).to_list()
+
+    def decode(self, block: List[int]) -> Tuple[List[int], int, int]:
+        '''
+        Transforms an encoded `block` into a decoded message, leaving the
+        `block` unmodified.
+
+        A `glyph.BitVector` block is decoded into a `BitVector` message.
+
+        Returns `(message, sec, ded)`.
+        '''
+        (data, sec, ded) = self.decode_int(int(block) if isinstance(block, gl.BitVector) else int(gl.BitVector.from_list(block)))
+        message = gl.BitVector(data, self.get_data_bits_len())
+        return (message if isinstance(block, gl.BitVector) else message.to_list(), sec, ded)
+
+    def get_generator_matrix(self):
+        '''
+        Returns the K x N generator matrix over GF(2) as a read-only NumPy
+        `uint8` array.
+        '''
+        import numpy as np
+        if self._gen is None:
+            n = self.get_total_bits_len()
+            rows = [self.encode_int(1 << i) for i in range(0, self.get_data_bits_len())]
+            self._gen = np.array([[(r >> j) & 1 for j in range(0, n)] for r in rows], dtype=np.uint8)
+            self._gen.flags.writeable = False
+        return self._gen
+
+    def get_parity_check_matrix(self):
+        '''
+        Returns the R x N parity-check matrix over GF(2) as a read-only NumPy
+        `uint8` array, whose product with a block is its syndrome (lsb first).
+        '''
+        import numpy as np
+        if self._chk is None:
+            n = self.get_total_bits_len()
+            self._chk = np.array([[(r >> j) & 1 for j in range(0, n)] for r in self._rows], dtype=np.uint8)
+            self._chk.flags.writeable = False
+        return self._chk
+
+    def encode_batch(self, data):
+        '''
+        Encodes N data words at once as a single GF(2) product with the
+        generator matrix.
+
+        Accepts either an (N, K) array of bits or an (N,) array of packed
+        integers (which requires a block size <= 64), like
+        `HammingCodec.encode_batch`.
+        '''
+        import numpy as np
+        data = np.asarray(data)
+        packed = data.ndim == 1
+        if packed:
+            if self.get_total_bits_len() > 64:
+                raise ValueError('packed blocks must be at most 64 bits')
+            data = gl.to_bits(data, self.get_data_bits_len())
+        elif data.ndim != 2 or data.shape[1] != self.get_data_bits_len():
+            raise ValueError('expected an (N, '+str(self.get_data_bits_len())+') array of bits')
+        blocks = _gf2_matmul(data, self.get_generator_matrix())
+        return gl.from_bits(blocks) if packed else blocks
+
+    def decode_batch(self, blocks):
+        '''
+        Decodes N blocks at once with a single product against the
+        parity-check matrix, leaving the input unmodified.
+
+        Accepts and returns arrays like `HammingCodec.decode_batch`.
+
+        Returns `(data, sec, ded)`.
+        '''
+        import numpy as np
+        blocks = np.asarray(blocks)
+        n = self.get_total_bits_len()
+        packed = blocks.ndim == 1
+        if packed:
+            if n > 64:
+                raise ValueError('packed blocks must be at most 64 bits')
+            blocks = gl.to_bits(blocks, n)
+        elif blocks.ndim != 2 or blocks.shape[1] != n:
+            raise ValueError('expected an (N, '+str(n)+') array of bits')
+        else:
+            blocks = blocks.astype(np.uint8)
+        if self._fix is None:
+            # syndrome -> block position to flip (-1 if not a single error)
+            self._fix = np.full(2**self.check_bits, -1, dtype=np.int64)
+            for (col, i) in self._positions.items():
+                self._fix[col] = i
+        checks = _gf2_matmul(blocks, self.get_parity_check_matrix().T)
+        syn = checks.astype(np.int64) @ (1 << np.arange(self.check_bits, dtype=np.int64))
+        pos = self._fix[syn]
+        sec = (pos >= 0).astype(np.uint8)
+        ded = ((syn > 0) & (pos < 0)).astype(np.uint8)
+        fix = np.nonzero(pos >= 0)[0]
+        blocks[fix, pos[fix]] ^= 1
+        data = blocks[:, :self.get_data_bits_len()]
+        return (gl.from_bits(data) if packed else data, sec, ded)
+    pass
+
+
+def xor_cost(matrix) -> Tuple[int, int]:
+    '''
+    Computes the 2-input XOR gates and the depth of balanced XOR trees that
+    compute every row of the bit `matrix` as the XOR of its inputs.
+
+    Returns `(gates, depth)`.
+    '''
+    weights = [int(w) for w in matrix.sum(axis=1)]
+    gates = sum(max(w-1, 0) for w in weights)
+    depth = max(math.ceil(math.log2(w)) if w > 1 else 0 for w in weights)
+    return (gates, depth)
+
+
+def compare(k: int) -> dict:
+    '''
+    Compares the check logic of the Hamming and Hsiao codes for K data bits.
+
+    The encoder computes every block bit from the data and the decoder
+    computes every syndrome bit (and the overall parity for Hamming) from the
+    block. Returns the `(gates, depth)` of each as `hamming_enc`, `hsiao_enc`,
+    `hamming_dec` and `hsiao_dec`.
+    '''
+    hamming = HammingCodec(k)
+    hsiao = HsiaoCodec(k)
+    return {
+        'k': k,
+        'r': hsiao.get_parity_bits_len(),
+        'hamming_enc': xor_cost(hamming.get_generator_matrix().T),
+        'hsiao_enc': xor_cost(hsiao.get_generator_matrix().T),
+        'hamming_dec': xor_cost(hamming.get_parity_check_matrix()),
+        'hsiao_dec': xor_cost(hsiao.get_parity_check_matrix()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Hsiao and Hamming SECDED check logic')
+    parser.add_argument('k', type=int, nargs='+', help='data widths')
+    args = parser.parse_args()
+
+    print('{:>5} {:>3} {:>16} {:>16} {:>16} {:>16}'.format('K', 'R', 'hamming enc', 'hsiao enc', 'hamming dec', 'hsiao dec'))
+    for k in args.k:
+        row = compare(k)
+        cells = ['{} xor / {} lvl'.format(*row[c]) for c in ['hamming_enc', 'hsiao_enc', 'hamming_dec', 'hsiao_dec']]
+        print('{:>5} {:>3} {:>16} {:>16} {:>16} {:>16}'.format(k, row['r'], *cells))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestHsiao(unittest.TestCase):
+    '''
+    Test cases for the Hsiao code.
+    '''
+
+    def test_columns(self):
+        for k in [1, 4, 11, 26, 32, 57, 64, 120, 128]:
+            code = HsiaoCodec(k)
+            # same number of check bits as the extended hamming code
+            self.assertEqual(code.get_total_bits_len(), HammingCodec(k).get_total_bits_len())
+            cols = code._columns
+            self.assertEqual(len(set(cols)), len(cols))
+            self.assertTrue(all(c.bit_count() % 2 == 1 for c in cols))
+            weights = code.get_row_weights()
+            self.assertLessEqual(max(weights) - min(weights), 1 if k > 4 else 2)
+
+    def test_codec(self):
+        for k in [1, 4, 11, 32, 64]:
+            code = HsiaoCodec(k)
+            n = code.get_total_bits_len()
+            for _ in range(0, 20):
+                data = random.randint(0, 2**k-1)
+                block = code.encode_int(data)
+                self.assertEqual(code.decode_int(block), (data, 0, 0))
+                # every single error is corrected and every double is detected
+                for i in range(0, n):
+                    self.assertEqual(code.decode_int(block ^ (1 << i)), (data, 1, 0))
+                pairs = list(itertools.combinations(range(0, n), 2))
+                for (i, j) in random.sample(pairs, min(20, len(pairs))):
+                    self.assertEqual(code.decode_int(block ^ (1 << i) ^ (1 << j))[1:], (0, 1))
+                message = gl.pack(data, k)[::-1]
+                self.assertEqual(code.encode(message), gl.pack(block, n)[::-1])
+                self.assertEqual(message, gl.pack(data, k)[::-1])
+                self.assertEqual(code.decode(gl.transmit(code.encode(message), spots=[0])), (message, 1, 0))
+                self.assertEqual(code.encode(gl.BitVector.from_list(message)), code.encode(message))
+
+    def test_batch(self):
+        import numpy as np
+        for k in [4, 57, 120]:
+            code = HsiaoCodec(k)
+            n = code.get_total_bits_len()
+            data = np.random.randint(0, 2, size=(200, k), dtype=np.uint8)
+            blocks = code.encode_batch(data)
+            self.assertFalse(_gf2_matmul(blocks, code.get_parity_check_matrix().T).any())
+            errs = np.zeros((200, n), dtype=np.uint8)
+            errs[np.arange(200), np.random.randint(0, n, 200)] = 1
+            errs[:100, 0] ^= 1
+            rx = blocks ^ errs
+            (rx_data, sec, ded) = code.decode_batch(rx)
+            for i in range(0, 200):
+                word = int(gl.from_bits(rx[i:i+1])[0]) if n <= 64 else int(gl.BitVector.from_list(list(rx[i])))
+                (d, s, e) = code.decode_int(word)
+                self.assertEqual((s, e), (int(sec[i]), int(ded[i])))
+                if s == 1:
+                    self.assertTrue((rx_data[i] == data[i]).all())
+            if n <= 64:
+                words = gl.from_bits(data)
+                self.assertEqual(list(code.encode_batch(words)), list(gl.from_bits(blocks)))
+
+    def test_compare(self):
+        for k in [8, 32, 64, 128]:
+            row = compare(k)
+            # shallower and smaller check logic than the hamming code
+            self.assertLess(row['hsiao_dec'][1], row['hamming_dec'][1])
+            self.assertLess(row['hsiao_dec'][0], row['hamming_dec'][0])
+            self.assertLessEqual(row['hsiao_enc'][1], row['hamming_enc'][1])
@@ -0,0 +1,314 @@
+'''
+Interleavers that spread burst errors across many code blocks.
+
+An interleaver sits between the block framing and the channel: it reorders
+an (N, N_b) batch of encoded blocks into a 1-D stream of channel bits, and
+the matching de-interleaver restores the blocks from the received stream. A
+burst of consecutive channel errors then lands as isolated errors in
+different blocks, which a code correcting _t_ errors per block can fix.
+
+- `BlockInterleaver(depth)`: writes `depth` blocks as the rows of a matrix
+and sends it column by column, so bursts up to `depth` bits hit each block at
+most once.
+- `ConvolutionalInterleaver(branches, delay)`: sends consecutive bits through
+`branches` delay lines of 0, `delay`, 2 x `delay`, ... stages, tolerating
+bursts up to `branches` bits (when `branches * delay` > N_b) with half the
+memory of a block interleaver, but needs longer gaps between bursts.
+
+Both reorder whole batches by gathering through permutation indices that
+are computed once per size. Interleavers are named by `block:D` or
+`conv:B:D`, and the simulation takes them after a code as `hamming:11+block:8`.
+
+Usage: `python interleave.py hamming:11 --interleavers block:2 block:4 conv:4:5 --bursts 1 2 4 8`
+
+To execute unit tests for this module, run: `python -m unittest interleave.py`.
+'''
+
+import argparse
+import time
+import unittest
+import numpy as np
+from abc import ABC, abstractmethod
+
+
+class Interleaver(ABC):
+    '''
+    Base class for an interleaver over batches of blocks.
+    '''
+
+    @abstractmethod
+    def interleave(self, blocks):
+        '''
+        Reorders an (N, N_b) array of blocks into a 1-D `uint8` stream of
+        channel bits.
+        '''
+        pass
+
+    @abstractmethod
+    def deinterleave(self, stream, n: int):
+        '''
+        Restores the (N, `n`) array of blocks from a received `stream`.
+        '''
+        pass
+
+    @abstractmethod
+    def span(self, n: int) -> int:
+        '''
+        Returns the number of channel bits over which a single burst is spread
+        for blocks of `n` bits.
+        '''
+        pass
+
+    @abstractmethod
+    def guard(self, n: int) -> int:
+        '''
+        Returns the number of bits at the end of each `span` that must stay 
+        clear of bursts so a burst never shares a block with the burst of the
+        next span.
+        '''
+        pass
+
+    @abstractmethod
+    def delay(self, n: int) -> int:
+        '''
+        Returns the end-to-end latency in bits added by interleaving and
+        de-interleaving blocks of `n` bits.
+        '''
+        pass
+    pass
+
+
+class BlockInterleaver(Interleaver):
+    '''
+    Sends each group of `depth` blocks column by column.
+
+    A batch that is not a multiple of `depth` blocks is padded with zero
+    blocks, which the de-interleaver returns as well.
+    '''
+
+    def __init__(self, depth: int):
+        if depth < 1:
+            raise ValueError('depth must be positive')
+        self.depth = depth
+        # block size -> (permutation, inverse permutation)
+        self._perms = dict()
+
+    def _get_perms(self, n: int) -> tuple:
+        if n not in self._perms:
+            j = np.arange(self.depth*n)
+            # the j-th bit sent is bit j // depth of block j % depth
+            perm = (j % self.depth)*n + j // self.depth
+            self._perms[n] = (perm, np.argsort(perm))
+        return self._perms[n]
+
+    def interleave(self, blocks):
+        blocks = np.asarray(blocks, dtype=np.uint8)
+        (count, n) = blocks.shape
+        pad = -count % self.depth
+        if pad > 0:
+            blocks = np.concatenate([blocks, np.zeros((pad, n), dtype=np.uint8)])
+        (perm, _) = self._get_perms(n)
+        return blocks.reshape(-1, self.depth*n)[:, perm].ravel()
+
+    def deinterleave(self, stream, n: int):
+        (_, inverse) = self._get_perms(n)
+        return np.asarray(stream).reshape(-1, self.depth*n)[:, inverse].reshape(-1, n)
+
+    def span(self, n: int) -> int:
+        return self.depth*n
+
+    def guard(self, n: int) -> int:
+        # every span is a separate group of blocks
+        return 0
+
+    def delay(self, n: int) -> int:
+        return 2*self.depth*n
+    pass
+
+
+class ConvolutionalInterleaver(Interleaver):
+    '''
+    Sends bit _t_ of the stream through branch _t_ mod `branches`, where
+    branch _i_ holds back its bits for _i_ x `delay` uses of the branch; the
+    de-interleaver delays branch _i_ by the complement so every bit is delayed
+    equally.
+
+    Each batch is a terminated sequence: the stream is flushed with enough
+    zeros to push every block through both stages.
+    '''
+
+    def __init__(self, branches: int, delay: int):
+        if branches < 1 or delay < 0:
+            raise ValueError('expected a positive number of branches and a non-negative delay')
+        self.branches = branches
+        self.stages = delay
+        # total delay of a bit through the interleaver and de-interleaver
+        self.latency = (branches-1)*delay*branches
+        # (stream length, direction) -> gather indices
+        self._indices = dict()
+
+    def _get_indices(self, length: int, inverse: bool):
+        if (length, inverse) not in self._indices:
+            t = np.arange(length)
+            branch = t % self.branches
+            if inverse:
+                branch = self.branches-1 - branch
+            # index into the stream preceded by `latency` zeros
+            self._indices[(length, inverse)] = t + self.latency - branch*self.stages*self.branches
+        return self._indices[(length, inverse)]
+
+    def _gather(self, stream, inverse: bool):
+        padded = np.concatenate([np.zeros(self.latency, dtype=np.uint8), stream])
+        return padded[self._get_indices(len(stream), inverse)]
+
+    def interleave(self, blocks):
+        stream = np.asarray(blocks, dtype=np.uint8).ravel()
+        return self._gather(np.concatenate([stream, np.zeros(self.latency, dtype=np.uint8)]), False)
+
+    def deinterleave(self, stream, n: int):
+        return self._gather(np.asarray(stream, dtype=np.uint8), True)[self.latency:].reshape(-1, n)
+
+    def span(self, n: int) -> int:
+        return 2*(self.guard(n) + self.branches)
+
+    def guard(self, n: int) -> int:
+        # bits of a burst are delayed by up to the latency in the output
+        return self.latency + n
+
+    def delay(self, n: int) -> int:
+        return self.latency
+    pass
+
+
+def make_interleaver(spec: str) -> Interleaver:
+    '''
+    Creates the interleaver named by `spec`.
+    '''
+    parts = spec.split(':')
+    if parts[0] == 'block' and len(parts) == 2 and parts[1].isdigit():
+        return BlockInterleaver(int(parts[1]))
+    elif parts[0] == 'conv' and len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+        return ConvolutionalInterleaver(int(parts[1]), int(parts[2]))
+    raise ValueError("unknown interleaver '"+spec+"' (expected 'block:D' or 'conv:B:D')")
+
+
+def throughput(spec: str, n: int, blocks: int=10_000, repeat: int=5) -> float:
+    '''
+    Measures the bits per second through interleaving and de-interleaving
+    batches of `blocks` blocks of `n` bits.
+    '''
+    il = make_interleaver(spec)
+    data = np.random.default_rng(0).integers(0, 2, size=(blocks, n), dtype=np.uint8)
+    # warm the index caches
+    il.deinterleave(il.interleave(data), n)
+    start = time.perf_counter()
+    for _ in range(0, repeat):
+        il.deinterleave(il.interleave(data), n)
+    return blocks*n*repeat/(time.perf_counter()-start)
+
+
+def report(code: str, interleavers: list, bursts: list, frames: int=20_000, seed: int=None) -> list:
+    '''
+    Simulates the `code` behind each of the `interleavers` (`None` for no
+    interleaving) with one burst of each length in `bursts` per `span` of
+    channel bits.
+
+    Returns a row per interleaver with its `delay`, `throughput` in bits per
+    second, frame error rate at each burst length, and `tolerance` (the
+    longest burst among `bursts` decoded without a frame error).
+    '''
+    from codes import make_frames
+    from sim import simulate
+    n = make_frames(code).n
+    rows = []
+    for il in interleavers:
+        spec = code if il is None else code+'+'+il
+        row = {
+            'interleaver': 'none' if il is None else il,
+            'delay': 0 if il is None else make_interleaver(il).delay(n),
+            'throughput': None if il is None else throughput(il, n),
+            'fer': dict(),
+            'tolerance': 0,
+        }
+        for length in sorted(bursts):
+            counts = simulate(spec, 1.0, frames, seed, channel='burst:'+str(length))
+            row['fer'][length] = counts['frame_errors']/counts['frames']
+            # every shorter burst must be decoded cleanly as well
+            if all(fer == 0 for fer in row['fer'].values()):
+                row['tolerance'] = length
+        rows += [row]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare burst tolerance and throughput of interleavers')
+    parser.add_argument('code', help="code to protect ('hamming:K' or 'golay')")
+    parser.add_argument('--interleavers', nargs='+', default=['block:2', 'block:4', 'block:8', 'block:16'], help="interleavers to compare ('block:D' or 'conv:B:D')")
+    parser.add_argument('--bursts', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help='burst lengths in bits')
+    parser.add_argument('--frames', type=int, default=20_000, help='frames per burst length')
+    parser.add_argument('--seed', type=int, default=None, help='root seed')
+    args = parser.parse_args()
+
+    rows = report(args.code, [None] + args.interleavers, args.bursts, args.frames, args.seed)
+    bursts = sorted(args.bursts)
+    print('{:<12} {:>8} {:>10} {:>9}'.format('interleaver', 'delay', 'Mbit/s', 'tolerance') + ''.join(' {:>9}'.format('L='+str(b)) for b in bursts))
+    for row in rows:
+        rate = '-' if row['throughput'] is None else '{:.1f}'.format(row['throughput']/1e6)
+        print('{:<12} {:>8} {:>10} {:>9}'.format(row['interleaver'], row['delay'], rate, row['tolerance']) + ''.join(' {:>9.2e}'.format(row['fer'][b]) for b in bursts))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestInterleave(unittest.TestCase):
+    '''
+    Test cases for the interleavers.
+    '''
+
+    def test_roundtrip(self):
+        rng = np.random.default_rng(1)
+        for spec in ['block:1', 'block:5', 'conv:1:3', 'conv:4:2', 'conv:3:0']:
+            il = make_interleaver(spec)
+            for count in [1, 7, 20]:
+                blocks = rng.integers(0, 2, size=(count, 13), dtype=np.uint8)
+                stream = il.interleave(blocks)
+                self.assertEqual(int(stream.sum()), int(blocks.sum()))
+                self.assertTrue((il.deinterleave(stream, 13)[:count] == blocks).all())
+        with self.assertRaises(ValueError):
+            make_interleaver('block')
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Interleaver()
+
+    def test_block_order(self):
+        il = BlockInterleaver(3)
+        # bit 1 of block 2 is sent after bit 0 of every block and bit 1 of
+        # blocks 0 and 1
+        blocks = np.zeros((3, 4), dtype=np.uint8)
+        blocks[2, 1] = 1
+        self.assertEqual(list(np.nonzero(il.interleave(blocks))[0]), [5])
+        self.assertEqual(il.deinterleave(il.interleave(blocks), 4).shape, (3, 4))
+
+    def test_bursts(self):
+        rng = np.random.default_rng(2)
+        n = 16
+        blocks = np.zeros((64, n), dtype=np.uint8)
+        for (spec, length) in [('block:8', 8), ('conv:4:5', 4)]:
+            il = make_interleaver(spec)
+            stream = il.interleave(blocks)
+            for _ in range(0, 20):
+                start = int(rng.integers(0, len(stream)-length))
+                rx = stream.copy()
+                rx[start:start+length] ^= 1
+                hits = il.deinterleave(rx, n).sum(axis=1)
+                # a burst up to the tolerance flips at most one bit per block
+                self.assertLessEqual(int(hits.max()), 1)
+
+    def test_report(self):
+        rows = report('hamming:11', [None, 'block:4', 'conv:4:5'], [1, 2, 4, 5], frames=2_000, seed=3)
+        self.assertEqual([r['tolerance'] for r in rows], [1, 4, 4])
+        self.assertGreater(rows[1]['fer'][5], 0)
+        self.assertGreater(rows[1]['throughput'], 0)
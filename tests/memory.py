@@ -0,0 +1,418 @@
+'''
+Behavioral model of a SECDED-protected memory with soft errors and scrubbing.
+
+Every word is stored as its extended Hamming codeword from `HammingCodec(K)`
+in one flat `bytearray`, ceil(N_b / 8) bytes per word (9 bytes for the usual
+(72, 64) layout), with block bit _j_ at bit _j_ % 8 of byte _j_ / 8.
+
+The code is linear, so the codeword of a data word is the XOR of the
+codewords of its bytes. Writes look up one precomputed codeword per non-zero
+byte instead of encoding bit by bit, and a partial write (of any bit field)
+reads, corrects and updates a word by XORing in the codeword of just the
+changed bits.
+
+Time is simulated: each step of `dt` seconds flips random stored bits at a
+rate of `rate` upsets per bit per second and lets the scrubber sweep its
+share of the memory, checking words in vectorized batches and writing back
+the ones with a single error. A full sweep takes `period` seconds, so a word
+collects two upsets (which SECDED can only detect) far less often than
+without scrubbing.
+
+Usage: `python memory.py --words 1000000 --seconds 3600 --rate 1e-9 --period none 600 60`
+
+To execute unit tests for this module, run: `python -m unittest memory.py`.
+'''
+
+import argparse
+import random
+import time
+import unittest
+import numpy as np
+from hamming import HammingCodec, _gf2_matmul
+
+# words checked at once by the scrubber
+SCRUB_BATCH = 2**16
+
+
+class EccMemory:
+    '''
+    Array of words protected by an extended Hamming code.
+    '''
+
+    def __init__(self, words: int, k: int=64):
+        '''
+        Construct a memory of `words` words of `k` data bits, all zero.
+        '''
+        if words < 1:
+            raise ValueError('memory must hold at least one word')
+        self.codec = HammingCodec(k)
+        self.words = words
+        self.k = k
+        self.n = self.codec.get_total_bits_len()
+        self.stride = -(-self.n // 8)
+        # the all-zero block is the codeword of the all-zero word
+        self.storage = bytearray(words*self.stride)
+        # codeword of each byte value at each byte of the data word
+        self._lanes = tuple(
+            tuple(self.codec.encode_int((b << 8*lane) & ((1 << k)-1)) for b in range(0, 256))
+            for lane in range(0, -(-k // 8))
+        )
+        self._scrub_next = 0
+        self.stats = dict.fromkeys([
+            'reads', 'writes', 'partial_writes', 'corrected', 'uncorrectable',
+            'upsets', 'scrubbed', 'scrub_corrected', 'scrub_uncorrectable',
+        ], 0)
+
+    def _load(self, addr: int) -> int:
+        if addr < 0 or addr >= self.words:
+            raise IndexError('address '+str(addr)+' out of range')
+        start = addr*self.stride
+        return int.from_bytes(self.storage[start:start+self.stride], 'little')
+
+    def _store(self, addr: int, code: int):
+        start = addr*self.stride
+        self.storage[start:start+self.stride] = code.to_bytes(self.stride, 'little')
+
+    def _encode(self, data: int) -> int:
+        '''
+        Returns the codeword of `data` as the XOR of the codewords of its
+        non-zero bytes.
+        '''
+        code = 0
+        lane = 0
+        while data:
+            if data & 0xff:
+                code ^= self._lanes[lane][data & 0xff]
+            data >>= 8
+            lane += 1
+        return code
+
+    def _decode(self, code: int) -> tuple:
+        '''
+        Decodes a stored block, classifying it the same way as the scrubber:
+        an odd number of errors whose syndrome points past the block is more
+        than one error, so it is reported as uncorrectable and left alone.
+
+        Returns `(data, sec, ded)`.
+        '''
+        (data, sec, ded) = self.codec.decode_int(code)
+        if sec == 1 and self.codec._get_syndrome(code) >= self.n:
+            return (data, 0, 1)
+        return (data, sec, ded)
+
+    def array(self):
+        '''
+        Returns a writable (words, stride) `uint8` NumPy view of the storage.
+        '''
+        return np.frombuffer(self.storage, dtype=np.uint8).reshape(self.words, self.stride)
+
+    def read(self, addr: int) -> tuple:
+        '''
+        Reads the word at `addr`, correcting it on the fly (the stored copy is
+        left for the scrubber).
+
+        Returns `(data, sec, ded)`.
+        '''
+        (data, sec, ded) = self._decode(self._load(addr))
+        self.stats['reads'] += 1
+        self.stats['corrected'] += sec
+        self.stats['uncorrectable'] += ded
+        return (data, sec, ded)
+
+    def write(self, addr: int, data: int):
+        '''
+        Writes the whole word at `addr`.
+        '''
+        if data < 0 or data >> self.k:
+            raise ValueError('data does not fit in '+str(self.k)+' bits')
+        # loading checks the address
+        self._load(addr)
+        self._store(addr, self._encode(data))
+        self.stats['writes'] += 1
+
+    def write_bits(self, addr: int, value: int, offset: int, width: int) -> tuple:
+        '''
+        Writes `value` into the `width` bits of the word at `addr` starting
+        at bit `offset` with a read-modify-write.
+
+        The stored word is corrected first, then its check bits are updated
+        from the codeword of the changed bits alone. A word with an
+        uncorrectable error keeps it, so it is still reported on later reads.
+
+        Returns `(sec, ded)` of the read.
+        '''
+        if offset < 0 or width < 1 or offset+width > self.k:
+            raise ValueError('bit field does not fit in '+str(self.k)+' bits')
+        if value < 0 or value >> width:
+            raise ValueError('value does not fit in '+str(width)+' bits')
+        code = self._load(addr)
+        (data, sec, ded) = self._decode(code)
+        if sec == 1:
+            code = self._encode(data)
+        delta = (((data >> offset) ^ value) & ((1 << width)-1)) << offset
+        self._store(addr, code ^ self._encode(delta))
+        self.stats['partial_writes'] += 1
+        self.stats['corrected'] += sec
+        self.stats['uncorrectable'] += ded
+        return (sec, ded)
+
+    def upset(self, addr: int, bit: int):
+        '''
+        Flips the stored block bit `bit` of the word at `addr`.
+        '''
+        if bit < 0 or bit >= self.n:
+            raise ValueError('bit '+str(bit)+' out of range')
+        self._store(addr, self._load(addr) ^ 1 << bit)
+        self.stats['upsets'] += 1
+
+    def inject(self, rate: float, dt: float, rng) -> int:
+        '''
+        Flips random stored bits as `rate` upsets per bit per second would
+        over `dt` seconds, drawing from the NumPy generator `rng`.
+
+        Returns the number of upsets.
+        '''
+        count = int(rng.poisson(rate*self.words*self.n*dt))
+        if count > 0:
+            pos = rng.integers(0, self.words*self.n, size=count)
+            (addr, bit) = (pos // self.n, pos % self.n)
+            np.bitwise_xor.at(self.array(), (addr, bit // 8), (1 << (bit % 8)).astype(np.uint8))
+        self.stats['upsets'] += count
+        return count
+
+    def _check(self, start: int, stop: int, fix: bool) -> tuple:
+        '''
+        Checks the words in [`start`, `stop`), writing back the ones with a
+        single error when `fix` is set.
+        '''
+        rows = self.array()[start:stop]
+        bits = np.unpackbits(rows, axis=1, bitorder='little')[:, :self.n]
+        checks = _gf2_matmul(bits, self.codec.get_parity_check_matrix().T)
+        syn = checks[:, 1:].astype(np.int64) @ (1 << np.arange(self.codec.get_parity_bits_len(), dtype=np.int64))
+        single = (checks[:, 0] == 1) & (syn < self.n)
+        # an even number of errors, or an odd syndrome outside the block
+        double = ((checks[:, 0] == 0) & (syn > 0)) | ((checks[:, 0] == 1) & (syn >= self.n))
+        if fix:
+            idx = np.nonzero(single)[0]
+            rows[idx, syn[idx] // 8] ^= (1 << (syn[idx] % 8)).astype(np.uint8)
+        return (int(single.sum()), int(double.sum()))
+
+    def scrub(self, count: int) -> tuple:
+        '''
+        Sweeps the next `count` words after the last scrubbed one (wrapping
+        around), correcting single errors in place.
+
+        Returns `(corrected, uncorrectable)`.
+        '''
+        corrected = 0
+        uncorrectable = 0
+        while count > 0:
+            stop = min(self.words, self._scrub_next+min(count, SCRUB_BATCH))
+            (c, u) = self._check(self._scrub_next, stop, True)
+            corrected += c
+            uncorrectable += u
+            count -= stop-self._scrub_next
+            self.stats['scrubbed'] += stop-self._scrub_next
+            self._scrub_next = stop % self.words
+        self.stats['scrub_corrected'] += corrected
+        self.stats['scrub_uncorrectable'] += uncorrectable
+        return (corrected, uncorrectable)
+
+    def census(self) -> tuple:
+        '''
+        Counts the words currently holding a correctable and an
+        uncorrectable error without changing them.
+
+        Returns `(correctable, uncorrectable)`.
+        '''
+        correctable = 0
+        uncorrectable = 0
+        for start in range(0, self.words, SCRUB_BATCH):
+            (c, u) = self._check(start, min(self.words, start+SCRUB_BATCH), False)
+            correctable += c
+            uncorrectable += u
+        return (correctable, uncorrectable)
+    pass
+
+
+def simulate(mem: EccMemory, seconds: float, rate: float, period: float=None, dt: float=1.0, seed=None) -> dict:
+    '''
+    Runs `seconds` of simulated time in steps of `dt`, injecting upsets at
+    `rate` per bit per second and scrubbing the whole memory every `period`
+    seconds (`None` to never scrub).
+
+    Returns the memory's statistics along with the `correctable` and
+    `uncorrectable` words left at the end and the wall-clock `scrub_rate` in
+    words per second.
+    '''
+    rng = np.random.default_rng(seed)
+    # words owed to the scrubber, carried across steps
+    owed = 0.0
+    elapsed = 0.0
+    t = 0.0
+    while t < seconds:
+        step = min(dt, seconds-t)
+        mem.inject(rate, step, rng)
+        if period is not None:
+            owed += mem.words*step/period
+            start = time.perf_counter()
+            mem.scrub(int(owed))
+            elapsed += time.perf_counter()-start
+            owed -= int(owed)
+        t += step
+    result = dict(mem.stats)
+    (result['correctable'], result['uncorrectable_words']) = mem.census()
+    result['scrub_rate'] = mem.stats['scrubbed']/elapsed if elapsed > 0 else None
+    return result
+
+
+def benchmark(mem: EccMemory, ops: int=100_000, seed=None) -> dict:
+    '''
+    Measures the `reads`, `writes` and `partial_writes` per second at random
+    addresses, and the `scrub` rate in words per second over one sweep.
+    '''
+    rng = random.Random(seed)
+    addrs = [rng.randrange(mem.words) for _ in range(0, ops)]
+    values = [rng.getrandbits(mem.k) for _ in range(0, ops)]
+    rates = dict()
+    start = time.perf_counter()
+    for (a, v) in zip(addrs, values):
+        mem.write(a, v)
+    rates['writes'] = ops/(time.perf_counter()-start)
+    start = time.perf_counter()
+    for a in addrs:
+        mem.read(a)
+    rates['reads'] = ops/(time.perf_counter()-start)
+    width = min(8, mem.k)
+    start = time.perf_counter()
+    for (a, v) in zip(addrs, values):
+        mem.write_bits(a, v & ((1 << width)-1), v % (mem.k-width+1), width)
+    rates['partial_writes'] = ops/(time.perf_counter()-start)
+    start = time.perf_counter()
+    mem.scrub(mem.words)
+    rates['scrub'] = mem.words/(time.perf_counter()-start)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a SECDED memory with soft errors and scrubbing')
+    parser.add_argument('--words', type=int, default=1_000_000, help='words in the memory')
+    parser.add_argument('-k', type=int, default=64, help='data bits per word')
+    parser.add_argument('--seconds', type=float, default=3600, help='simulated time')
+    parser.add_argument('--rate', type=float, default=1e-9, help='upsets per bit per second')
+    parser.add_argument('--period', nargs='+', default=['none', '600'], help="seconds per full scrub sweep to compare ('none' to disable)")
+    parser.add_argument('--dt', type=float, default=10.0, help='simulated seconds per step')
+    parser.add_argument('--ops', type=int, default=100_000, help='accesses for the throughput benchmark')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the upsets')
+    args = parser.parse_args()
+
+    mem = EccMemory(args.words, args.k)
+    print('memory: '+str(args.words)+' words of ('+str(mem.n)+', '+str(mem.k)+'), '+str(len(mem.storage))+' bytes')
+    rates = benchmark(mem, args.ops, args.seed)
+    print('reads/s: {:.0f}, writes/s: {:.0f}, partial writes/s: {:.0f}, scrub words/s: {:.0f}'.format(
+        rates['reads'], rates['writes'], rates['partial_writes'], rates['scrub']))
+    print('{:>10} {:>10} {:>14} {:>14} {:>14}'.format('period', 'upsets', 'scrub fixed', 'correctable', 'uncorrectable'))
+    for period in args.period:
+        period = None if period.lower() == 'none' else float(period)
+        result = simulate(EccMemory(args.words, args.k), args.seconds, args.rate, period, args.dt, args.seed)
+        print('{:>10} {:>10} {:>14} {:>14} {:>14}'.format('none' if period is None else '{:g}'.format(period),
+            result['upsets'], result['scrub_corrected'], result['correctable'], result['uncorrectable_words']))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestMemory(unittest.TestCase):
+    '''
+    Test cases for the SECDED memory model.
+    '''
+
+    def test_read_write(self):
+        rng = random.Random(1)
+        for k in [4, 11, 57, 64]:
+            mem = EccMemory(16, k)
+            model = [0]*16
+            for _ in range(0, 200):
+                addr = rng.randrange(16)
+                if rng.random() < 0.5:
+                    model[addr] = rng.getrandbits(k)
+                    mem.write(addr, model[addr])
+                else:
+                    width = rng.randint(1, k)
+                    offset = rng.randint(0, k-width)
+                    value = rng.getrandbits(width)
+                    self.assertEqual(mem.write_bits(addr, value, offset, width), (0, 0))
+                    mask = ((1 << width)-1) << offset
+                    model[addr] = (model[addr] & ~mask) | value << offset
+                # the incremental update matches a full encode
+                self.assertEqual(mem._load(addr), mem.codec.encode_int(model[addr]))
+                self.assertEqual(mem.read(addr), (model[addr], 0, 0))
+        self.assertEqual(len(mem.storage), 16*9)
+        with self.assertRaises(IndexError):
+            mem.read(16)
+        with self.assertRaises(ValueError):
+            mem.write_bits(0, 1, 64, 1)
+
+    def test_errors(self):
+        mem = EccMemory(8)
+        mem.write(3, 0x0123456789abcdef)
+        mem.upset(3, 17)
+        self.assertEqual(mem.read(3), (0x0123456789abcdef, 1, 0))
+        # a partial write stores the corrected word
+        self.assertEqual(mem.write_bits(3, 0xff, 0, 8), (1, 0))
+        self.assertEqual(mem.read(3), (0x0123456789abcdff, 0, 0))
+        mem.upset(3, 5)
+        mem.upset(3, 40)
+        self.assertEqual(mem.read(3)[1:], (0, 1))
+        mem.upset(6, 0)
+        self.assertEqual(mem.census(), (1, 1))
+        self.assertEqual(mem.scrub(8), (1, 1))
+        self.assertEqual(mem.census(), (0, 1))
+        self.assertEqual(mem.read(6), (0, 0, 0))
+
+    def test_multi_bit(self):
+        # 3 upsets with a syndrome of 1 ^ 8 ^ 64 = 73, past the 72-bit block
+        mem = EccMemory(4)
+        mem.write(2, 0x0123456789abcdef)
+        for bit in [1, 8, 64]:
+            mem.upset(2, bit)
+        stored = mem._load(2)
+        self.assertEqual(mem.read(2)[1:], (0, 1))
+        self.assertEqual(mem.census(), (0, 1))
+        # a partial write keeps the error rather than storing a wrong word
+        self.assertEqual(mem.write_bits(2, 0x5, 4, 4), (0, 1))
+        self.assertEqual(mem.read(2)[1:], (0, 1))
+        self.assertEqual(mem.scrub(4), (0, 1))
+        self.assertEqual(mem._load(2) ^ stored, mem._encode(0x5 << 4 ^ 0xe << 4))
+        # every path agrees with the scrubber on every 3-bit upset of a word
+        rng = random.Random(7)
+        for _ in range(0, 200):
+            mem = EccMemory(1)
+            mem.write(0, rng.getrandbits(64))
+            for bit in rng.sample(range(0, mem.n), 3):
+                mem.upset(0, bit)
+            (_, sec, ded) = mem.read(0)
+            self.assertEqual(mem.census(), (sec, ded))
+
+    def test_scrub_wrap(self):
+        mem = EccMemory(10, 11)
+        for addr in range(0, 10):
+            mem.upset(addr, addr)
+        self.assertEqual(mem.scrub(7), (7, 0))
+        # continues from word 7 and wraps around to the start
+        self.assertEqual(mem.scrub(5), (3, 0))
+        self.assertEqual(mem.stats['scrubbed'], 12)
+        self.assertEqual(mem.census(), (0, 0))
+
+    def test_simulate(self):
+        rates = dict()
+        for period in [None, 10]:
+            result = simulate(EccMemory(4096), 200, 1e-5, period, dt=1.0, seed=4)
+            self.assertGreater(result['upsets'], 0)
+            rates[period] = result['uncorrectable_words']
+        # about 590 upsets over 4096 words: scrubbing keeps them from pairing up
+        self.assertGreater(rates[None], 10)
+        self.assertLess(rates[10], rates[None])
+    pass
@@ -1,7 +1,8 @@
 import cocotb
 import verb as vb
-from verb import Model, Signal, Constant
-import glyph as gl
+from verb import Model, Signal, Constant, Logics
+import golden
+from stimulus import Lookahead, GoldenStimulus, CoverageScheduler, write_result, parity_coverage, RANGE_STEPS
 
 
 class Parity(Model):
@@ -13,6 +14,8 @@ class Parity(Model):
         self.data = Signal()
         self.check = Signal()
         super().mirror()
+        vectors = golden.load('parity', {'W': self.W.value, 'EVEN': self.EVEN.value}, golden.vector_seed(cocotb.RANDOM_SEED))
+        self._queue = Lookahead(GoldenStimulus(vectors))
 
     def define_coverage(self):
         from verb.coverage import CoverRange
@@ -21,6 +24,7 @@ class Parity(Model):
             name="data range",
             span=self.data.span(),
             goal=5,
+            max_steps=RANGE_STEPS,
             target=self.data
         )
 
@@ -28,20 +32,27 @@ class Parity(Model):
             name="check bit",
             span=self.check.span(),
             goal=1,
+            max_steps=RANGE_STEPS,
             target=self.check
         )
 
         super().cover()
 
+        # direct the stimulus toward the bins that are still open
+        (goals, classify) = parity_coverage(self.W.value)
+        self._queue.scheduler = CoverageScheduler(goals, classify, seed=cocotb.RANDOM_SEED)
+
     async def setup(self):
         while vb.running():
-            self.randomize()
+            (data, _) = self._queue.next()
+            self.data.value = Logics(data, self.W.value)
             await vb.falling_edge()
 
     async def model(self):
         while vb.running():
             await vb.rising_edge()
-            self.check.value = gl.get_parity(gl.pack(int(self.data.value)), even=self.EVEN.value)
+            (_, check) = self._queue.current
+            self.check.value = check
             vb.assert_eq(self.check.get_handle(), self.check)
 
 
@@ -61,3 +72,5 @@ async def test(top):
     )
 
     vb.complete()
+    # report the stimulus coverage to the regression runner
+    write_result(mdl._queue.scheduler)
@@ -0,0 +1,346 @@
+'''
+Sharded regression runner across generics and seeds.
+
+Enumerates the matrix of designs, generics and seeds (from the test trials in
+`Orbit.toml`, or from `--dut`/`--generic` on the command line), runs each
+combination as an independent simulation job on a process pool with its own
+seed and working directory, and aggregates the pass/fail and coverage results
+into one report.
+
+Each job runs a command template with the placeholders `{dut}`, `{generics}`
+(rendered as `--generic NAME=VALUE ...`), `{seed}` and `{workdir}` from the
+project root, and also receives its seed as `RANDOM_SEED` and its working
+directory as `GLYPH_RESULT_DIR`. The default template has Orbit place each
+job's build and simulation output in its own working directory, so parallel
+jobs do not overwrite each other.
+
+A job passes if its command exits with 0. When it writes a `result.json`
+into its working directory, the `stimulus_coverage` in it is carried into the
+report. The testbenches write this file at the end of a test with the bins
+their stimulus scheduler drove, as tracked by its mirror of the coverage
+model; it is not read back from the simulator, whose own coverage report
+stays in the job's output. A job that writes no result (such as a custom
+command, or a test that stops early) reports no stimulus coverage.
+
+With `--stub`, jobs run a local stub simulator instead of an HDL tool: it
+drives the design's software model through the same directed stimulus as the
+testbench until coverage closes, checking the model against the reference
+codecs on every cycle.
+
+Usage: `python regress.py run --dut hamming_enc hamming_dec --generic K=4,11,26,57 --seeds 4 --workers 8`
+
+To execute unit tests for this module, run: `python -m unittest regress.py`.
+'''
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import tomllib
+import unittest
+import unittest.mock
+from concurrent.futures import ProcessPoolExecutor
+from stimulus import RESULT_FILE, write_result
+
+# command template used to launch a job on the HDL simulator
+COMMAND = 'orbit test --target-dir {workdir} --dut {dut} -- {generics}'
+
+# directory the jobs are launched from
+PROJECT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def parse_value(text: str):
+    '''
+    Converts a generic value from text into a bool, int or string.
+    '''
+    if text.lower() in ['true', 'false']:
+        return text.lower() == 'true'
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def load_trials(manifest: str) -> list:
+    '''
+    Reads the `(dut, generics)` trials declared for testing in an Orbit
+    manifest.
+    '''
+    with open(manifest, 'rb') as f:
+        data = tomllib.load(f)
+    trials = []
+    for test in data.get('project', {}).get('metadata', {}).get('test', []):
+        for trial in test.get('trials', [{}]):
+            trials += [(test['dut'], dict(trial.get('generics', {})))]
+    return trials
+
+
+def expand(duts: list, generics: list) -> list:
+    '''
+    Expands every combination of the `generics`, each given as
+    `NAME=V1,V2,...`, for each design in `duts`.
+    '''
+    names = []
+    values = []
+    for g in generics:
+        (name, _, vals) = g.partition('=')
+        names += [name]
+        values += [[parse_value(v) for v in vals.split(',')]]
+    return [(dut, dict(zip(names, combo))) for dut in duts for combo in itertools.product(*values)]
+
+
+def slug(dut: str, generics: dict, seed: int) -> str:
+    '''
+    Names the working directory of a job.
+    '''
+    parts = [dut] + [k+'='+str(v) for (k, v) in sorted(generics.items())] + ['seed='+str(seed)]
+    return '_'.join(parts)
+
+
+def make_jobs(trials: list, seeds: int, root_seed: int, out: str) -> list:
+    '''
+    Creates a job for every trial and each of its `seeds` seeds, which are
+    derived from `root_seed`.
+    '''
+    rng = random.Random(root_seed)
+    jobs = []
+    for (dut, generics) in trials:
+        for _ in range(0, seeds):
+            seed = rng.randint(0, 2**31-1)
+            jobs += [{
+                'dut': dut,
+                'generics': generics,
+                'seed': seed,
+                'workdir': os.path.join(out, slug(dut, generics, seed)),
+            }]
+    return jobs
+
+
+def render(command: str, job: dict) -> list:
+    '''
+    Fills in the command template for a job.
+    '''
+    generics = ' '.join('--generic '+k+'='+str(v).lower() if isinstance(v, bool) else '--generic '+k+'='+str(v) for (k, v) in job['generics'].items())
+    return shlex.split(command.format(dut=job['dut'], generics=generics, seed=job['seed'], workdir=shlex.quote(job['workdir'])))
+
+
+def run_job(job: dict, command: str, timeout: float=None) -> dict:
+    '''
+    Runs a single job from the project root with its output going to its
+    working directory, and collects its result.
+    '''
+    os.makedirs(job['workdir'], exist_ok=True)
+    path = os.path.join(job['workdir'], RESULT_FILE)
+    # a result left by an earlier run must not be taken for this one
+    if os.path.exists(path):
+        os.remove(path)
+    env = dict(os.environ)
+    env['RANDOM_SEED'] = str(job['seed'])
+    env['GLYPH_RESULT_DIR'] = job['workdir']
+    start = time.perf_counter()
+    result = dict(job)
+    try:
+        with open(os.path.join(job['workdir'], 'log.txt'), 'w') as log:
+            proc = subprocess.run(render(command, job), stdout=log, stderr=subprocess.STDOUT, env=env, timeout=timeout, cwd=PROJECT)
+        result['returncode'] = proc.returncode
+    except subprocess.TimeoutExpired:
+        result['returncode'] = None
+    result['elapsed'] = time.perf_counter() - start
+    result['passed'] = result['returncode'] == 0
+    result['stimulus_coverage'] = None
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            result['stimulus_coverage'] = json.load(f).get('stimulus_coverage', None)
+    return result
+
+
+def _run_job(args: tuple) -> dict:
+    '''
+    Runs a single job in a worker process.
+    '''
+    return run_job(*args)
+
+
+def regress(jobs: list, command: str=COMMAND, workers: int=1, timeout: float=None) -> dict:
+    '''
+    Runs every job on a pool of `workers` processes.
+
+    Returns a report of the individual `results` and the `passed`/`failed`
+    counts.
+    '''
+    tasks = [(job, command, timeout) for job in jobs]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_job, tasks))
+    else:
+        results = list(map(_run_job, tasks))
+    passed = sum(1 for r in results if r['passed'])
+    return {
+        'passed': passed,
+        'failed': len(results) - passed,
+        'results': results,
+    }
+
+
+def stub_command() -> str:
+    '''
+    Returns the command template that runs jobs on the stub simulator.
+    '''
+    return shlex.quote(sys.executable) + ' ' + shlex.quote(os.path.abspath(__file__)) + ' stub --dut {dut} --seed {seed} --workdir {workdir} {generics}'
+
+
+def stub(dut: str, generics: dict, seed: int, workdir: str, max_cycles: int=100_000) -> dict:
+    '''
+    Simulates a design's software model until its coverage closes, checking
+    every cycle against the reference codecs.
+
+    Writes and returns the result, which `passed` if every cycle matched and
+    coverage closed.
+    '''
+    import glyph as gl
+    import golden
+    from hamming import HammingCodec
+    from stimulus import Lookahead, GoldenStimulus, HammingDecStimulus, CoverageScheduler
+    from stimulus import parity_coverage, hamming_enc_coverage, hamming_dec_coverage
+
+    if dut == 'parity':
+        (goals, classify) = parity_coverage(generics['W'])
+        produce = GoldenStimulus(golden.load('parity', generics, golden.vector_seed(seed)))
+        check = lambda v: v[1] == gl.get_parity(gl.pack(v[0]), even=generics['EVEN'])
+    elif dut == 'hamming_enc':
+        code = HammingCodec(generics['K'])
+        (goals, classify) = hamming_enc_coverage(code.get_data_bits_len())
+        produce = GoldenStimulus(golden.load('hamming_enc', generics, golden.vector_seed(seed)))
+        check = lambda v: v[1] == gl.unpack(code.encode(gl.pack(v[0], code.get_data_bits_len())[::-1])[::-1])
+    elif dut == 'hamming_dec':
+        code = HammingCodec(generics['K'])
+        n = code.get_total_bits_len()
+        (goals, classify) = hamming_dec_coverage(n)
+        produce = HammingDecStimulus(code, seed)
+        def check(v):
+            (data, sec, ded) = code.decode(gl.pack(v[0], n)[::-1])
+            return (gl.unpack(data[::-1]), sec, ded) == v[1:]
+    else:
+        raise ValueError("no stub model for design '"+dut+"'")
+
+    scheduler = CoverageScheduler(goals, classify, seed)
+    queue = Lookahead(produce, scheduler=scheduler)
+    cycles = 0
+    errors = 0
+    while not scheduler.done() and cycles < max_cycles:
+        if not check(queue.next()):
+            errors += 1
+        cycles += 1
+    return write_result(scheduler, workdir, passed=errors == 0 and scheduler.done(), cycles=cycles, errors=errors)
+
+
+def summarize(report: dict) -> str:
+    '''
+    Formats a report as a table.
+    '''
+    lines = ['{:<6} {:>9} {:>9}  {}'.format('status', 'elapsed', 'stim cov', 'job')]
+    for r in report['results']:
+        cov = '-' if r['stimulus_coverage'] is None else '{:.1%}'.format(r['stimulus_coverage'])
+        lines += ['{:<6} {:>8.2f}s {:>9}  {}'.format('PASS' if r['passed'] else 'FAIL', r['elapsed'], cov, slug(r['dut'], r['generics'], r['seed']))]
+    lines += ['info: '+str(report['passed'])+' passed, '+str(report['failed'])+' failed']
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run simulations across generics and seeds')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='run the regression')
+    run.add_argument('--manifest', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Orbit.toml'), help='Orbit manifest declaring the trials')
+    run.add_argument('--dut', nargs='+', default=None, help='designs to test instead of the manifest trials')
+    run.add_argument('--generic', action='append', default=[], help='generic values as NAME=V1,V2,... (with --dut)')
+    run.add_argument('--seeds', type=int, default=1, help='seeds per configuration')
+    run.add_argument('--seed', type=int, default=None, help='root seed for the job seeds')
+    run.add_argument('--workers', type=int, default=1, help='number of jobs to run at once')
+    run.add_argument('--timeout', type=float, default=None, help='seconds before a job is failed')
+    run.add_argument('--out', default='regress', help='directory for job working directories and the report')
+    run.add_argument('--command', default=COMMAND, help='command template for a job')
+    run.add_argument('--stub', action='store_true', help='run jobs on the stub simulator')
+
+    stb = sub.add_parser('stub', help='run a single job on the stub simulator')
+    stb.add_argument('--dut', required=True)
+    stb.add_argument('--generic', action='append', default=[], help='generic value as NAME=VALUE')
+    stb.add_argument('--seed', type=int, required=True)
+    stb.add_argument('--workdir', required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'stub':
+        generics = dict((g.partition('=')[0], parse_value(g.partition('=')[2])) for g in args.generic)
+        result = stub(args.dut, generics, args.seed, args.workdir)
+        exit(0 if result['passed'] else 1)
+
+    trials = expand(args.dut, args.generic) if args.dut is not None else load_trials(args.manifest)
+    jobs = make_jobs(trials, args.seeds, args.seed, os.path.abspath(args.out))
+    report = regress(jobs, stub_command() if args.stub else args.command, args.workers, args.timeout)
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(summarize(report))
+    exit(0 if report['failed'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestRegress(unittest.TestCase):
+    '''
+    Test cases for the regression runner.
+    '''
+
+    def test_trials(self):
+        trials = load_trials(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Orbit.toml'))
+        self.assertIn(('parity', {'W': 5, 'EVEN': True}), trials)
+        self.assertIn(('hamming_dec', {'K': 64}), trials)
+        trials = expand(['parity'], ['W=5,8', 'EVEN=true,false'])
+        self.assertEqual(len(trials), 4)
+        self.assertIn(('parity', {'W': 8, 'EVEN': False}), trials)
+
+    def test_jobs(self):
+        jobs = make_jobs([('hamming_enc', {'K': 4})], 3, 7, 'out')
+        self.assertEqual(len(set(j['workdir'] for j in jobs)), 3)
+        self.assertEqual(jobs, make_jobs([('hamming_enc', {'K': 4})], 3, 7, 'out'))
+        self.assertEqual(render('sim {dut} {generics} {seed}', jobs[0])[:4], ['sim', 'hamming_enc', '--generic', 'K=4'])
+        # every job builds into its own working directory
+        self.assertEqual(render(COMMAND, jobs[0])[2:4], ['--target-dir', jobs[0]['workdir']])
+
+    def test_stub(self):
+        trials = expand(['hamming_enc', 'hamming_dec'], ['K=4,11']) + expand(['parity'], ['W=5', 'EVEN=true,false'])
+        with tempfile.TemporaryDirectory() as tmp, unittest.mock.patch.dict(os.environ, {'GLYPH_GOLDEN_DIR': os.path.join(tmp, 'golden')}):
+            report = regress(make_jobs(trials, 2, 1, tmp), stub_command(), workers=2)
+            self.assertEqual(report['failed'], 0)
+            # jobs rotate through a bounded set of vectors per design
+            import golden
+            sets = set((j['dut'], str(j['generics']), golden.vector_seed(j['seed'])) for j in make_jobs(trials, 2, 1, tmp) if j['dut'] != 'hamming_dec')
+            self.assertEqual(len(os.listdir(os.path.join(tmp, 'golden'))), len(sets))
+            self.assertGreater(len(sets), 4)
+            self.assertEqual(len(report['results']), 12)
+            self.assertTrue(all(r['stimulus_coverage'] == 1.0 for r in report['results']))
+            # a failing command is reported without stopping the others
+            report = regress(make_jobs(trials[:1], 1, 1, tmp), sys.executable+' -c "exit(3)"')
+            self.assertEqual(report['failed'], 1)
+            self.assertEqual(report['results'][0]['returncode'], 3)
+            # a result is read from the result directory
+            script = "import json, os; json.dump(dict(stimulus_coverage=0.75), open(os.path.join(os.environ['GLYPH_RESULT_DIR'], 'result.json'), 'w'))"
+            report = regress(make_jobs(trials[:1], 1, 1, tmp), shlex.quote(sys.executable)+' -c '+shlex.quote(script))
+            self.assertEqual(report['results'][0]['stimulus_coverage'], 0.75)
+            # only the exit status of the command decides a pass
+            self.assertEqual(report['passed'], 1)
+            report = regress(make_jobs(trials[:1], 1, 1, tmp), shlex.quote(sys.executable)+' -c '+shlex.quote(script+'; exit(1)'))
+            self.assertEqual(report['failed'], 1)
+            # and is not taken for a later run of the job that writes none
+            report = regress(make_jobs(trials[:1], 1, 1, tmp), shlex.quote(sys.executable)+' -c pass')
+            self.assertEqual(report['passed'], 1)
+            self.assertIsNone(report['results'][0]['stimulus_coverage'])
@@ -0,0 +1,440 @@
+'''
+Asyncio TCP service hosting the codecs, with micro-batching.
+
+Clients send encode or decode requests of one block each over a TCP
+connection and may keep many requests in flight. The server queues the
+requests for each operation and code, and dispatches a queue to the batch
+codec paths once it holds `max_batch` requests or its oldest request has
+waited `max_wait` seconds. Batches run on the event loop, or in a process
+pool with `workers` > 0 so coding does not hold up the network.
+
+Every message is a little-endian header followed by a payload:
+
+- request: id (4 bytes), operation (0 encode, 1 decode), codec id (as in
+`codes.py`), K (2 bytes), payload length (2 bytes), then the data word (for
+encode) or block (for decode) with bit _i_ at bit _i_ % 8 of byte _i_ / 8.
+- response: id (4 bytes), status, payload length (2 bytes), then the block
+(for encode) or data word (for decode). The status holds `sec`/`tec` at bit
+0 and `ded`/`qed` at bit 1, or is `STATUS_ERROR` with an error message as the
+payload.
+
+Responses are sent as each batch completes, so they may arrive out of order
+and are matched to requests by id.
+
+Usage: `python service.py serve --port 7474 --max-batch 256 --max-wait 0.001`
+and `python service.py load hamming:57 --frames 100000 --concurrency 256`
+(without `--port`, the load generator starts its own server on loopback).
+
+To execute unit tests for this module, run: `python -m unittest service.py`.
+'''
+
+import argparse
+import asyncio
+import random
+import struct
+import time
+import unittest
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from codes import CODECS, make_frames, to_spec
+
+REQUEST = struct.Struct('<IBBHH')
+
+RESPONSE = struct.Struct('<IBH')
+
+OP_ENCODE = 0
+OP_DECODE = 1
+
+STATUS_ERROR = 0x80
+
+# spec -> batch framing, built once per process
+_FRAMES = dict()
+
+
+def get_frames(spec: str):
+    '''
+    Returns the cached batch framing for the code named by `spec`.
+    '''
+    if spec not in _FRAMES:
+        _FRAMES[spec] = make_frames(spec)
+    return _FRAMES[spec]
+
+
+def payload_len(op: int, spec: str) -> int:
+    '''
+    Returns the number of payload bytes of a request `op` for `spec`.
+    '''
+    frames = get_frames(spec)
+    return -(-(frames.k if op == OP_ENCODE else frames.n) // 8)
+
+
+def _to_bits(payloads: list, size: int):
+    # one row of `size` bits per payload
+    raw = np.frombuffer(b''.join(payloads), dtype=np.uint8).reshape(len(payloads), -1)
+    return np.unpackbits(raw, axis=1, bitorder='little')[:, :size]
+
+
+def _from_bits(bits) -> list:
+    raw = np.packbits(np.asarray(bits, dtype=np.uint8), axis=1, bitorder='little')
+    return [row.tobytes() for row in raw]
+
+
+def process_batch(op: int, spec: str, payloads: list) -> list:
+    '''
+    Encodes or decodes the blocks of a batch of request `payloads` at once.
+
+    Returns a `(status, payload)` response per request.
+    '''
+    frames = get_frames(spec)
+    if op == OP_ENCODE:
+        blocks = frames.encode(_to_bits(payloads, frames.k))
+        return [(0, p) for p in _from_bits(blocks)]
+    (data, corrected, detected) = frames.decode(_to_bits(payloads, frames.n))
+    status = np.asarray(corrected, dtype=np.uint8) | np.asarray(detected, dtype=np.uint8) << 1
+    return list(zip((int(s) for s in status), _from_bits(data)))
+
+
+class CodecServer:
+    '''
+    TCP server coalescing concurrent requests into micro-batches.
+    '''
+
+    def __init__(self, host: str='127.0.0.1', port: int=0, max_batch: int=256, max_wait: float=0.001, workers: int=0):
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pool = ProcessPoolExecutor(workers) if workers > 0 else None
+        # (op, spec) -> list of (payload, future) waiting for a batch
+        self._queues = dict()
+        self._timers = dict()
+        # batches being coded
+        self._running = set()
+        self._server = None
+        # connection handler -> its writer
+        self._connections = dict()
+        self.stats = {'frames': 0, 'batches': 0}
+
+    async def start(self):
+        '''
+        Starts listening; the bound port is stored in `port`.
+        '''
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        '''
+        Stops listening, closes the open connections and shuts down the
+        process pool.
+        '''
+        self._server.close()
+        for writer in list(self._connections.values()):
+            writer.close()
+        await asyncio.gather(*self._connections.keys(), return_exceptions=True)
+        await self._server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def submit(self, op: int, spec: str, payload: bytes) -> asyncio.Future:
+        '''
+        Queues a request, returning a future for its `(status, payload)`.
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (op, spec)
+        queue = self._queues.setdefault(key, [])
+        queue += [(payload, future)]
+        if len(queue) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key)
+        return future
+
+    def _flush(self, key: tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._queues.pop(key, [])
+        if len(batch) > 0:
+            self.stats['frames'] += len(batch)
+            self.stats['batches'] += 1
+            task = asyncio.get_running_loop().create_task(self._run(key, batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, key: tuple, batch: list):
+        (op, spec) = key
+        payloads = [p for (p, _) in batch]
+        try:
+            if self.pool is None:
+                results = process_batch(op, spec, payloads)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(self.pool, process_batch, op, spec, payloads)
+        except Exception as e:
+            results = [(STATUS_ERROR, str(e).encode())] * len(batch)
+        for ((_, future), result) in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _respond(self, writer, rid: int, future):
+        (status, payload) = await future
+        writer.write(RESPONSE.pack(rid, status, len(payload)) + payload)
+
+    async def _serve(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        tasks = set()
+        try:
+            while True:
+                (rid, op, codec, k, length) = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                payload = await reader.readexactly(length)
+                try:
+                    spec = to_spec(codec, k)
+                    if op not in (OP_ENCODE, OP_DECODE):
+                        raise ValueError('unknown operation '+str(op))
+                    if length != payload_len(op, spec):
+                        raise ValueError('expected '+str(payload_len(op, spec))+' payload bytes')
+                except ValueError as e:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result((STATUS_ERROR, str(e).encode()))
+                else:
+                    future = self.submit(op, spec, payload)
+                task = asyncio.create_task(self._respond(writer, rid, future))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        if len(tasks) > 0:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close()
+        del self._connections[asyncio.current_task()]
+    pass
+
+
+class CodecClient:
+    '''
+    Client keeping any number of requests in flight on one connection.
+    '''
+
+    def __init__(self):
+        self._reader = None
+        self._writer = None
+        self._pending = dict()
+        self._next = 0
+        self._task = None
+
+    async def connect(self, host: str, port: int):
+        (self._reader, self._writer) = await asyncio.open_connection(host, port)
+        self._task = asyncio.create_task(self._receive())
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._task.cancel()
+
+    async def _receive(self):
+        try:
+            while True:
+                (rid, status, length) = RESPONSE.unpack(await self._reader.readexactly(RESPONSE.size))
+                payload = await self._reader.readexactly(length)
+                self._pending.pop(rid).set_result((status, payload))
+        except asyncio.IncompleteReadError as e:
+            for future in self._pending.values():
+                future.set_exception(ConnectionError('connection closed by the server'))
+
+    async def request(self, op: int, codec: int, k: int, payload: bytes) -> tuple:
+        '''
+        Sends a raw request and waits for its `(status, payload)`.
+        '''
+        rid = self._next
+        self._next = (self._next + 1) % 2**32
+        future = asyncio.get_running_loop().create_future()
+        self._pending[rid] = future
+        self._writer.write(REQUEST.pack(rid, op, codec, k, len(payload)) + payload)
+        (status, payload) = await future
+        if status == STATUS_ERROR:
+            raise ValueError(payload.decode())
+        return (status, payload)
+
+    async def encode(self, spec: str, data: int) -> int:
+        '''
+        Encodes the data word `data`, returning the block.
+        '''
+        frames = get_frames(spec)
+        name = spec.partition(':')[0]
+        (_, block) = await self.request(OP_ENCODE, CODECS[name], frames.k, data.to_bytes(payload_len(OP_ENCODE, spec), 'little'))
+        return int.from_bytes(block, 'little')
+
+    async def decode(self, spec: str, block: int) -> tuple:
+        '''
+        Decodes the block `block`.
+
+        Returns `(data, corrected, detected)`.
+        '''
+        frames = get_frames(spec)
+        name = spec.partition(':')[0]
+        (status, data) = await self.request(OP_DECODE, CODECS[name], frames.k, block.to_bytes(payload_len(OP_DECODE, spec), 'little'))
+        return (int.from_bytes(data, 'little'), status & 1, (status >> 1) & 1)
+    pass
+
+
+async def load(host: str, port: int, spec: str, frames: int=10_000, concurrency: int=64, seed: int=None) -> dict:
+    '''
+    Runs `frames` encode and decode round trips of random data with a single
+    bit error through the service, keeping `concurrency` frames in flight.
+
+    Returns the `frames`, `seconds`, `fps` (frames per second), request
+    latencies `p50` and `p99` in seconds, and the number of `failures`.
+    '''
+    rng = random.Random(seed)
+    framing = get_frames(spec)
+    client = CodecClient()
+    await client.connect(host, port)
+    latencies = []
+    failures = 0
+    remaining = frames
+
+    async def worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            data = rng.getrandbits(framing.k)
+            start = time.perf_counter()
+            block = await client.encode(spec, data)
+            latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            (decoded, corrected, detected) = await client.decode(spec, block ^ 1 << rng.randrange(framing.n))
+            latencies.append(time.perf_counter() - start)
+            if decoded != data or corrected != 1 or detected != 0:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(0, concurrency)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+    latencies.sort()
+    return {
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames/elapsed,
+        'p50': latencies[len(latencies)//2],
+        'p99': latencies[min(len(latencies)-1, len(latencies)*99//100)],
+        'failures': failures,
+    }
+
+
+async def run_load(spec: str, frames: int=10_000, concurrency: int=64, max_batch: int=256, max_wait: float=0.001,
+    workers: int=0, seed: int=None) -> dict:
+    '''
+    Starts a server on loopback and runs `load` against it.
+
+    Returns the results of `load` with the server's mean `batch` size.
+    '''
+    server = CodecServer('127.0.0.1', 0, max_batch, max_wait, workers)
+    await server.start()
+    try:
+        result = await load('127.0.0.1', server.port, spec, frames, concurrency, seed)
+    finally:
+        await server.close()
+    result['batch'] = server.stats['frames']/max(1, server.stats['batches'])
+    return result
+
+
+async def serve(host: str, port: int, max_batch: int, max_wait: float, workers: int):
+    server = CodecServer(host, port, max_batch, max_wait, workers)
+    await server.start()
+    print('info: listening on '+host+':'+str(server.port))
+    await server._server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the codecs over TCP or load test the service')
+    sub = parser.add_subparsers(dest='command', required=True)
+    server = sub.add_parser('serve', help='run the codec service')
+    server.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    server.add_argument('--port', type=int, default=7474, help='port to listen on')
+    gen = sub.add_parser('load', help='measure latency and throughput of the service')
+    gen.add_argument('code', help="code to exercise ('hamming:K' or 'golay')")
+    gen.add_argument('--host', default='127.0.0.1', help='address of the service')
+    gen.add_argument('--port', type=int, default=None, help='port of a running service (default: start one on loopback)')
+    gen.add_argument('--frames', type=int, default=10_000, help='round trips to run')
+    gen.add_argument('--concurrency', type=int, default=64, help='frames kept in flight')
+    gen.add_argument('--seed', type=int, default=None, help='seed for the random data')
+    for p in [server, gen]:
+        p.add_argument('--max-batch', type=int, default=256, help='requests per batch')
+        p.add_argument('--max-wait', type=float, default=0.001, help='seconds a request waits for its batch to fill')
+        p.add_argument('--workers', type=int, default=0, help='processes coding the batches (0 for the event loop)')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait, args.workers))
+        return
+    if args.port is None:
+        result = asyncio.run(run_load(args.code, args.frames, args.concurrency, args.max_batch, args.max_wait, args.workers, args.seed))
+    else:
+        result = asyncio.run(load(args.host, args.port, args.code, args.frames, args.concurrency, args.seed))
+    print('frames: '+str(result['frames'])+', frames/s: {:.0f}'.format(result['fps']), end='')
+    print(', p50: {:.3f} ms, p99: {:.3f} ms'.format(result['p50']*1e3, result['p99']*1e3), end='')
+    if 'batch' in result:
+        print(', mean batch: {:.1f}'.format(result['batch']), end='')
+    print(', failures: '+str(result['failures']))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestService(unittest.TestCase):
+    '''
+    Test cases for the codec service.
+    '''
+
+    def test_process_batch(self):
+        from hamming import HammingCodec
+        from golay import GolayCodec
+        hc = HammingCodec(11)
+        gc = GolayCodec()
+        data = [0, 1, 0x7ff, 0x2a5]
+        blocks = process_batch(OP_ENCODE, 'hamming:11', [d.to_bytes(2, 'little') for d in data])
+        self.assertEqual([int.from_bytes(b, 'little') for (_, b) in blocks], [hc.encode_int(d) for d in data])
+        # a single and a double error
+        rx = [hc.encode_int(0x2a5) ^ 1 << 3, hc.encode_int(0x2a5) ^ 0b11 << 5]
+        results = process_batch(OP_DECODE, 'hamming:11', [b.to_bytes(2, 'little') for b in rx])
+        self.assertEqual(results[0], (1, (0x2a5).to_bytes(2, 'little')))
+        self.assertEqual(results[1][0], 2)
+        (check, parity) = gc.encode(0xabc)
+        block = parity << 23 | check << 12 | 0xabc
+        results = process_batch(OP_DECODE, 'golay', [(block ^ 0b111 << 4).to_bytes(3, 'little')])
+        self.assertEqual(results, [(1, (0xabc).to_bytes(2, 'little'))])
+
+    def test_roundtrip(self):
+        async def run():
+            server = CodecServer(max_batch=32, max_wait=0.01)
+            await server.start()
+            client = CodecClient()
+            await client.connect('127.0.0.1', server.port)
+            rng = random.Random(1)
+            data = [rng.getrandbits(57) for _ in range(0, 100)]
+            blocks = await asyncio.gather(*(client.encode('hamming:57', d) for d in data))
+            decoded = await asyncio.gather(*(client.decode('hamming:57', b ^ 1 << (i % 64)) for (i, b) in enumerate(blocks)))
+            with self.assertRaises(ValueError):
+                await client.request(OP_DECODE, 7, 4, b'\x00')
+            with self.assertRaises(ValueError):
+                await client.request(OP_ENCODE, CODECS['golay'], 12, b'\x00')
+            await client.close()
+            await server.close()
+            return (data, decoded, server.stats)
+
+        (data, decoded, stats) = asyncio.run(run())
+        self.assertEqual(decoded, [(d, 1, 0) for d in data])
+        # concurrent requests were coalesced
+        self.assertLess(stats['batches'], stats['frames']//4)
+
+    def test_load(self):
+        for workers in [0, 1]:
+            result = asyncio.run(run_load('golay', frames=300, concurrency=16, max_batch=16, workers=workers, seed=2))
+            self.assertEqual(result['failures'], 0)
+            self.assertGreater(result['fps'], 0)
+            self.assertLessEqual(result['p50'], result['p99'])
+            self.assertGreater(result['batch'], 1)
+    pass
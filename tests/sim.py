@@ -0,0 +1,570 @@
+'''
+Monte Carlo simulation of decoded bit-error and frame-error rates.
+
+Random messages are encoded with a batch codec path, sent over a binary
+symmetric channel, and decoded; each frame is then counted as clean,
+corrected, detected (uncorrectable) or miscorrected (wrong data without being
+flagged). Trials are split into fixed-size shards that each draw from their
+own child of a `numpy.random.SeedSequence`, so results are reproducible for a
+given seed regardless of how many processes run the shards.
+
+Codes are named by a spec string: `hamming:K` for `HammingCodec(K)` or
+`golay` for `GolayCodec`, optionally followed by an interleaver between the
+code and the channel as `hamming:11+block:8` (see `interleave.py`). The
+channel is either a binary symmetric channel (`bsc`) flipping each bit with
+probability `p`, or `burst:L` sending one burst of L flipped bits with
+probability `p` per interleaver span (or per block without an interleaver).
+
+Each point runs until it reaches `--frames`, or earlier once it has seen a
+target number of frame errors or its confidence interval is narrow enough.
+Finished points can be streamed to a CSV or JSON lines file, and a sweep
+pointed at an existing file only simulates the points missing from it.
+
+Usage: `python sim.py hamming:11 -p 1e-3 1e-2 --frames 100000000 --target-errors 100 --out ber.csv --workers 4`
+
+To execute unit tests for this module, run: `python -m unittest sim.py`.
+'''
+
+import argparse
+import csv
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from channel import BinarySymmetricChannel, BurstChannel
+from interleave import make_interleaver
+from codes import make_frames
+
+# counters tracked for every simulated point
+FIELDS = ['frames', 'clean', 'corrected', 'detected', 'miscorrected', 'frame_errors', 'bit_errors']
+
+# run settings a logged point is only reused under
+SETTINGS = ['seed', 'budget', 'shard', 'target_errors', 'rel_ci']
+
+# columns recorded for every finished point
+ROW = ['code', 'p', 'channel'] + SETTINGS + FIELDS + ['ber', 'fer', 'fer_lo', 'fer_hi']
+
+# values of the columns missing from logs written before they were added
+# (points without their settings are simulated again)
+DEFAULTS = {'channel': 'bsc'}
+
+
+def split_spec(spec: str) -> tuple:
+    '''
+    Splits a spec into the framing for its code and its interleaver (or
+    `None`).
+    '''
+    (code, _, il) = spec.partition('+')
+    return (make_frames(code), make_interleaver(il) if il != '' else None)
+
+
+def make_channel(channel: str, p: float, seed=None, guard: int=0):
+    '''
+    Creates the channel named by `channel` with probability `p`, keeping the
+    last `guard` bits of each row clear of bursts.
+    '''
+    (name, _, length) = channel.partition(':')
+    if name == 'bsc' and length == '':
+        return BinarySymmetricChannel(p, seed=seed)
+    elif name == 'burst' and length.isdigit() and int(length) > 0:
+        return BurstChannel(int(length), rate=p, guard=guard, seed=seed)
+    raise ValueError("unknown channel '"+channel+"' (expected 'bsc' or 'burst:L')")
+
+
+def new_counts() -> dict:
+    '''
+    Returns a zeroed set of counters.
+    '''
+    return dict((f, 0) for f in FIELDS)
+
+
+def merge_counts(total: dict, counts: dict) -> dict:
+    '''
+    Adds the `counts` into `total` in place.
+    '''
+    for f in FIELDS:
+        total[f] += counts[f]
+    return total
+
+
+def run_trials(spec: str, p: float, frames: int, seed, channel: str='bsc', batch: int=10_000) -> dict:
+    '''
+    Simulates `frames` frames of the code `spec` over the `channel` with 
+    probability `p`, drawing from the generator `seed`.
+
+    Returns the counters for the trials.
+    '''
+    (code, il) = split_spec(spec)
+    rng = np.random.default_rng(seed)
+    link = make_channel(channel, p, seed=rng, guard=0 if il is None else il.guard(code.n))
+    counts = new_counts()
+    left = frames
+    while left > 0:
+        size = min(batch, left)
+        data = rng.integers(0, 2, size=(size, code.k), dtype=np.uint8)
+        blocks = code.encode(data)
+        if il is None:
+            blocks = link.transmit(blocks)
+        else:
+            # send the stream in rows of one span so each burst is independent
+            stream = il.interleave(blocks)
+            width = il.span(code.n)
+            rows = np.zeros(-(-len(stream) // width)*width, dtype=np.uint8)
+            rows[:len(stream)] = stream
+            rx = link.transmit(rows.reshape(-1, width)).ravel()[:len(stream)]
+            blocks = il.deinterleave(rx, code.n)[:size]
+        (rx, corrected, detected) = code.decode(blocks)
+        wrong = (rx != data).sum(axis=1)
+        detected = detected == 1
+        bad = (wrong > 0) & ~detected
+        fixed = (corrected == 1) & ~detected & ~bad
+        counts['frames'] += size
+        counts['detected'] += int(detected.sum())
+        counts['miscorrected'] += int(bad.sum())
+        counts['corrected'] += int(fixed.sum())
+        counts['clean'] += int(size - detected.sum() - bad.sum() - fixed.sum())
+        counts['frame_errors'] += int((wrong > 0).sum())
+        counts['bit_errors'] += int(wrong.sum())
+        left -= size
+    return counts
+
+
+def _point_seed(seed, p: float) -> np.random.SeedSequence:
+    '''
+    Derives the seed sequence of the point at probability `p` from `seed`,
+    which is either an integer, `None` or a `SeedSequence`.
+
+    The child is keyed on the bits of `p` rather than on the position of the
+    point in a sweep, so adding or reordering points keeps every stream.
+    '''
+    root = _seed_sequence(seed)
+    bits = struct.unpack('<Q', struct.pack('<d', float(p)))[0]
+    key = (bits & 0xffffffff, bits >> 32)
+    return np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key+key, pool_size=root.pool_size)
+
+
+def _seed_sequence(seed) -> np.random.SeedSequence:
+    '''
+    Wraps `seed` as a `SeedSequence` unless it already is one.
+    '''
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed
+
+
+def _run_shard(args: tuple) -> dict:
+    '''
+    Runs a single shard of trials in a worker process.
+    '''
+    return run_trials(*args)
+
+
+def wilson(errors: int, trials: int, z: float=1.96) -> tuple:
+    '''
+    Computes the Wilson score interval `(lo, hi)` for an error rate of 
+    `errors` out of `trials` at a confidence given by the normal quantile `z`.
+    '''
+    if trials == 0:
+        return (0.0, 1.0)
+    rate = errors/trials
+    denom = 1 + z*z/trials
+    center = (rate + z*z/(2*trials))/denom
+    half = z*math.sqrt(rate*(1-rate)/trials + z*z/(4*trials*trials))/denom
+    return (max(0.0, center-half), min(1.0, center+half))
+
+
+def converged(counts: dict, target_errors: int=None, rel_ci: float=None, z: float=1.96) -> bool:
+    '''
+    Checks if a point has met its stopping rule: at least `target_errors` frame
+    errors, or a confidence interval on the frame error rate whose half-width 
+    is at most `rel_ci` relative to the rate.
+    '''
+    errors = counts['frame_errors']
+    if target_errors is not None and errors >= target_errors:
+        return True
+    if rel_ci is not None and errors > 0:
+        (lo, hi) = wilson(errors, counts['frames'], z)
+        if (hi-lo)/2 <= rel_ci*errors/counts['frames']:
+            return True
+    return False
+
+
+def simulate(spec: str, p: float, frames: int, seed=None, pool=None, shard: int=100_000, 
+    target_errors: int=None, rel_ci: float=None, window: int=1, channel: str='bsc') -> dict:
+    '''
+    Simulates up to `frames` frames over the `channel` at probability `p`,
+    split into shards of at most `shard` frames that run on the executor
+    `pool` (or in this process).
+
+    Shards are merged in order as they complete and the point stops early once
+    it `converged` under `target_errors` or `rel_ci`. Up to `window` shards are
+    kept in flight on the `pool` (one at a time without it); shards beyond the
+    stopping point are discarded so the result does not depend on the `window`.
+
+    Returns the aggregated counters.
+    '''
+    seed = _seed_sequence(seed)
+    total = new_counts()
+    pending = deque()
+    submitted = 0
+    depth = max(window, 1) if pool is not None else 1
+    while True:
+        while len(pending) < depth and submitted < frames:
+            job = (spec, p, min(shard, frames-submitted), seed.spawn(1)[0], channel)
+            submitted += job[2]
+            pending.append(pool.submit(_run_shard, job) if pool is not None else job)
+        if len(pending) == 0:
+            break
+        item = pending.popleft()
+        merge_counts(total, item.result() if pool is not None else _run_shard(item))
+        if converged(total, target_errors, rel_ci):
+            break
+    if pool is not None:
+        for item in pending:
+            item.cancel()
+    return total
+
+
+def _setting(value) -> str:
+    '''
+    Normalizes a run setting for comparison, as CSV logs store text.
+    '''
+    return '' if value is None else str(value)
+
+
+def _complete(row: dict) -> bool:
+    '''
+    Checks that a logged `row` holds every counter and rate.
+    '''
+    try:
+        for f in FIELDS:
+            int(row[f])
+        for f in ['p', 'ber', 'fer', 'fer_lo', 'fer_hi']:
+            float(row[f])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return True
+
+
+class ResultLog:
+    '''
+    Append-only record of finished points, written as CSV or as JSON lines
+    (for a `.json`/`.jsonl` path) so an interrupted sweep can resume.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.json = path.endswith('.json') or path.endswith('.jsonl')
+
+    def load(self) -> list:
+        '''
+        Reads every complete row from the log, skipping any partial row left by
+        an interruption (one without its line ending or with a missing or
+        unparsable value).
+        '''
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', newline='') as f:
+            data = f.read()
+        # the same cut `_trim` makes before appending
+        lines = data[:data.rfind('\n')+1].splitlines(keepends=True)
+        if self.json:
+            rows = []
+            for line in lines:
+                try:
+                    rows += [json.loads(line)]
+                except json.JSONDecodeError:
+                    pass
+        else:
+            rows = list(csv.DictReader(lines))
+        return [row for row in rows if _complete(row)]
+
+    def find(self, spec: str, p: float, channel: str='bsc', settings: dict=None):
+        '''
+        Returns the counters of a finished point, if any, that was simulated
+        under the same `settings` (see `SETTINGS`).
+        '''
+        settings = dict() if settings is None else settings
+        for row in self.load():
+            if row['code'] != spec or float(row['p']) != p or row.get('channel', 'bsc') != channel:
+                continue
+            if all(_setting(row.get(c)) == _setting(v) for (c, v) in settings.items()):
+                return dict((f, int(row[f])) for f in FIELDS)
+        return None
+
+    def _trim(self):
+        '''
+        Drops a trailing partial row left by an interruption.
+        '''
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if len(data) > 0 and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n')+1)
+
+    def _migrate(self):
+        '''
+        Rewrites a CSV log whose header differs from `ROW` under the current
+        header, filling the columns it lacks from `DEFAULTS`.
+        '''
+        if self.json or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'r', newline='') as f:
+            fields = next(csv.reader(f), [])
+        if fields == ROW:
+            return
+        rows = self.load()
+        tmp = self.path+'.tmp'
+        with open(tmp, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=ROW)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict((c, row.get(c, DEFAULTS.get(c, ''))) for c in ROW))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def append(self, row: dict):
+        '''
+        Writes a finished point to the end of the log.
+        '''
+        self._trim()
+        self._migrate()
+        header = not self.json and (not os.path.exists(self.path) or os.path.getsize(self.path) == 0)
+        with open(self.path, 'a', newline='') as f:
+            if self.json:
+                f.write(json.dumps(row) + '\n')
+            else:
+                writer = csv.DictWriter(f, fieldnames=ROW)
+                if header:
+                    writer.writeheader()
+                writer.writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+    pass
+
+
+def to_row(spec: str, p: float, counts: dict, channel: str='bsc', settings: dict=None) -> dict:
+    '''
+    Formats the counters of a point along with its run `settings`, its error
+    rates and the 95% confidence interval on its frame error rate.
+    '''
+    (ber, fer) = rates(spec, counts)
+    (lo, hi) = wilson(counts['frame_errors'], counts['frames'])
+    row = {'code': spec, 'p': p, 'channel': channel}
+    settings = dict() if settings is None else settings
+    row.update(dict((c, settings.get(c)) for c in SETTINGS))
+    row.update(counts)
+    row.update({'ber': ber, 'fer': fer, 'fer_lo': lo, 'fer_hi': hi})
+    return row
+
+
+def iter_sweep(spec: str, ps: list, frames: int, seed=None, workers: int=1, shard: int=100_000,
+    target_errors: int=None, rel_ci: float=None, log: ResultLog=None, channel: str='bsc'):
+    '''
+    Simulates each probability in `ps` over the `channel` with its own seed
+    stream, using a pool of `workers` processes, yielding `(p, counts)` as each
+    point finishes.
+
+    Points already recorded in the `log` under the same seed, frame budget,
+    shard size and stopping rule are yielded from it without being simulated
+    again; new points are appended to it as they finish.
+    '''
+    root = _seed_sequence(seed)
+    settings = {'seed': seed, 'budget': frames, 'shard': shard, 'target_errors': target_errors, 'rel_ci': rel_ci}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for p in ps:
+            counts = log.find(spec, p, channel, settings) if log is not None else None
+            if counts is None:
+                counts = simulate(spec, p, frames, _point_seed(root, p), pool, shard, target_errors, rel_ci, workers, channel)
+                if log is not None:
+                    log.append(to_row(spec, p, counts, channel, settings))
+            yield (p, counts)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    pass
+
+
+def sweep(spec: str, ps: list, frames: int, seed=None, workers: int=1, shard: int=100_000,
+    target_errors: int=None, rel_ci: float=None, log: ResultLog=None, channel: str='bsc') -> list:
+    '''
+    Simulates each probability in `ps` (see `iter_sweep`).
+
+    Returns a list of `(p, counts)`.
+    '''
+    return list(iter_sweep(spec, ps, frames, seed, workers, shard, target_errors, rel_ci, log, channel))
+
+
+def rates(spec: str, counts: dict) -> tuple:
+    '''
+    Computes the decoded `(ber, fer)` from the counters of code `spec`.
+    '''
+    frames = max(counts['frames'], 1)
+    return (counts['bit_errors']/(frames*split_spec(spec)[0].k), counts['frame_errors']/frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo BER/FER simulation of the ECC models')
+    parser.add_argument('code', help="code to simulate ('hamming:K' or 'golay', optionally with '+block:D' or '+conv:B:D')")
+    parser.add_argument('-p', type=float, nargs='+', required=True, help='channel flip (or burst) probabilities')
+    parser.add_argument('--channel', default='bsc', help="channel model ('bsc' or 'burst:L')")
+    parser.add_argument('--frames', type=int, default=1_000_000, help='maximum frames per point')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes')
+    parser.add_argument('--shard', type=int, default=100_000, help='frames per shard')
+    parser.add_argument('--seed', type=int, default=None, help='root seed')
+    parser.add_argument('--target-errors', type=int, default=None, help='stop a point after this many frame errors')
+    parser.add_argument('--rel-ci', type=float, default=None, help='stop a point once the 95%% confidence half-width relative to the FER is below this')
+    parser.add_argument('--out', default=None, help='CSV or JSON lines file to stream results into (resumes if it exists)')
+    args = parser.parse_args()
+
+    log = ResultLog(args.out) if args.out is not None else None
+    settings = {'seed': args.seed, 'budget': args.frames, 'shard': args.shard, 'target_errors': args.target_errors, 'rel_ci': args.rel_ci}
+    writer = csv.DictWriter(sys.stdout, fieldnames=ROW)
+    writer.writeheader()
+    for (p, counts) in iter_sweep(args.code, args.p, args.frames, args.seed, args.workers, args.shard, args.target_errors, args.rel_ci, log, args.channel):
+        writer.writerow(to_row(args.code, p, counts, args.channel, settings))
+        sys.stdout.flush()
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestSim(unittest.TestCase):
+    '''
+    Test cases for the simulation engine.
+    '''
+
+    def test_noiseless(self):
+        for spec in ['hamming:11', 'golay']:
+            counts = simulate(spec, 0.0, 2_000, seed=1)
+            self.assertEqual(counts['clean'], 2_000)
+            self.assertEqual(counts['frame_errors'], 0)
+
+    def test_counts(self):
+        for spec in ['hamming:4', 'hamming:32', 'golay']:
+            counts = simulate(spec, 0.05, 5_000, seed=2, shard=1_500)
+            self.assertEqual(counts['frames'], 5_000)
+            self.assertEqual(counts['clean']+counts['corrected']+counts['detected']+counts['miscorrected'], 5_000)
+            self.assertGreater(counts['corrected'], 0)
+            self.assertLessEqual(counts['miscorrected'], counts['frame_errors'])
+
+    def test_reproducible(self):
+        serial = sweep('hamming:26', [0.01, 0.02], 4_000, seed=3, workers=1, shard=1_000)
+        parallel = sweep('hamming:26', [0.01, 0.02], 4_000, seed=3, workers=2, shard=1_000)
+        self.assertEqual(serial, parallel)
+
+    def test_interleaved(self):
+        # a burst per block defeats the code alone, but not behind an
+        # interleaver as deep as the burst
+        counts = simulate('hamming:11', 1.0, 2_000, seed=6, channel='burst:4')
+        self.assertEqual(counts['clean'], 0)
+        for il in ['block:4', 'conv:4:5']:
+            counts = simulate('hamming:11+'+il, 1.0, 2_000, seed=6, channel='burst:4')
+            self.assertEqual(counts['frame_errors'], 0)
+            self.assertGreater(counts['corrected'], 0)
+        # interleaving does not change the statistics of independent errors
+        counts = simulate('golay+block:3', 0.0, 1_000, seed=6)
+        self.assertEqual(counts['clean'], 1_000)
+        with self.assertRaises(ValueError):
+            make_channel('burst', 0.1)
+
+    def test_early_stop(self):
+        counts = simulate('hamming:11', 0.05, 1_000_000, seed=4, shard=1_000, target_errors=50)
+        self.assertGreaterEqual(counts['frame_errors'], 50)
+        self.assertLess(counts['frames'], 1_000_000)
+        counts = simulate('golay', 0.05, 1_000_000, seed=4, shard=1_000, rel_ci=0.25)
+        (lo, hi) = wilson(counts['frame_errors'], counts['frames'])
+        self.assertLessEqual((hi-lo)/2, 0.25*counts['frame_errors']/counts['frames'])
+        self.assertLess(counts['frames'], 1_000_000)
+        # the window of in-flight shards does not change the result
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            windowed = simulate('hamming:11', 0.05, 1_000_000, 4, pool, 1_000, target_errors=50, window=4)
+        self.assertEqual(windowed, simulate('hamming:11', 0.05, 1_000_000, seed=4, shard=1_000, target_errors=50))
+        # a window without a pool runs one shard at a time
+        serial = simulate('hamming:11', 0.05, 100_000, seed=4, shard=1_000, target_errors=50, window=4)
+        self.assertEqual(serial, windowed)
+
+    def test_resume(self):
+        for ext in ['.csv', '.jsonl']:
+            with tempfile.TemporaryDirectory() as tmp:
+                log = ResultLog(os.path.join(tmp, 'ber'+ext))
+                first = sweep('hamming:4', [0.01], 2_000, seed=5, shard=500, log=log)
+                # simulate an interruption that leaves a partial row
+                with open(log.path, 'a') as f:
+                    f.write('hamming:4,0.02,2')
+                full = sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500, log=log)
+                self.assertEqual(full[0], first[0])
+                self.assertEqual(full, sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500))
+                self.assertEqual(len(log.load()), 2)
+
+    def test_point_seeds(self):
+        # each point keeps its stream when the sweep adds or reorders points
+        both = sweep('hamming:11', [0.01, 0.02], 2_000, seed=7, shard=500)
+        self.assertEqual(sweep('hamming:11', [0.02], 2_000, seed=7, shard=500)[0], both[1])
+        self.assertEqual(sweep('hamming:11', [0.02, 0.01], 2_000, seed=7, shard=500), both[::-1])
+        self.assertNotEqual(both[0][1], sweep('hamming:11', [0.01], 2_000, seed=8, shard=500)[0][1])
+
+    def test_resume_old_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = ResultLog(os.path.join(tmp, 'ber.csv'))
+            first = sweep('hamming:4', [0.01], 2_000, seed=5, shard=500)
+            # a log written before the channel and settings columns existed
+            old = ['code', 'p'] + FIELDS + ['ber', 'fer', 'fer_lo', 'fer_hi']
+            with open(log.path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=old)
+                writer.writeheader()
+                row = to_row('hamming:4', 0.01, first[0][1])
+                writer.writerow(dict((c, row[c]) for c in old))
+            full = sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500, log=log)
+            self.assertEqual(full, sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500))
+            with open(log.path, 'r', newline='') as f:
+                self.assertEqual(next(csv.reader(f)), ROW)
+            # the old point is kept, but simulated again as its settings are
+            # unknown
+            self.assertEqual([(r['channel'], r['seed']) for r in log.load()], [('bsc', ''), ('bsc', '5'), ('bsc', '5')])
+            # resuming again reuses both new points
+            self.assertEqual(sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500, log=log), full)
+            self.assertEqual(len(log.load()), 3)
+
+    def test_resume_settings(self):
+        for ext in ['.csv', '.jsonl']:
+            with tempfile.TemporaryDirectory() as tmp:
+                log = ResultLog(os.path.join(tmp, 'ber'+ext))
+                sweep('hamming:4', [0.01], 2_000, seed=5, shard=500, log=log)
+                # a different seed, budget or stopping rule does not reuse it
+                other = sweep('hamming:4', [0.01], 2_000, seed=6, shard=500, log=log)
+                self.assertEqual(other, sweep('hamming:4', [0.01], 2_000, seed=6, shard=500))
+                sweep('hamming:4', [0.01], 3_000, seed=5, shard=500, log=log)
+                sweep('hamming:4', [0.01], 2_000, seed=5, shard=500, target_errors=10, log=log)
+                self.assertEqual(len(log.load()), 4)
+                sweep('hamming:4', [0.01], 2_000, seed=6, shard=500, log=log)
+                self.assertEqual(len(log.load()), 4)
+
+    def test_partial_row(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = ResultLog(os.path.join(tmp, 'ber.csv'))
+            sweep('hamming:4', [0.01, 0.02], 2_000, seed=5, shard=500, log=log)
+            with open(log.path, 'rb+') as f:
+                data = f.read()
+                # cut the last row inside its final value
+                f.truncate(len(data)-3)
+            self.assertEqual(len(log.load()), 1)
+            self.assertIsNone(log.find('hamming:4', 0.02, 'bsc', {'seed': 5}))
+            # appending drops the cut row, as loading did
+            sweep('hamming:4', [0.02], 2_000, seed=5, shard=500, log=log)
+            self.assertEqual(len(log.load()), 2)
+            # a row with missing or unparsable values is skipped as well
+            with open(log.path, 'a') as f:
+                f.write('hamming:4,0.03,bsc,5,2000,500,,,x\n')
+            self.assertEqual(len(log.load()), 2)
@@ -0,0 +1,529 @@
+'''
+Stimulus generation for the testbench models.
+
+A `Lookahead` queue holds (stimulus, expected outputs) items that are
+produced ahead of time in batches through the vectorized codec and channel
+paths, so the per-cycle work left in the testbench coroutines is a queue pop.
+The driving coroutine takes the `next` item each cycle and the checking
+coroutine reads the `current` one (the item on the wires).
+
+A `CoverageScheduler` can order the queue so that items hitting the coverage
+bins still short of their goals are driven first, closing coverage in fewer
+cycles than uniform random stimulus.
+
+To execute unit tests for this module, run: `python -m unittest stimulus.py`.
+'''
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import unittest
+import numpy as np
+from collections import deque
+from channel import RandomWeightChannel
+from hamming import HammingCodec
+
+
+def to_ints(bits) -> list:
+    '''
+    Converts an (N, W) array of bits, where column _i_ holds bit _i_, into a
+    list of N Python integers of any width.
+    '''
+    packed = np.packbits(np.asarray(bits, dtype=np.uint8), axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+# file a test writes its result to for the regression runner
+RESULT_FILE = 'result.json'
+
+# slices of the coverage ranges over data words, passed to verb as
+# `max_steps` by the testbenches
+RANGE_STEPS = 64
+
+# slices of the coverage range over decoder input blocks
+CODE_STEPS = 16
+
+
+def range_bin(value: int, width: int, steps: int=RANGE_STEPS) -> int:
+    '''
+    Returns which of `steps` equal slices of the `width`-bit span holds `value`.
+    '''
+    steps = min(steps, 2**width)
+    return (value * steps) >> width
+
+
+class CoverageScheduler:
+    '''
+    Chooses stimulus items that hit the coverage bins furthest from their
+    goals, instead of waiting for uniform random stimulus to reach them.
+
+    The scheduler keeps its own mirror of the testbench coverage: `goals` maps
+    each bin name to its number of required hits and `classify(item)` returns
+    the bin names an item would hit. Candidate items are bucketed by bin as 
+    they are added; once every bin is closed (or has no candidates left),
+    items are taken in the order they were added.
+    '''
+
+    def __init__(self, goals: dict, classify, seed=None):
+        self.goals = dict(goals)
+        self.hits = dict((b, 0) for b in goals)
+        self.classify = classify
+        self.rng = random.Random(seed)
+        self._buckets = dict((b, deque()) for b in goals)
+        self._pool = deque()
+        # bins hit by each candidate not yet taken
+        self._bins = dict()
+        self._count = 0
+
+    def add(self, items: list):
+        '''
+        Adds `items` as candidates to be chosen from.
+        '''
+        for item in items:
+            bins = [b for b in self.classify(item) if b in self.goals]
+            self._bins[self._count] = bins
+            for b in bins:
+                if self.hits[b] < self.goals[b]:
+                    self._buckets[b].append((self._count, item))
+            self._pool.append((self._count, item))
+            self._count += 1
+        pass
+
+    def bias(self, options: dict):
+        '''
+        Weighs the choices a producer can make toward the open bins, where
+        `options` maps each choice to the bins an item made with it would hit.
+
+        Each choice is weighed by the hits its bins still need beyond the
+        candidates already waiting for them. Returns a list of probabilities
+        in the order of `options`, or `None` if no choice helps any open bin.
+        '''
+        need = dict()
+        for b in self.open_bins():
+            waiting = sum(1 for (i, _) in self._buckets[b] if i in self._bins)
+            need[b] = max(0, self.goals[b] - self.hits[b] - waiting)
+        scores = [sum(need.get(b, 0) for b in bins) for bins in options.values()]
+        total = sum(scores)
+        if total == 0:
+            return None
+        return [s/total for s in scores]
+
+    def open_bins(self) -> list:
+        '''
+        Returns the bins that have not met their goals.
+        '''
+        return [b for b in self.goals if self.hits[b] < self.goals[b]]
+
+    def done(self) -> bool:
+        return len(self.open_bins()) == 0
+
+    def next(self):
+        '''
+        Takes the candidate for the open bin with the least progress, or `None`
+        if there are no candidates left.
+        '''
+        needy = sorted(self.open_bins(), key=lambda b: (self.hits[b]/self.goals[b], self.rng.random()))
+        for b in needy:
+            bucket = self._buckets[b]
+            while len(bucket) > 0:
+                (i, item) = bucket.popleft()
+                if i in self._bins:
+                    return self._take(i, item)
+        # drop any buckets of closed bins
+        for b in self.goals:
+            if self.hits[b] >= self.goals[b]:
+                self._buckets[b].clear()
+        while len(self._pool) > 0:
+            (i, item) = self._pool.popleft()
+            if i in self._bins:
+                return self._take(i, item)
+        return None
+
+    def _take(self, i: int, item):
+        for b in self._bins.pop(i):
+            self.hits[b] += 1
+        return item
+
+    def __len__(self) -> int:
+        return len(self._bins)
+    pass
+
+
+def coverage(scheduler: CoverageScheduler) -> float:
+    '''
+    Returns the fraction of the scheduler's bins that met their goals.
+    '''
+    return 1.0 - len(scheduler.open_bins())/len(scheduler.goals)
+
+
+def write_result(scheduler: CoverageScheduler, directory: str=None, **extra) -> dict:
+    '''
+    Writes the stimulus coverage tracked by a test's `scheduler` to
+    `RESULT_FILE` in `directory` (default: `GLYPH_RESULT_DIR`, where the
+    regression runner looks for it), along with any `extra` fields.
+
+    The `stimulus_closed` and `stimulus_coverage` fields describe the bins of
+    the scheduler's own mirror of the coverage model that the driven stimulus
+    reached, not the simulator's coverage or the outcome of its checks.
+    Nothing is written when there is no directory to write to.
+    '''
+    result = {'stimulus_closed': scheduler.done(), 'stimulus_coverage': coverage(scheduler)}
+    result.update(extra)
+    directory = os.environ.get('GLYPH_RESULT_DIR') if directory is None else directory
+    if directory is not None:
+        with open(os.path.join(directory, RESULT_FILE), 'w') as f:
+            json.dump(result, f)
+    return result
+
+
+def parity_coverage(w: int) -> tuple:
+    '''
+    Mirrors the coverage of the parity testbench for `(data, check)` items.
+
+    Returns `(goals, classify)`.
+    '''
+    goals = dict(('data range '+str(i), 5) for i in range(0, min(2**w, RANGE_STEPS)))
+    goals.update({'check bit 0': 1, 'check bit 1': 1})
+    return (goals, lambda v: ['data range '+str(range_bin(v[0], w)), 'check bit '+str(v[1])])
+
+
+def hamming_enc_coverage(k: int) -> tuple:
+    '''
+    Mirrors the coverage of the Hamming encoder testbench for `(data, code)`
+    items.
+
+    Returns `(goals, classify)`.
+    '''
+    goals = dict(('message range '+str(i), 1) for i in range(0, min(2**k, RANGE_STEPS)))
+    return (goals, lambda v: ['message range '+str(range_bin(v[0], k))])
+
+
+# bins of the Hamming decoder coverage hit by each number of flipped bits
+ERROR_BINS = {0: ['no error'], 1: ['single-bit error'], 2: ['double-bit error']}
+
+
+def hamming_dec_coverage(n: int) -> tuple:
+    '''
+    Mirrors the coverage of the Hamming decoder testbench for `(packet, data,
+    sec, ded)` items with `n`-bit packets.
+
+    Returns `(goals, classify)`.
+    '''
+    goals = dict(('code '+str(i), 1) for i in range(0, min(2**n, CODE_STEPS)))
+    goals.update({'single-bit error': 20, 'double-bit error': 20, 'no error': 40})
+    def classify(v):
+        (packet, _, sec, ded) = v
+        bins = ['code '+str(range_bin(packet, n, CODE_STEPS))]
+        if sec == 1:
+            bins += ['single-bit error']
+        if ded == 1:
+            bins += ['double-bit error']
+        if sec == 0 and ded == 0:
+            bins += ['no error']
+        return bins
+    return (goals, classify)
+
+
+def declared_coverage(path: str) -> dict:
+    '''
+    Reads the coverage nets a testbench at `path` declares to verb through
+    `CoverPoint` and `CoverRange`, without importing it.
+
+    Returns a dict mapping each net name to its `kind`, `goal` and
+    `max_steps` (`None` where not given). Names of this module's constants
+    are resolved to their values.
+    '''
+    import ast
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read())
+    def value(node):
+        if isinstance(node, ast.Name):
+            return globals()[node.id]
+        return ast.literal_eval(node)
+    nets = dict()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ['CoverPoint', 'CoverRange']:
+            args = dict((kw.arg, kw.value) for kw in node.keywords)
+            nets[value(args['name'])] = {
+                'kind': node.func.id,
+                'goal': value(args['goal']) if 'goal' in args else None,
+                'max_steps': value(args['max_steps']) if 'max_steps' in args else None,
+            }
+    return nets
+
+
+def mirror_goals(nets: dict, widths: dict) -> dict:
+    '''
+    Expands the coverage `nets` of a testbench (see `declared_coverage`) into
+    the bins a scheduler mirror must hold, given the bit `widths` of the
+    ranges' spans.
+    '''
+    goals = dict()
+    for (name, net) in nets.items():
+        if net['kind'] == 'CoverPoint':
+            goals[name] = net['goal']
+        else:
+            for i in range(0, min(2**widths[name], net['max_steps'])):
+                goals[name+' '+str(i)] = net['goal']
+    return goals
+
+
+class Lookahead:
+    '''
+    Queue of stimulus items refilled `batch` at a time by a producer.
+
+    With a `scheduler`, produced items become its candidates and are taken in
+    the order it chooses. A producer with a `steer(scheduler)` method is
+    given the scheduler before each batch so it can bias what it produces.
+    '''
+
+    def __init__(self, produce, batch: int=1024, scheduler: CoverageScheduler=None):
+        '''
+        Construct a new queue whose items come from `produce(n)`, which returns
+        a list of `n` items.
+        '''
+        self._produce = produce
+        self._batch = batch
+        self._ready = deque()
+        self.scheduler = scheduler
+        self.current = None
+
+    def next(self):
+        '''
+        Takes the next item to drive, producing another batch if needed.
+        '''
+        if self.scheduler is not None:
+            item = self.scheduler.next()
+            if item is None:
+                if hasattr(self._produce, 'steer'):
+                    self._produce.steer(self.scheduler)
+                self.scheduler.add(self._produce(self._batch))
+                item = self.scheduler.next()
+            self.current = item
+            return self.current
+        if len(self._ready) == 0:
+            self._ready.extend(self._produce(self._batch))
+        self.current = self._ready.popleft()
+        return self.current
+
+    def __len__(self) -> int:
+        return len(self.scheduler) if self.scheduler is not None else len(self._ready)
+    pass
+
+
+class GoldenStimulus:
+    '''
+    Producer that cycles through the records of a set of golden vectors.
+    '''
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self._index = 0
+
+    def __call__(self, n: int) -> list:
+        items = []
+        for _ in range(0, n):
+            items += [self.vectors[self._index]]
+            self._index = (self._index + 1) % len(self.vectors)
+        return items
+    pass
+
+
+class HammingDecStimulus:
+    '''
+    Producer of `(packet, data, sec, ded)` items for the Hamming decoder, where
+    the `packet` is an encoded random message with some bits flipped.
+
+    When steered by a scheduler, the number of flipped bits is drawn toward
+    the error bins that are still open (see `ERROR_BINS`), falling back to
+    `probs` once they are closed.
+    '''
+
+    def __init__(self, code: HammingCodec, seed=None, weights: tuple=(0, 1, 2), probs: list=None):
+        self.code = code
+        self.rng = np.random.default_rng(seed)
+        self.channel = RandomWeightChannel(weights, probs, seed=self.rng)
+        self._probs = self.channel.probs
+
+    def steer(self, scheduler: CoverageScheduler):
+        '''
+        Sets the error weight probabilities for the next batch from the bins
+        `scheduler` still needs.
+        '''
+        probs = scheduler.bias(dict((int(w), ERROR_BINS.get(int(w), [])) for w in self.channel.weights))
+        self.channel.probs = self._probs if probs is None else np.asarray(probs)
+
+    def __call__(self, n: int) -> list:
+        k = self.code.get_data_bits_len()
+        data = self.rng.integers(0, 2, size=(n, k), dtype=np.uint8)
+        packets = self.channel.transmit(self.code.encode_batch(data))
+        (rx, sec, ded) = self.code.decode_batch(packets)
+        return list(zip(to_ints(packets), to_ints(rx), sec.tolist(), ded.tolist()))
+    pass
+
+
+def closure_cycles(k: int, seed=None, batch: int=64, probs: list=None, mode: str='steer', limit: int=100_000) -> int:
+    '''
+    Counts the cycles the Hamming decoder testbench needs to close coverage
+    for `k` data bits with stimulus from `HammingDecStimulus`, taken in
+    arrival order (`random`), through a `CoverageScheduler` (`schedule`), or
+    also steering the injected error weights (`steer`).
+    '''
+    code = HammingCodec(k)
+    (goals, classify) = hamming_dec_coverage(code.get_total_bits_len())
+    produce = HammingDecStimulus(code, seed, probs=probs)
+    if mode == 'steer':
+        scheduler = CoverageScheduler(goals, classify, seed)
+        queue = Lookahead(produce, batch, scheduler)
+    elif mode == 'schedule':
+        scheduler = CoverageScheduler(goals, classify, seed)
+        queue = Lookahead(lambda n: produce(n), batch, scheduler)
+    else:
+        # only used to track the hits
+        scheduler = CoverageScheduler(goals, classify, seed)
+        queue = Lookahead(produce, batch)
+    cycles = 0
+    while not scheduler.done() and cycles < limit:
+        item = queue.next()
+        if mode == 'random':
+            for b in classify(item):
+                scheduler.hits[b] += 1
+        cycles += 1
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the cycles to close the Hamming decoder coverage')
+    parser.add_argument('-k', type=int, nargs='+', default=[4, 32, 64], help='data bits of the codes to compare')
+    parser.add_argument('--probs', type=float, nargs=3, default=[0.9, 0.09, 0.01], help='probabilities of 0, 1 and 2 flipped bits')
+    parser.add_argument('--batch', type=int, default=64, help='items produced at once')
+    parser.add_argument('--seeds', type=int, default=10, help='seeds to average over')
+    args = parser.parse_args()
+
+    modes = ['random', 'schedule', 'steer']
+    print('{:>4}'.format('K') + ''.join(' {:>10}'.format(m) for m in modes))
+    for k in args.k:
+        cycles = [sum(closure_cycles(k, s, args.batch, args.probs, m) for s in range(0, args.seeds))/args.seeds for m in modes]
+        print('{:>4}'.format(k) + ''.join(' {:>10.1f}'.format(c) for c in cycles))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestStimulus(unittest.TestCase):
+    '''
+    Test cases for the stimulus generators.
+    '''
+
+    def test_to_ints(self):
+        bits = np.zeros((2, 72), dtype=np.uint8)
+        bits[0, 0] = 1
+        bits[1, 71] = 1
+        self.assertEqual(to_ints(bits), [1, 2**71])
+
+    def test_lookahead(self):
+        calls = []
+        def produce(n):
+            calls.append(n)
+            return list(range(0, n))
+        queue = Lookahead(produce, batch=4)
+        items = [queue.next() for _ in range(0, 6)]
+        self.assertEqual(items, [0, 1, 2, 3, 0, 1])
+        self.assertEqual(queue.current, 1)
+        self.assertEqual(calls, [4, 4])
+        self.assertEqual(len(queue), 2)
+
+    def test_hamming_dec(self):
+        for k in [4, 64]:
+            code = HammingCodec(k)
+            queue = Lookahead(HammingDecStimulus(code, seed=3), batch=100)
+            for _ in range(0, 250):
+                (packet, data, sec, ded) = queue.next()
+                self.assertEqual(code.decode_int(packet), (data, sec, ded))
+
+    def test_scheduler(self):
+        # 4 bins of a 6-bit range with rare values in the top bin
+        goals = dict(('r'+str(i), 5) for i in range(0, 4))
+        classify = lambda x: ['r'+str(range_bin(x, 6, 4))]
+        rng = random.Random(1)
+        items = [rng.choice([rng.randint(0, 47), rng.randint(0, 47), rng.randint(0, 47), rng.randint(48, 63)]) for _ in range(0, 400)]
+        directed = CoverageScheduler(goals, classify, seed=1)
+        queue = Lookahead(lambda n: [items.pop() for _ in range(0, n)], batch=100, scheduler=directed)
+        cycles = 0
+        while not directed.done():
+            queue.next()
+            cycles += 1
+        # every bin is hit exactly as often as needed
+        self.assertEqual(cycles, 20)
+        # closed bins fall back to arrival order
+        self.assertIsNotNone(queue.next())
+        self.assertEqual(range_bin(63, 6, 4), 3)
+        self.assertEqual(range_bin(1, 1, 16), 1)
+
+    def test_steer(self):
+        goals = {'a': 4, 'b': 2, 'c': 1}
+        scheduler = CoverageScheduler(goals, lambda v: [v])
+        self.assertEqual(scheduler.bias({0: ['a'], 1: ['b'], 2: []}), [4/6, 2/6, 0])
+        # waiting candidates count toward their bins
+        scheduler.add(['a', 'a', 'b', 'b'])
+        self.assertEqual(scheduler.bias({0: ['a'], 1: ['b']}), [1.0, 0.0])
+        scheduler.add(['a', 'a'])
+        self.assertIsNone(scheduler.bias({0: ['a'], 1: ['b']}))
+        # rare error weights are drawn more often while their bins are open
+        code = HammingCodec(11)
+        (goals, classify) = hamming_dec_coverage(code.get_total_bits_len())
+        produce = HammingDecStimulus(code, seed=1, probs=[0.9, 0.09, 0.01])
+        produce.steer(CoverageScheduler(goals, classify))
+        self.assertEqual(list(produce.channel.probs), [0.5, 0.25, 0.25])
+        items = produce(400)
+        self.assertGreater(sum(v[3] for v in items), 50)
+
+    def test_closure(self):
+        # skewed toward error-free blocks, coverage closes in far fewer
+        # cycles once the scheduler steers the error weights
+        cycles = dict()
+        for mode in ['random', 'schedule', 'steer']:
+            cycles[mode] = sum(closure_cycles(32, s, 64, [0.9, 0.09, 0.01], mode) for s in range(0, 5))
+        self.assertLess(cycles['schedule'], cycles['random'])
+        self.assertLess(cycles['steer'], cycles['schedule'] // 2)
+
+    def test_result(self):
+        (goals, classify) = parity_coverage(1)
+        scheduler = CoverageScheduler(goals, classify)
+        scheduler.add([(0, 0)]*5)
+        while scheduler.next() is not None:
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            result = write_result(scheduler, directory=tmp, cycles=5)
+            with open(os.path.join(tmp, RESULT_FILE)) as f:
+                self.assertEqual(json.load(f), result)
+        # the "data range 0" and "check bit 0" bins of 4 are closed
+        self.assertEqual(result['stimulus_coverage'], 0.5)
+        self.assertFalse(result['stimulus_closed'])
+
+    def test_mirror(self):
+        # the scheduler mirrors match the nets the testbenches give verb
+        here = os.path.dirname(os.path.abspath(__file__))
+        code = HammingCodec(11)
+        mirrors = [
+            ('parity_tb.py', parity_coverage(5)[0], {'data range': 5, 'check bit': 1}),
+            ('parity_tb.py', parity_coverage(8)[0], {'data range': 8, 'check bit': 1}),
+            ('hamming_enc_tb.py', hamming_enc_coverage(64)[0], {'message range': 64}),
+            ('hamming_dec_tb.py', hamming_dec_coverage(code.get_total_bits_len())[0], {'code': code.get_total_bits_len()}),
+        ]
+        for (tb, goals, widths) in mirrors:
+            nets = declared_coverage(os.path.join(here, tb))
+            # every range states its slices rather than relying on a default
+            self.assertTrue(all(n['max_steps'] is not None for n in nets.values() if n['kind'] == 'CoverRange'))
+            self.assertEqual(goals, mirror_goals(nets, widths))
+        # every error weight steers toward a bin the decoder testbench declares
+        nets = declared_coverage(os.path.join(here, 'hamming_dec_tb.py'))
+        self.assertTrue(all(b in nets for bins in ERROR_BINS.values() for b in bins))
+
+    def test_golden(self):
+        produce = GoldenStimulus([(0,), (1,), (2,)])
+        self.assertEqual(produce(4), [(0,), (1,), (2,), (0,)])
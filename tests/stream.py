@@ -0,0 +1,385 @@
+'''
+Streaming encoder and decoder for arbitrary binary data.
+
+Input is read in chunks and framed into Hamming or Golay blocks through the
+batch codec paths, so files of any size are processed in constant memory.
+Every 8 blocks form a group that turns K bytes of input into N_b bytes of
+output (12 into 24 for Golay), with block bits stored LSB first.
+
+Stream layout: the magic `GLYS`, a codec id byte (0 for Hamming, 1 for
+Golay), K as 2 little-endian bytes and a reserved byte; then the groups of
+the payload with the last one zero-padded; and finally the payload length as
+8 little-endian bytes, padded and encoded into groups like the payload so it
+is protected by the code as well.
+
+Usage: `python stream.py encode hamming:57 notes.txt notes.glys` and
+`python stream.py decode notes.glys notes.txt` (`-` for stdin/stdout). With
+`--mmap`, files are instead memory-mapped and coded in place through the
+codecs' `encode_into`/`decode_into`.
+
+To execute unit tests for this module, run: `python -m unittest stream.py`.
+'''
+
+import argparse
+import io
+import mmap
+import os
+import random
+import tempfile
+import sys
+import unittest
+import numpy as np
+from codes import make_frames, codec_id, to_spec
+
+MAGIC = b'GLYS'
+
+HEADER_LEN = 8
+
+# bytes used to store the payload length at the end of the stream
+LENGTH_LEN = 8
+
+# groups encoded or decoded at once
+GROUPS_PER_BATCH = 4096
+
+
+def make_header(spec: str) -> bytes:
+    '''
+    Creates the stream header for the code named by `spec`.
+    '''
+    frames = make_frames(spec)
+    return MAGIC + bytes([codec_id(spec)]) + frames.k.to_bytes(2, 'little') + b'\x00'
+
+
+def read_header(header: bytes) -> str:
+    '''
+    Returns the spec of the code named by a stream `header`.
+    '''
+    if len(header) < HEADER_LEN or header[0:4] != MAGIC:
+        raise ValueError('input is not an encoded stream')
+    return to_spec(header[4], int.from_bytes(header[5:7], 'little'))
+
+
+def _encode_groups(frames, data) -> bytearray:
+    '''
+    Encodes whole groups of `data` bytes.
+    '''
+    out = bytearray(len(data)//frames.k*frames.n)
+    frames.codec.encode_into(data, out)
+    return out
+
+
+def _decode_groups(frames, data) -> tuple:
+    '''
+    Decodes whole groups of encoded `data` bytes.
+
+    Returns `(payload, blocks, corrected, detected)`.
+    '''
+    out = bytearray(len(data)//frames.n*frames.k)
+    return (out,) + frames.codec.decode_into(data, out)
+
+
+def _trailer_groups(frames) -> int:
+    '''
+    Returns the number of groups holding the payload length.
+    '''
+    return -(-LENGTH_LEN // frames.k)
+
+
+def encode_stream(chunks, spec: str):
+    '''
+    Lazily encodes an iterable of byte `chunks` with the code named by `spec`,
+    yielding the encoded stream in pieces.
+    '''
+    frames = make_frames(spec)
+    # bytes per group in and out
+    k = frames.k
+    batch = k*GROUPS_PER_BATCH
+    yield make_header(spec)
+    pending = bytearray()
+    length = 0
+    for chunk in chunks:
+        pending += chunk
+        length += len(chunk)
+        while len(pending) >= batch:
+            yield _encode_groups(frames, pending[:batch])
+            del pending[:batch]
+    # zero-pad the final group
+    if len(pending) > 0:
+        pending += bytes(-len(pending) % k)
+        yield _encode_groups(frames, pending)
+    trailer = length.to_bytes(LENGTH_LEN, 'little')
+    yield _encode_groups(frames, trailer + bytes(_trailer_groups(frames)*k - LENGTH_LEN))
+
+
+def decode_stream(chunks, counts: dict=None):
+    '''
+    Lazily decodes an iterable of encoded byte `chunks`, yielding the payload
+    in pieces.
+
+    Decoding statistics are accumulated into `counts` as they are found:
+    `blocks`, `corrected` and `detected`.
+    '''
+    counts = {} if counts is None else counts
+    for c in ['blocks', 'corrected', 'detected']:
+        counts.setdefault(c, 0)
+    raw = bytearray()
+    chunks = iter(chunks)
+    # gather the header
+    for chunk in chunks:
+        raw += chunk
+        if len(raw) >= HEADER_LEN:
+            break
+    frames = make_frames(read_header(raw[:HEADER_LEN]))
+    del raw[:HEADER_LEN]
+    (k, n) = (frames.k, frames.n)
+    tail = _trailer_groups(frames)*n
+    batch = n*GROUPS_PER_BATCH
+
+    def decode(data):
+        (payload, blocks, corrected, detected) = _decode_groups(frames, data)
+        counts['blocks'] += blocks
+        counts['corrected'] += corrected
+        counts['detected'] += detected
+        return payload
+
+    # the last decoded group may hold padding, so it is held back until the
+    # length is known
+    held = b''
+    emitted = 0
+    for chunk in chunks:
+        raw += chunk
+        while len(raw) >= batch + tail:
+            payload = held + decode(raw[:batch])
+            del raw[:batch]
+            yield payload[:-k]
+            emitted += len(payload) - k
+            held = payload[-k:]
+    if len(raw) < tail or len(raw) % n != 0:
+        raise ValueError('encoded stream is truncated')
+    payload = held + decode(raw[:len(raw)-tail])
+    length = int.from_bytes(decode(raw[len(raw)-tail:])[:LENGTH_LEN], 'little')
+    if length < emitted or length > emitted + len(payload):
+        raise ValueError('encoded stream has a corrupt length')
+    yield payload[:length-emitted]
+
+
+def read_chunks(f, size: int=2**20):
+    '''
+    Lazily reads the file object `f` in chunks of `size` bytes.
+    '''
+    while True:
+        chunk = f.read(size)
+        if len(chunk) == 0:
+            break
+        yield chunk
+
+
+def encode_file(src, dst, spec: str, size: int=2**20):
+    '''
+    Encodes the binary file object `src` into `dst`.
+    '''
+    for piece in encode_stream(read_chunks(src, size), spec):
+        dst.write(piece)
+    pass
+
+
+def decode_file(src, dst, size: int=2**20) -> dict:
+    '''
+    Decodes the binary file object `src` into `dst`.
+
+    Returns the decoding statistics.
+    '''
+    counts = {}
+    for piece in decode_stream(read_chunks(src, size), counts):
+        dst.write(piece)
+    return counts
+
+
+def encode_mapped(src: str, dst: str, spec: str):
+    '''
+    Encodes the file at `src` into a new file at `dst` by memory-mapping both,
+    so the payload is encoded in place without being read into memory.
+    '''
+    frames = make_frames(spec)
+    (k, n) = (frames.k, frames.n)
+    size = os.path.getsize(src)
+    whole = size - size % k
+    body = -(-size // k)*n
+    tail = _trailer_groups(frames)*n
+    with open(src, 'rb') as f, open(dst, 'w+b') as g:
+        g.truncate(HEADER_LEN + body + tail)
+        with mmap.mmap(g.fileno(), 0) as out:
+            out[0:HEADER_LEN] = make_header(spec)
+            if whole > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as inp:
+                    with memoryview(inp) as i, memoryview(out) as o:
+                        frames.codec.encode_into(i[0:whole], o[HEADER_LEN:HEADER_LEN+whole//k*n])
+            # zero-pad the final group
+            f.seek(whole)
+            last = f.read()
+            if len(last) > 0:
+                out[HEADER_LEN+whole//k*n:HEADER_LEN+body] = _encode_groups(frames, last + bytes(k-len(last)))
+            trailer = size.to_bytes(LENGTH_LEN, 'little')
+            out[HEADER_LEN+body:] = _encode_groups(frames, trailer + bytes(tail//n*k - LENGTH_LEN))
+    pass
+
+
+def decode_mapped(src: str, dst: str) -> dict:
+    '''
+    Decodes the file at `src` into a new file at `dst` by memory-mapping both,
+    so the blocks are decoded in place without being read into memory.
+
+    Returns the decoding statistics.
+    '''
+    counts = {'blocks': 0, 'corrected': 0, 'detected': 0}
+    def tally(stats):
+        for (c, v) in zip(['blocks', 'corrected', 'detected'], stats):
+            counts[c] += v
+    with open(src, 'rb') as f, open(dst, 'w+b') as g:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as inp:
+            frames = make_frames(read_header(inp[0:HEADER_LEN]))
+            (k, n) = (frames.k, frames.n)
+            tail = _trailer_groups(frames)*n
+            body = len(inp) - HEADER_LEN - tail
+            if body < 0 or body % n != 0:
+                raise ValueError('encoded stream is truncated')
+            (trailer, *stats) = _decode_groups(frames, inp[HEADER_LEN+body:])
+            tally(stats)
+            length = int.from_bytes(trailer[0:LENGTH_LEN], 'little')
+            if -(-length // k) != body // n:
+                raise ValueError('encoded stream has a corrupt length')
+            whole = length - length % k
+            g.truncate(length)
+            if length == 0:
+                return counts
+            with mmap.mmap(g.fileno(), 0) as out:
+                with memoryview(inp) as i, memoryview(out) as o:
+                    tally(frames.codec.decode_into(i[HEADER_LEN:HEADER_LEN+whole//k*n], o[0:whole]))
+                # the final group holds padding
+                if length > whole:
+                    (last, *stats) = _decode_groups(frames, inp[HEADER_LEN+whole//k*n:HEADER_LEN+body])
+                    tally(stats)
+                    out[whole:length] = last[0:length-whole]
+    return counts
+
+
+def report(counts: dict):
+    '''
+    Prints the decoding statistics, exiting with an error if any block was
+    uncorrectable.
+    '''
+    print('info: blocks: '+str(counts['blocks'])+', corrected: '+str(counts['corrected'])+', detected: '+str(counts['detected']), file=sys.stderr)
+    if counts['detected'] > 0:
+        exit(1)
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Protect files with the ECC models')
+    sub = parser.add_subparsers(dest='command', required=True)
+    enc = sub.add_parser('encode', help='encode a file')
+    enc.add_argument('code', help="code to use ('hamming:K' or 'golay')")
+    enc.add_argument('input', help="file to encode ('-' for stdin)")
+    enc.add_argument('output', help="encoded file ('-' for stdout)")
+    dec = sub.add_parser('decode', help='decode a file')
+    dec.add_argument('input', help="file to decode ('-' for stdin)")
+    dec.add_argument('output', help="decoded file ('-' for stdout)")
+    parser.add_argument('--mmap', action='store_true', help='memory-map the input and output files instead of streaming')
+    args = parser.parse_args()
+
+    if args.mmap:
+        if args.command == 'encode':
+            encode_mapped(args.input, args.output, args.code)
+        else:
+            report(decode_mapped(args.input, args.output))
+        return
+
+    src = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    dst = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        if args.command == 'encode':
+            encode_file(src, dst, args.code)
+        else:
+            report(decode_file(src, dst))
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout.buffer:
+            dst.close()
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestStream(unittest.TestCase):
+    '''
+    Test cases for the streaming codec.
+    '''
+
+    def test_roundtrip(self):
+        rng = random.Random(4)
+        for spec in ['hamming:4', 'hamming:57', 'hamming:120', 'golay']:
+            for length in [0, 1, 11, 12, 57, 1000]:
+                data = bytes(rng.randrange(0, 256) for _ in range(0, length))
+                enc = b''.join(encode_stream([data], spec))
+                self.assertEqual(read_header(enc), spec)
+                counts = {}
+                self.assertEqual(b''.join(decode_stream([enc], counts)), data)
+                self.assertEqual((counts['corrected'], counts['detected']), (0, 0))
+
+    def test_chunks(self):
+        rng = random.Random(5)
+        data = bytes(rng.randrange(0, 256) for _ in range(0, 5000))
+        # batches much smaller than the input exercise the streaming paths
+        global GROUPS_PER_BATCH
+        (saved, GROUPS_PER_BATCH) = (GROUPS_PER_BATCH, 3)
+        try:
+            for spec in ['hamming:11', 'golay']:
+                src = io.BytesIO(data)
+                enc = io.BytesIO()
+                encode_file(src, enc, spec, size=7)
+                dec = io.BytesIO()
+                counts = decode_file(io.BytesIO(enc.getvalue()), dec, size=13)
+                self.assertEqual(dec.getvalue(), data)
+                self.assertGreater(counts['blocks'], 8*5000//12)
+        finally:
+            GROUPS_PER_BATCH = saved
+
+    def test_errors(self):
+        rng = random.Random(6)
+        data = bytes(rng.randrange(0, 256) for _ in range(0, 300))
+        for spec in ['hamming:26', 'golay']:
+            enc = bytearray(b''.join(encode_stream([data], spec)))
+            n = make_frames(spec).n
+            # flip one bit in every block, including the length
+            for b in range(0, 8*(len(enc)-HEADER_LEN)//n):
+                i = HEADER_LEN*8 + b*n + rng.randrange(0, n)
+                enc[i//8] ^= 1 << (i % 8)
+            counts = {}
+            self.assertEqual(b''.join(decode_stream([bytes(enc)], counts)), data)
+            self.assertEqual(counts['corrected'], counts['blocks'])
+            self.assertEqual(counts['detected'], 0)
+        with self.assertRaises(ValueError):
+            list(decode_stream([b'nope' + bytes(100)]))
+        with self.assertRaises(ValueError):
+            list(decode_stream([bytes(enc[:-1])]))
+
+    def test_mapped(self):
+        rng = random.Random(7)
+        with tempfile.TemporaryDirectory() as tmp:
+            (src, enc, dec) = [os.path.join(tmp, f) for f in ['src', 'enc', 'dec']]
+            for spec in ['hamming:57', 'golay']:
+                for length in [0, 5, 12*57, 12*57+1, 10000]:
+                    data = bytes(rng.randrange(0, 256) for _ in range(0, length))
+                    with open(src, 'wb') as f:
+                        f.write(data)
+                    encode_mapped(src, enc, spec)
+                    # same format as the streaming encoder
+                    with open(enc, 'rb') as f:
+                        self.assertEqual(f.read(), b''.join(encode_stream([data], spec)))
+                    counts = decode_mapped(enc, dec)
+                    with open(dec, 'rb') as f:
+                        self.assertEqual(f.read(), data)
+                    self.assertEqual((counts['corrected'], counts['detected']), (0, 0))
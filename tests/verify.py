@@ -0,0 +1,291 @@
+'''
+Exhaustive verification of the correction and detection guarantees of the
+Hamming and Golay codecs.
+
+Every message is combined with every error pattern up to the weight the code
+guarantees to handle, and each received block is decoded through the batch
+paths:
+
+- `HammingCodec(K)`: 0 errors are clean, 1 error is corrected (`sec`) and
+2 errors are detected (`ded`).
+- `GolayCodec`: 0 errors are clean, 1 to 3 errors are corrected (`tec`) and
+4 errors are detected (`qed`).
+
+With `--reference`, every received block is also decoded one at a time
+through the reference path (`decode_int` for Hamming, the systematic search
+of `decode` for Golay), which must meet the same guarantees and agree with
+the batch path on the data and both flags.
+
+Error patterns are generated lazily and the work is split into shards of
+(message range, error weight, lowest flipped bit) that run across a process
+pool. Codes are named by `hamming:K` (with a block size <= 64) or `golay`.
+
+Usage: `python verify.py hamming:26 --workers 8` or
+`python verify.py hamming:11 --reference`
+
+To execute unit tests for this module, run: `python -m unittest verify.py`.
+'''
+
+import argparse
+import itertools
+import time
+import unittest
+import unittest.mock
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from hamming import HammingCodec
+from golay import GolayCodec
+from codes import parse_spec
+
+# maximum number of error patterns combined with a message range per decode
+PATTERNS_PER_BATCH = 256
+
+
+class HammingTarget:
+    '''
+    Packed-word view of the extended Hamming code under verification.
+    '''
+
+    def __init__(self, k: int):
+        self.codec = HammingCodec(k)
+        self.k = k
+        self.n = self.codec.get_total_bits_len()
+        if self.n > 64:
+            raise ValueError('exhaustive verification requires a block size <= 64')
+        # error weight -> (data must be intact, sec, ded)
+        self.expect = {0: (True, 0, 0), 1: (True, 1, 0), 2: (False, 0, 1)}
+
+    def encode(self, data):
+        return self.codec.encode_batch(data)
+
+    def decode(self, words) -> tuple:
+        return self.codec.decode_batch(words)
+
+    def decode_reference(self, word: int) -> tuple:
+        return self.codec.decode_int(word)
+    pass
+
+
+class GolayTarget:
+    '''
+    Packed-word view of the extended Golay code under verification, laid out as
+    `parity << 23 | check << 12 | data`.
+    '''
+
+    def __init__(self):
+        self.codec = GolayCodec(table=True)
+        self.search = GolayCodec()
+        self.k = 12
+        self.n = 24
+        # error weight -> (data must be intact, tec, qed)
+        self.expect = {0: (True, 0, 0), 1: (True, 1, 0), 2: (True, 1, 0), 3: (True, 1, 0), 4: (False, 1, 1)}
+
+    def encode(self, data):
+        (check, parity) = self.codec.encode_batch(data)
+        return parity.astype(np.uint64) << np.uint64(23) | check.astype(np.uint64) << np.uint64(12) | data
+
+    def decode(self, words) -> tuple:
+        return self.codec.decode_batch(words & 0xfff, (words >> 12) & 0x7ff, (words >> 23) & 0b1)
+
+    def decode_reference(self, word: int) -> tuple:
+        return self.search.decode(word & 0xfff, (word >> 12) & 0x7ff, (word >> 23) & 0b1)
+    pass
+
+
+def make_target(spec: str):
+    '''
+    Creates the verification target for the code named by `spec`.
+    '''
+    (name, k) = parse_spec(spec)
+    if name == 'hamming':
+        return HammingTarget(k)
+    elif name == 'golay':
+        return GolayTarget()
+    raise ValueError("cannot verify '"+spec+"' (expected 'hamming:K' or 'golay')")
+
+
+def error_patterns(n: int, weight: int, first: int=None):
+    '''
+    Lazily generates every `n`-bit error pattern of `weight` flipped bits as an
+    integer, optionally only those whose lowest flipped bit is `first`.
+    '''
+    if weight == 0:
+        yield 0
+        return
+    firsts = range(0, n) if first is None else [first]
+    for a in firsts:
+        for rest in itertools.combinations(range(a+1, n), weight-1):
+            e = 1 << a
+            for b in rest:
+                e |= 1 << b
+            yield e
+
+
+def check_shard(spec: str, lo: int, hi: int, weight: int, first: int, limit: int=10, reference: bool=False) -> tuple:
+    '''
+    Verifies messages `lo` to `hi` (exclusive) against every error pattern of
+    `weight` whose lowest flipped bit is `first`, also through the reference
+    decoder with `reference`.
+
+    Returns `(decodes, counterexamples)` where each counterexample is
+    `(message, error, data, flag_1, flag_2)`, keeping at most `limit`. The
+    `decodes` count both decoders.
+    '''
+    target = make_target(spec)
+    (intact, flag_1, flag_2) = target.expect[weight]
+    data = np.arange(lo, hi, dtype=np.uint64)
+    codes = target.encode(data)
+    decodes = 0
+    bad = []
+    patterns = error_patterns(target.n, weight, first)
+    while True:
+        errs = np.fromiter(itertools.islice(patterns, PATTERNS_PER_BATCH), dtype=np.uint64)
+        if len(errs) == 0:
+            break
+        # every message against every pattern in one decode
+        rx = np.bitwise_xor.outer(errs, codes).ravel()
+        (rx_data, rx_1, rx_2) = target.decode(rx)
+        fail = (rx_1 != flag_1) | (rx_2 != flag_2)
+        if intact:
+            fail |= rx_data != np.tile(data, len(errs))
+        for i in np.nonzero(fail)[0][:max(limit-len(bad), 0)]:
+            bad += [(int(data[i % len(data)]), int(errs[i // len(data)]), int(rx_data[i]), int(rx_1[i]), int(rx_2[i]))]
+        decodes += len(rx)
+        if reference:
+            for i in range(0, len(rx)):
+                out = tuple(int(v) for v in target.decode_reference(int(rx[i])))
+                msg = int(data[i % len(data)])
+                # the same guarantees, and the same result as the batch path
+                ok = (out[1], out[2]) == (flag_1, flag_2) and (not intact or out[0] == msg)
+                ok = ok and out == (int(rx_data[i]), int(rx_1[i]), int(rx_2[i]))
+                if not ok and len(bad) < limit:
+                    bad += [(msg, int(errs[i // len(data)])) + out]
+            decodes += len(rx)
+    return (decodes, bad)
+
+
+def _check_shard(args: tuple) -> tuple:
+    '''
+    Runs a single shard in a worker process.
+    '''
+    return check_shard(*args)
+
+
+def shards(spec: str, chunk: int=2**14) -> list:
+    '''
+    Splits the verification of `spec` into independent shards of at most
+    `chunk` messages.
+    '''
+    target = make_target(spec)
+    jobs = []
+    for lo in range(0, 2**target.k, chunk):
+        hi = min(lo+chunk, 2**target.k)
+        for w in target.expect.keys():
+            for first in ([None] if w == 0 else range(0, target.n)):
+                jobs += [(spec, lo, hi, w, first)]
+    return jobs
+
+
+def verify(spec: str, workers: int=1, chunk: int=2**14, limit: int=10, reference: bool=False) -> dict:
+    '''
+    Exhaustively verifies the code `spec` using a pool of `workers` processes,
+    also through the reference decoder with `reference`.
+
+    Returns a report with the number of `decodes`, the `elapsed` seconds, the
+    `throughput` in decodes per second and up to `limit` `counterexamples`.
+    '''
+    jobs = [job + (limit, reference) for job in shards(spec, chunk)]
+    start = time.perf_counter()
+    decodes = 0
+    bad = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_check_shard, jobs, chunksize=max(1, len(jobs)//(workers*8))))
+    else:
+        results = map(_check_shard, jobs)
+    for (count, found) in results:
+        decodes += count
+        bad += found[:max(limit-len(bad), 0)]
+    elapsed = time.perf_counter() - start
+    return {
+        'code': spec,
+        'decodes': decodes,
+        'elapsed': elapsed,
+        'throughput': decodes/elapsed if elapsed > 0 else 0.0,
+        'counterexamples': bad,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exhaustively verify the ECC models')
+    parser.add_argument('code', help="code to verify ('hamming:K' or 'golay')")
+    parser.add_argument('--workers', type=int, default=1, help='number of processes')
+    parser.add_argument('--chunk', type=int, default=2**14, help='messages per shard')
+    parser.add_argument('--limit', type=int, default=10, help='maximum counterexamples to report')
+    parser.add_argument('--reference', action='store_true', help='also decode every block through the (slow) reference decoder')
+    args = parser.parse_args()
+
+    report = verify(args.code, args.workers, args.chunk, args.limit, args.reference)
+    print('code:', report['code'])
+    print('decodes:', report['decodes'])
+    print('elapsed: {:.3f} s'.format(report['elapsed']))
+    print('throughput: {:.3e} decodes/s'.format(report['throughput']))
+    for (msg, err, data, f1, f2) in report['counterexamples']:
+        print('counterexample: message={:#x} error={:#x} -> data={:#x} flags=({}, {})'.format(msg, err, data, f1, f2))
+    if len(report['counterexamples']) > 0:
+        exit(1)
+    print('info: all guarantees hold')
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestVerify(unittest.TestCase):
+    '''
+    Test cases for the exhaustive verifier.
+    '''
+
+    def test_error_patterns(self):
+        pats = list(error_patterns(6, 2))
+        self.assertEqual(len(pats), 15)
+        self.assertEqual(len(set(pats)), 15)
+        self.assertTrue(all(bin(p).count('1') == 2 for p in pats))
+        self.assertEqual(sum(len(list(error_patterns(6, 2, a))) for a in range(0, 6)), 15)
+        self.assertEqual(list(error_patterns(6, 0)), [0])
+
+    def test_hamming(self):
+        for k in [1, 4, 11]:
+            report = verify('hamming:'+str(k), chunk=2**8)
+            n = HammingCodec(k).get_total_bits_len()
+            self.assertEqual(report['decodes'], 2**k * (1 + n + n*(n-1)//2))
+            self.assertEqual(report['counterexamples'], [])
+
+    def test_golay(self):
+        # the weight-4 patterns with the lowest bit set cover each message
+        (decodes, bad) = check_shard('golay', 0, 2**12, 4, 0)
+        self.assertEqual(decodes, 2**12 * 1771)
+        self.assertEqual(bad, [])
+        for w in range(0, 4):
+            self.assertEqual(check_shard('golay', 0, 2**12, w, None)[1], [])
+        # the systematic search on a slice of the messages
+        for w in range(0, 5):
+            (decodes, bad) = check_shard('golay', 0, 8, w, 0 if w > 0 else None, reference=True)
+            self.assertEqual(bad, [])
+
+    def test_reference(self):
+        for k in [1, 4, 11]:
+            report = verify('hamming:'+str(k), chunk=2**8, reference=True)
+            n = HammingCodec(k).get_total_bits_len()
+            self.assertEqual(report['decodes'], 2 * 2**k * (1 + n + n*(n-1)//2))
+            self.assertEqual(report['counterexamples'], [])
+        # a reference decoder that disagrees with the batch path is reported
+        target = HammingTarget(4)
+        with unittest.mock.patch.object(HammingTarget, 'decode_reference', lambda self, w: (0, 0, 0)):
+            (_, bad) = check_shard('hamming:4', 1, 2, 1, 0, reference=True)
+        self.assertGreater(len(bad), 0)
+        self.assertEqual(bad[0][2:], (0, 0, 0))
+        self.assertEqual(target.decode_reference(int(target.encode(np.array([5], dtype=np.uint64))[0])), (5, 0, 0))
+        with self.assertRaises(ValueError):
+            make_target('hsiao:8')
@@ -0,0 +1,350 @@
+'''
+Analytic error probabilities of the codes from their weight distributions.
+
+The weight distribution _A_ of a linear [N, K] code counts its codewords of
+each weight. Any code spanned by the rows of an R x N matrix has at most 2^R
+codewords, and the weight of the codeword _u_ x M is the number of columns _c_
+of M with an odd inner product <_u_, _c_>. So a fast Walsh-Hadamard transform
+of the histogram of the columns gives every weight at once in R x 2^R steps.
+
+The smaller of the code and its dual is enumerated this way. When the dual is
+smaller (Hamming K = 247 has a dual of only 2^9 codewords), the MacWilliams
+identity turns the dual distribution _B_ into the distribution of the code
+with exact integers:
+
+    A_i = 1 / 2^(N-K) x sum_j B_j x P_i(j)
+
+where P_i is the Krawtchouk polynomial of degree _i_.
+
+On a binary symmetric channel with bit error rate _p_, the error pattern is
+a non-zero codeword (and goes undetected) with probability
+
+    P_ud = sum_w A_w x p^w x (1-p)^(N-w)
+
+and a decoder correcting up to _t_ = (d-1)/2 errors miscorrects whenever the
+error pattern lands within distance _t_ of a non-zero codeword.
+
+`HammingCodec` is instead modeled as its decoder behaves: every odd-weight
+error pattern is treated as a single error, and in a shortened code (K + P +
+1 < 2^P) a syndrome pointing past the end of the block flips nothing while
+still raising `sec`. Such a block delivers wrong data unless the errors only
+hit parity bits.
+
+Usage: `python weights.py hamming:247 golay --p 1e-2 1e-3 1e-4`
+
+To execute unit tests for this module, run: `python -m unittest weights.py`.
+'''
+
+import argparse
+import math
+import time
+import unittest
+from fractions import Fraction
+import numpy as np
+from hamming import HammingCodec
+from codes import make_codec
+
+
+def fwht(f):
+    '''
+    Computes the (unnormalized) Walsh-Hadamard transform of the 1-D array `f`
+    whose length is a power of 2.
+
+    Returns a new `int64` array.
+    '''
+    a = np.array(f, dtype=np.int64)
+    size = len(a)
+    h = 1
+    while h < size:
+        b = a.reshape(-1, 2, h)
+        a = np.concatenate([b[:, 0, :] + b[:, 1, :], b[:, 0, :] - b[:, 1, :]], axis=1).ravel()
+        h *= 2
+    return a
+
+
+def span_weights(matrix) -> list:
+    '''
+    Computes the weight distribution of the code spanned by the rows of the
+    bit `matrix`, with entry _w_ counting the codewords of weight _w_.
+
+    Dependent rows are allowed; each codeword is counted once.
+    '''
+    matrix = np.asarray(matrix, dtype=np.int64)
+    (r, n) = matrix.shape
+    if r > 24:
+        raise ValueError('refusing to enumerate 2^'+str(r)+' codewords')
+    # column j as an integer with row i at bit i
+    cols = (matrix << np.arange(r, dtype=np.int64)[:, None]).sum(axis=0)
+    weights = (n - fwht(np.bincount(cols, minlength=2**r))) // 2
+    dist = [int(c) for c in np.bincount(weights, minlength=n+1)]
+    # every codeword is reached 2^(R - rank) times
+    return [c // dist[0] for c in dist]
+
+
+def krawtchouk(n: int, j: int) -> list:
+    '''
+    Returns the values P_i(j) of the binary Krawtchouk polynomials of length
+    `n` for _i_ = 0 to `n`.
+    '''
+    p = [1, n - 2*j]
+    for i in range(1, n):
+        # (i+1) P_(i+1) = (n-2j) P_i - (n-i+1) P_(i-1)
+        p += [((n - 2*j)*p[i] - (n - i + 1)*p[i-1]) // (i + 1)]
+    return p[:n+1]
+
+
+def macwilliams(dual: list) -> list:
+    '''
+    Transforms the weight distribution of the dual code into the distribution
+    of the code using exact integer arithmetic.
+    '''
+    n = len(dual) - 1
+    size = sum(dual)
+    total = [0] * (n+1)
+    for (j, b) in enumerate(dual):
+        if b == 0:
+            continue
+        for (i, k) in enumerate(krawtchouk(n, j)):
+            total[i] += b*k
+    if any(t % size != 0 for t in total):
+        raise ValueError('dual distribution does not belong to a linear code')
+    return [t // size for t in total]
+
+
+def weight_distribution(codec) -> list:
+    '''
+    Computes the weight distribution of the code of `codec` from whichever of
+    its generator or parity-check matrix spans fewer codewords.
+    '''
+    chk = codec.get_parity_check_matrix()
+    (r, n) = chk.shape
+    if n - r <= r:
+        return span_weights(codec.get_generator_matrix())
+    return macwilliams(span_weights(chk))
+
+
+def min_distance(dist: list) -> int:
+    '''
+    Returns the smallest non-zero weight of the distribution `dist`.
+    '''
+    return next(w for w in range(1, len(dist)) if dist[w] > 0)
+
+
+def miscorrections(dist: list, t: int) -> list:
+    '''
+    Counts the error patterns of each weight that lie within distance `t` of
+    a non-zero codeword, which a bounded-distance decoder miscorrects.
+
+    The spheres of radius `t` around the codewords are disjoint when `t` is
+    at most (d-1)/2, so the counts of each codeword add up.
+    '''
+    n = len(dist) - 1
+    counts = [0] * (n+1)
+    for (w, a) in enumerate(dist):
+        if w == 0 or a == 0:
+            continue
+        # keep `j` of the codeword's ones and add `m` ones outside of it
+        for j in range(max(0, w-t), w+1):
+            for m in range(0, min(n-w, t-(w-j)) + 1):
+                counts[j+m] += a*math.comb(w, j)*math.comb(n-w, m)
+    return counts
+
+
+def hamming_outcomes(codec: HammingCodec, dist: list) -> tuple:
+    '''
+    Counts the error patterns of each weight that the decoder of the extended
+    Hamming `codec`, with weight distribution `dist`, delivers correctly,
+    miscorrects (wrong data without `ded`) and detects (`ded`).
+
+    Returns `(correct, miscorrected, detected)`.
+    '''
+    n = codec.get_total_bits_len()
+    # parity-only patterns whose syndrome points past the block keep the data
+    parities = [0] + [2**i for i in range(0, codec.get_parity_bits_len())]
+    intact = [0] * (n+1)
+    for mask in range(0, 2**len(parities)):
+        bits = [b for (i, b) in enumerate(parities) if (mask >> i) & 1]
+        syn = 0
+        for b in bits:
+            syn ^= b
+        if len(bits) % 2 == 1 and syn >= n:
+            intact[len(bits)] += 1
+    correct = [0] * (n+1)
+    miscorrected = [0] * (n+1)
+    detected = [0] * (n+1)
+    for w in range(0, n+1):
+        total = math.comb(n, w)
+        if w % 2 == 1:
+            # one flip toward the syndrome, which is right only for a single
+            # error or when it lands past the block and the data is untouched
+            fixed = total if w == 1 else intact[w]
+            correct[w] = fixed
+            miscorrected[w] = total - fixed
+        elif w == 0:
+            correct[w] = 1
+        else:
+            miscorrected[w] = dist[w]
+            detected[w] = total - dist[w]
+    return (correct, miscorrected, detected)
+
+
+def _on_bsc(counts: list, p):
+    # probability that the error pattern is one of `counts` on a BSC
+    n = len(counts) - 1
+    return sum(c * p**i * (1-p)**(n-i) for (i, c) in enumerate(counts) if c > 0)
+
+
+class CodeProperties:
+    '''
+    Exact error probabilities of a code on a binary symmetric channel under
+    bounded-distance decoding, or under its own decoder for `HammingCodec`
+    (see `hamming_outcomes`).
+
+    The probabilities are floats for a float `p`, or exact for a `Fraction`.
+    '''
+
+    def __init__(self, codec, t: int=None):
+        '''
+        Analyzes the code of `codec` for a decoder correcting up to `t` errors
+        (default: (d-1)/2, or the decoder of a `HammingCodec`).
+        '''
+        self.dist = weight_distribution(codec)
+        self.n = len(self.dist) - 1
+        self.k = sum(self.dist).bit_length() - 1
+        self.d = min_distance(self.dist)
+        self.t = (self.d - 1) // 2 if t is None else t
+        self._codewords = [0] + self.dist[1:]
+        if isinstance(codec, HammingCodec) and t is None:
+            (self._correct, self._miscorrected, self._detected) = hamming_outcomes(codec, self.dist)
+            return
+        self._miscorrected = miscorrections(self.dist, self.t)
+        self._correct = [math.comb(self.n, i) if i <= self.t else 0 for i in range(0, self.n+1)]
+        # count the rest directly so small probabilities do not cancel out
+        self._detected = [math.comb(self.n, i) - self._correct[i] - self._miscorrected[i] for i in range(0, self.n+1)]
+
+    def undetected(self, p):
+        '''
+        Returns the probability that the errors form a non-zero codeword, so a
+        detector sees a valid block.
+        '''
+        return _on_bsc(self._codewords, p)
+
+    def miscorrected(self, p):
+        '''
+        Returns the probability that the decoder delivers a wrong codeword.
+        '''
+        return _on_bsc(self._miscorrected, p)
+
+    def correct(self, p):
+        '''
+        Returns the probability that the decoder delivers the sent codeword.
+        '''
+        return _on_bsc(self._correct, p)
+
+    def detected(self, p):
+        '''
+        Returns the probability that the decoder flags the block as
+        uncorrectable.
+        '''
+        return _on_bsc(self._detected, p)
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute exact error probabilities of the ECC codes')
+    parser.add_argument('codes', nargs='+', help="codes to analyze ('hamming:K', 'hsiao:K' or 'golay')")
+    parser.add_argument('--p', type=float, nargs='+', default=[1e-2, 1e-3, 1e-4, 1e-5, 1e-6], help='channel bit error rates')
+    args = parser.parse_args()
+
+    for spec in args.codes:
+        start = time.perf_counter()
+        props = CodeProperties(make_codec(spec))
+        elapsed = time.perf_counter() - start
+        print(spec+': ['+str(props.n)+', '+str(props.k)+', '+str(props.d)+'] code, t = '+str(props.t)+' ({:.2f} s)'.format(elapsed))
+        spectrum = ', '.join('A_'+str(w)+' = '+str(a) for (w, a) in enumerate(props.dist) if w > 0 and a > 0)
+        print('  '+(spectrum if len(spectrum) <= 200 else spectrum[:197]+'...'))
+        print('  {:>10} {:>12} {:>12} {:>12}'.format('p', 'undetected', 'miscorrected', 'detected'))
+        for p in args.p:
+            print('  {:>10.2e} {:>12.4e} {:>12.4e} {:>12.4e}'.format(p, props.undetected(p), props.miscorrected(p), props.detected(p)))
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestWeights(unittest.TestCase):
+    '''
+    Test cases for the weight enumeration.
+    '''
+
+    def test_fwht(self):
+        f = np.array([3, 0, 1, 2])
+        self.assertEqual(list(fwht(fwht(f)) // 4), list(f))
+        self.assertEqual(list(fwht(f)), [6, 2, 0, 4])
+
+    def test_brute_force(self):
+        for spec in ['hamming:4', 'hamming:5', 'hamming:11', 'hsiao:8']:
+            codec = make_codec(spec)
+            n = codec.get_total_bits_len()
+            dist = [0] * (n+1)
+            for d in range(0, 2**codec.get_data_bits_len()):
+                dist[codec.encode_int(d).bit_count()] += 1
+            self.assertEqual(weight_distribution(codec), dist)
+            # both routes agree
+            self.assertEqual(macwilliams(span_weights(codec.get_parity_check_matrix())), dist)
+            self.assertEqual(span_weights(codec.get_generator_matrix()), dist)
+
+    def test_golay(self):
+        props = CodeProperties(make_codec('golay'))
+        self.assertEqual([(w, a) for (w, a) in enumerate(props.dist) if a > 0], [(0, 1), (8, 759), (12, 2576), (16, 759), (24, 1)])
+        self.assertEqual((props.n, props.k, props.d, props.t), (24, 12, 8, 3))
+        # the extended Golay code is self-dual
+        self.assertEqual(macwilliams(props.dist), props.dist)
+
+    def test_decoder(self):
+        # every error pattern through the decoder of full-length and
+        # shortened codes
+        for spec in ['hamming:4', 'hamming:5', 'hamming:8', 'hamming:11', 'hamming:12']:
+            codec = make_codec(spec)
+            props = CodeProperties(codec)
+            n = props.n
+            p = Fraction(1, 20)
+            (wrong, silent, flagged) = (0, 0, 0)
+            for e in range(0, 2**n):
+                (data, sec, ded) = codec.decode_int(e)
+                prob = p**e.bit_count() * (1-p)**(n-e.bit_count())
+                if data != 0 and ded == 0:
+                    wrong += prob
+                if e != 0 and sec == 0 and ded == 0:
+                    silent += prob
+                if ded == 1:
+                    flagged += prob
+            self.assertEqual(props.miscorrected(p), wrong)
+            self.assertEqual(props.undetected(p), silent)
+            self.assertEqual(props.correct(p) + props.miscorrected(p) + props.detected(p), 1)
+            self.assertEqual(props.detected(p), flagged)
+
+    def test_large(self):
+        start = time.perf_counter()
+        props = CodeProperties(make_codec('hamming:247'))
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertEqual((props.n, props.k, props.d), (256, 247, 4))
+        self.assertEqual(sum(props.dist), 2**247)
+        # n (n-1) (n-2) / 24 for the extended Hamming code of length n
+        self.assertEqual(props.dist[4], 256*255*254 // 24)
+        self.assertLess(props.undetected(1e-4), props.miscorrected(1e-4))
+
+    def test_shortened(self):
+        # a shortened code miscorrects more than a bounded-distance decoder
+        codec = make_codec('hamming:5')
+        ideal = CodeProperties(codec, t=1)
+        props = CodeProperties(codec)
+        self.assertEqual(props.d, ideal.d)
+        self.assertAlmostEqual(props.miscorrected(1/20), 0.01018, places=5)
+        self.assertGreater(props.miscorrected(1/20), ideal.miscorrected(1/20))
+        self.assertLess(props.detected(1/20), ideal.detected(1/20))
+        # the full-length code decodes exactly as far as the bound
+        codec = make_codec('hamming:11')
+        self.assertEqual(CodeProperties(codec).miscorrected(Fraction(1, 20)), CodeProperties(codec, t=1).miscorrected(Fraction(1, 20)))
+    pass
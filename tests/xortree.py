@@ -0,0 +1,309 @@
+'''
+Generator of flattened, depth-balanced XOR-tree VHDL from codec matrices.
+
+Each output of a GF(2) matrix is the XOR of the inputs in its row. Instead of
+a serial chain of XORs, every row is reduced pairwise level by level, so an
+output of _w_ inputs is ceil(log2 _w_) levels deep. Register stages can be
+inserted every few levels; outputs that finish early are delayed through the
+same stages so every output has the same latency.
+
+Matrices are taken from the Python models, named by `hamming:K`, `hsiao:K` or
+`golay`:
+
+- `enc`: the transposed generator matrix, computing the block from the data.
+- `chk`: the parity-check matrix, computing the checks from the block (the
+overall parity followed by the syndrome for Hamming and Golay).
+
+The generated netlist is simulated in Python on random vectors and compared
+against the reference codec before any VHDL is written.
+
+Usage: `python xortree.py hamming:57 chk --every 3 --out hamming_chk.vhd`
+
+To execute unit tests for this module, run: `python -m unittest xortree.py`.
+'''
+
+import argparse
+import random
+import sys
+import unittest
+import numpy as np
+import glyph as gl
+from hamming import HammingCodec
+from hsiao import xor_cost
+from golay import GolayCodec, syndrome
+from codes import make_codec
+
+
+class Netlist:
+    '''
+    Balanced XOR trees computing every row of a bit matrix from its inputs.
+
+    Signals are numbered with the inputs first. Operations are kept in
+    evaluation order as `('xor', dst, a, b)` or `('reg', dst, src)`, and
+    each output is a signal number or `None` for a constant '0'.
+    '''
+
+    def __init__(self, matrix, every: int=None):
+        '''
+        Construct the trees for `matrix` with a register stage after every
+        `every` levels of XORs (or none).
+        '''
+        matrix = np.asarray(matrix)
+        (self.width_out, self.width_in) = matrix.shape
+        self.every = every
+        self.ops = []
+        self.signals = self.width_in
+        self.gates = [0] * self.width_out
+        self.depth = [0] * self.width_out
+        self.latency = 0
+        groups = [[int(j) for j in np.nonzero(row)[0]] for row in matrix]
+        level = 0
+        while any(len(g) > 1 for g in groups):
+            level += 1
+            for (o, g) in enumerate(groups):
+                if len(g) < 2:
+                    continue
+                paired = []
+                for i in range(0, len(g)-1, 2):
+                    paired += [self._add('xor', g[i], g[i+1])]
+                    self.gates[o] += 1
+                # an odd signal passes on to the next level
+                if len(g) % 2 == 1:
+                    paired += [g[-1]]
+                groups[o] = paired
+                self.depth[o] = level
+            if every is not None and level % every == 0 and any(len(g) > 1 for g in groups):
+                # register every live signal, sharing registers between trees
+                regs = dict()
+                for (o, g) in enumerate(groups):
+                    for (i, s) in enumerate(g):
+                        if s not in regs:
+                            regs[s] = self._add('reg', s)
+                        g[i] = regs[s]
+                self.latency += 1
+        self.outputs = [g[0] if len(g) > 0 else None for g in groups]
+
+    def _add(self, op: str, *srcs) -> int:
+        dst = self.signals
+        self.signals += 1
+        self.ops += [(op, dst) + srcs]
+        return dst
+
+    def simulate(self, x):
+        '''
+        Evaluates the outputs for an (S, inputs) array of bits, treating the
+        registers as wires.
+
+        Returns an (S, outputs) `uint8` array.
+        '''
+        x = np.asarray(x, dtype=np.uint8)
+        values = [x[:, j] for j in range(0, self.width_in)] + [None]*(self.signals-self.width_in)
+        for op in self.ops:
+            if op[0] == 'xor':
+                values[op[1]] = values[op[2]] ^ values[op[3]]
+            else:
+                values[op[1]] = values[op[2]]
+        zero = np.zeros(x.shape[0], dtype=np.uint8)
+        return np.stack([zero if s is None else values[s] for s in self.outputs], axis=1)
+
+    def summary(self) -> dict:
+        '''
+        Returns the total `gates`, the maximum `depth`, the `registers`, the
+        `latency` in clock cycles and the `(gates, depth)` of each output.
+        '''
+        return {
+            'gates': sum(self.gates),
+            'depth': max(self.depth) if len(self.depth) > 0 else 0,
+            'registers': sum(1 for op in self.ops if op[0] == 'reg'),
+            'latency': self.latency,
+            'outputs': list(zip(self.gates, self.depth)),
+        }
+
+    def to_vhdl(self, entity: str, inp: str='data', out: str='code', about: str='') -> str:
+        '''
+        Writes the netlist as a VHDL entity and architecture.
+        '''
+        def name(s: int) -> str:
+            if s < self.width_in:
+                return inp+'('+str(s)+')'
+            return ('r_' if self.ops[s-self.width_in][0] == 'reg' else 'x_')+str(s)
+
+        info = self.summary()
+        lines = ['library stl;', 'context stl.prelude;', '']
+        for line in about.splitlines():
+            lines += [('-- '+line).rstrip()]
+        if about != '':
+            lines += ['--']
+        lines += [
+            '-- Generated by `xortree.py`; do not edit.',
+            '--',
+            '-- XOR gates: '+str(info['gates'])+', depth: '+str(info['depth'])+', registers: '+str(info['registers'])+', latency: '+str(info['latency']),
+        ]
+        for (o, (gates, depth)) in enumerate(info['outputs']):
+            lines += ['--   '+out+'('+str(o)+'): '+str(gates)+' gates, depth '+str(depth)]
+        lines += ['entity '+entity+' is', '  port(']
+        if self.latency > 0:
+            lines += ['    -- Clock for the register stages', '    clk: in logic;']
+        lines += [
+            '    -- Input word',
+            '    '+inp+': in logics('+str(self.width_in-1)+' downto 0);',
+            '    -- Output word',
+            '    '+out+': out logics('+str(self.width_out-1)+' downto 0)',
+            '  );',
+            'end entity;',
+            '',
+            '-- Flattened, depth-balanced XOR trees.',
+            'architecture gen of '+entity+' is',
+            '',
+        ]
+        for op in self.ops:
+            lines += ['  signal '+name(op[1])+': logic;']
+        lines += ['', 'begin', '']
+        for op in self.ops:
+            if op[0] == 'xor':
+                lines += ['  '+name(op[1])+' <= '+name(op[2])+' xor '+name(op[3])+';']
+        if self.latency > 0:
+            lines += ['', '  p_reg: process(clk)', '  begin', '    if rising_edge(clk) then']
+            for op in self.ops:
+                if op[0] == 'reg':
+                    lines += ['      '+name(op[1])+' <= '+name(op[2])+';']
+            lines += ['    end if;', '  end process;']
+        lines += ['']
+        for (o, s) in enumerate(self.outputs):
+            lines += ['  '+out+'('+str(o)+') <= '+("'0'" if s is None else name(s))+';']
+        lines += ['', 'end architecture;', '']
+        return '\n'.join(lines)
+    pass
+
+
+def get_matrix(codec, kind: str):
+    '''
+    Returns the matrix of the `codec` for the `enc` or `chk` logic.
+    '''
+    if kind == 'enc':
+        return codec.get_generator_matrix().T
+    elif kind == 'chk':
+        return codec.get_parity_check_matrix()
+    raise ValueError("unknown logic '"+kind+"' (expected 'enc' or 'chk')")
+
+
+def reference(codec, kind: str, word: int) -> int:
+    '''
+    Computes the outputs of the `enc` or `chk` logic for the input `word`
+    with the reference codec, packed with output _i_ at bit _i_.
+    '''
+    if isinstance(codec, GolayCodec):
+        if kind == 'enc':
+            (check, parity) = codec.encode(word)
+            return parity << 23 | check << 12 | word
+        cw = codec.assemble_cw(word & 0xfff, (word >> 12) & 0x7ff)
+        return gl.int_parity(word) | (syndrome(cw) >> 12) << 1
+    if kind == 'enc':
+        return codec.encode_int(word)
+    if isinstance(codec, HammingCodec):
+        return gl.int_parity(word) | codec._get_syndrome(word) << 1
+    return codec._get_syndrome(word)
+
+
+def verify(spec: str, kind: str, netlist: Netlist, count: int=1000, seed: int=None) -> int:
+    '''
+    Simulates the `netlist` on `count` random input words and compares its
+    outputs against the reference codec for `spec`.
+
+    Returns the number of mismatches.
+    '''
+    codec = make_codec(spec)
+    rng = random.Random(seed)
+    words = [rng.getrandbits(netlist.width_in) for _ in range(0, count)]
+    x = np.array([[(w >> j) & 1 for j in range(0, netlist.width_in)] for w in words], dtype=np.uint8)
+    y = netlist.simulate(x)
+    bad = 0
+    for (w, row) in zip(words, y):
+        if int(gl.BitVector.from_list([int(b) for b in row])) != reference(codec, kind, w):
+            bad += 1
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate balanced XOR-tree VHDL from the ECC models')
+    parser.add_argument('code', help="code to generate ('hamming:K', 'hsiao:K' or 'golay')")
+    parser.add_argument('logic', choices=['enc', 'chk'], help='encoder or parity-check logic')
+    parser.add_argument('--every', type=int, default=None, help='levels of XORs between register stages')
+    parser.add_argument('--entity', default=None, help='name of the generated entity')
+    parser.add_argument('--vectors', type=int, default=1000, help='random vectors to verify the netlist with')
+    parser.add_argument('--out', default=None, help='VHDL file to write (default: stdout)')
+    args = parser.parse_args()
+
+    codec = make_codec(args.code)
+    netlist = Netlist(get_matrix(codec, args.logic), args.every)
+    bad = verify(args.code, args.logic, netlist, args.vectors)
+    info = netlist.summary()
+    print('info: gates: '+str(info['gates'])+', depth: '+str(info['depth'])+', registers: '+str(info['registers'])+', latency: '+str(info['latency']), file=sys.stderr)
+    if bad > 0:
+        print('error: '+str(bad)+' of '+str(args.vectors)+' vectors mismatch the reference codec', file=sys.stderr)
+        exit(1)
+    entity = args.entity if args.entity is not None else args.code.replace(':', '_')+'_'+args.logic
+    (inp, out) = ('data', 'code') if args.logic == 'enc' else ('code', 'checks')
+    vhdl = netlist.to_vhdl(entity, inp, out, args.logic+' logic for '+args.code)
+    if args.out is None:
+        print(vhdl, end='')
+    else:
+        with open(args.out, 'w') as f:
+            f.write(vhdl)
+    pass
+
+
+if __name__ == '__main__':
+    main()
+
+
+class TestXorTree(unittest.TestCase):
+    '''
+    Test cases for the XOR-tree generator.
+    '''
+
+    def test_balanced(self):
+        netlist = Netlist(np.array([[1]*8, [1]*5 + [0]*3, [1] + [0]*7, [0]*8]))
+        info = netlist.summary()
+        self.assertEqual(info['outputs'], [(7, 3), (4, 3), (0, 0), (0, 0)])
+        self.assertEqual(netlist.outputs[2], 0)
+        self.assertIsNone(netlist.outputs[3])
+        x = np.random.randint(0, 2, size=(100, 8), dtype=np.uint8)
+        y = netlist.simulate(x)
+        self.assertTrue((y[:, 0] == x.sum(axis=1) % 2).all())
+        self.assertTrue((y[:, 1] == x[:, :5].sum(axis=1) % 2).all())
+        self.assertFalse(y[:, 3].any())
+
+    def test_registers(self):
+        matrix = np.array([[1]*16, [1]*3 + [0]*13, [0]*15 + [1]])
+        netlist = Netlist(matrix, every=2)
+        # 4 levels with a stage after the second, which every output crosses
+        self.assertEqual(netlist.summary()['latency'], 1)
+        self.assertTrue(all(netlist.ops[s-16][0] == 'reg' for s in netlist.outputs[1:]))
+        x = np.random.randint(0, 2, size=(50, 16), dtype=np.uint8)
+        self.assertTrue((netlist.simulate(x) == (matrix @ x.T.astype(int) % 2).T).all())
+        vhdl = netlist.to_vhdl('tree')
+        self.assertIn('clk: in logic;', vhdl)
+        self.assertIn('rising_edge(clk)', vhdl)
+
+    def test_codecs(self):
+        for spec in ['hamming:4', 'hamming:57', 'hsiao:64', 'golay']:
+            codec = make_codec(spec)
+            for kind in ['enc', 'chk']:
+                matrix = get_matrix(codec, kind)
+                for every in [None, 1, 3]:
+                    netlist = Netlist(matrix, every)
+                    self.assertEqual(verify(spec, kind, netlist, count=200, seed=1), 0)
+                info = Netlist(matrix).summary()
+                self.assertEqual((info['gates'], info['depth']), xor_cost(matrix))
+        # a wrong netlist is caught
+        netlist = Netlist(get_matrix(make_codec('hamming:11'), 'chk')[::-1])
+        self.assertGreater(verify('hamming:11', 'chk', netlist, count=50, seed=1), 0)
+
+    def test_vhdl(self):
+        netlist = Netlist(get_matrix(make_codec('golay'), 'chk'))
+        vhdl = netlist.to_vhdl('golay_chk', 'code', 'checks', 'chk logic for golay')
+        self.assertIn('entity golay_chk is', vhdl)
+        self.assertIn('checks: out logics(11 downto 0)', vhdl)
+        self.assertNotIn('clk', vhdl)
+        self.assertEqual(vhdl.count(' xor '), netlist.summary()['gates'])